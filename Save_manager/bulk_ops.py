@@ -0,0 +1,247 @@
+import os
+import re
+import collections
+
+from save_index import scan_save_files
+from thumbnail_cache import remove_thumbnails
+from capture_encoder import SCREENSHOT_FORMATS
+from group_switch import rename_no_replace
+
+# changed: 实际修改的存档数; errors: 跳过的存档和原因
+BulkResult = collections.namedtuple("BulkResult", "changed errors")
+
+SCREENSHOT_EXTENSIONS = tuple(ext for ext, _ in SCREENSHOT_FORMATS.values())
+
+# 可以批量修改的标记和取值范围, None 为布尔值
+FLAG_LIMITS = {"important": None, "ignore": None, "indent": (0, 5)}
+
+
+class BulkOperations:
+    """一次处理大量存档的批量操作: 元数据在一个事务中写入, 文件和截图按组成批处理
+
+    操作对象 targets 为 {组序号: [存档路径, ...]}, 路径与元数据一致, 是存档在根目录时的路径;
+    可以是当前组的选中项, 也可以是 query 在所有组中的查询结果.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    # ---- 查询 ----
+
+    def query(self, pattern, fields=("note", "name"), groups=None):
+        """在所有组 (或 groups 中的组) 中查找备注或文件名匹配正则表达式的存档, 返回 targets"""
+        regex = re.compile(pattern)
+        engine = self.engine
+        packed = engine.packed_group_stats()
+        targets = {}
+        for group_index in sorted(groups or set(engine.group_manifest.all_groups()) | {engine.current_group}):
+            if group_index in packed:
+                # 分块或归档的组不在磁盘上, 只能按元数据查找
+                entries = [{'path': path, 'original_name': os.path.basename(path), 'note': info.get('note', '')}
+                           for path, info in engine.store.get_group_saves(group_index).items()]
+            else:
+                entries = engine.list_group(group_index)
+            # 其他组的扫描结果是组文件夹中的路径, 统一为元数据使用的根目录路径
+            paths = [os.path.join(engine.save_dir, entry['original_name']) for entry in entries
+                     if ("note" in fields and regex.search(entry['note'] or ''))
+                     or ("name" in fields and regex.search(entry['original_name']))]
+            if paths:
+                targets[group_index] = paths
+        return targets
+
+    # ---- 元数据 ----
+
+    def set_flag(self, targets, field, value=None):
+        """设置标记; value 为 None 时逐个切换布尔标记, indent 的 value 为增量"""
+        limits = FLAG_LIMITS[field]
+        changed = 0
+        with self.engine.store.transaction():
+            for group_index, paths in targets.items():
+                current = self.engine.store.get_group_saves(group_index) # 每组一次查询
+                values = {}
+                for path in paths:
+                    old = current.get(path, {}).get(field, 0 if limits else False)
+                    if limits:
+                        new = min(max(old + (value or 0), limits[0]), limits[1])
+                    else:
+                        new = (not old) if value is None else bool(value)
+                    if new != old:
+                        values[path] = new
+                self.engine.store.set_fields(group_index, field, values)
+                changed += len(values)
+        if changed:
+            self.engine.save_config()
+        return BulkResult(changed, [])
+
+    def set_note(self, targets, note):
+        """把一批存档的备注设为同一内容"""
+        with self.engine.store.transaction():
+            for group_index, paths in targets.items():
+                self.engine.store.set_fields(group_index, "note", dict.fromkeys(paths, note))
+        self.engine.save_config()
+        return BulkResult(sum(len(paths) for paths in targets.values()), [])
+
+    def retag(self, pattern, replacement, targets=None):
+        """用正则表达式替换备注, 例如路线分支后把 "A线" 改为 "B线"; targets 为空时处理所有组"""
+        regex = re.compile(pattern)
+        if targets is None:
+            notes = self.engine.store.get_notes()
+        else:
+            notes = []
+            for group_index, paths in targets.items():
+                group_saves = self.engine.store.get_group_saves(group_index)
+                notes.extend((group_index, path, group_saves.get(path, {}).get('note', '')) for path in paths)
+        updates = collections.defaultdict(dict)
+        for group_key, path, note in notes:
+            new_note = regex.sub(replacement, note)
+            if new_note != note:
+                updates[group_key][path] = new_note
+        with self.engine.store.transaction():
+            for group_key, values in updates.items():
+                self.engine.store.set_fields(group_key, "note", values)
+        changed = sum(len(values) for values in updates.values())
+        if changed:
+            self.engine.save_config()
+        return BulkResult(changed, [])
+
+    # ---- 文件 ----
+
+    def file_path(self, group_index, path):
+        """存档现在所在的位置: 当前组在根目录, 其他组在组文件夹中"""
+        if group_index == self.engine.current_group:
+            return path
+        return os.path.join(self.engine.save_dir, f"save{group_index}", os.path.basename(path))
+
+    def screenshot_names(self):
+        """截图目录中的文件, 按 "组_存档名" 分组; 整批操作只列出一次目录"""
+        names = collections.defaultdict(list)
+        try:
+            entries = os.listdir(self.engine.img_dir)
+        except OSError:
+            return names
+        for name in entries:
+            base, ext = os.path.splitext(name)
+            if ext in SCREENSHOT_EXTENSIONS:
+                names[base].append(name)
+        return names
+
+    def unpack(self, group_index):
+        """操作分块或归档的组之前先还原到组文件夹"""
+        engine = self.engine
+        if group_index == engine.current_group:
+            return
+        group_dir = os.path.join(engine.save_dir, f"save{group_index}")
+        if engine.chunk_store is not None:
+            engine.chunk_store.restore_group(group_index, group_dir)
+        if engine.cold_storage is not None:
+            engine.cold_storage.restore_group(group_index, group_dir)
+
+    def delete(self, targets):
+        """删除存档文件、截图和元数据, 返回的 changed 为删除的存档数"""
+        engine = self.engine
+        errors = []
+        changed = 0
+        removed_images = []  # 截图索引在最后一并清理
+        screenshots = self.screenshot_names()
+        with engine.group_lock: # 不与组切换同时移动文件
+            for group_index, paths in targets.items():
+                try:
+                    self.unpack(group_index)
+                except OSError as e:
+                    errors.append(f"第{group_index}组: {e}")
+                    continue
+                deleted = []
+                for path in paths:
+                    try:
+                        os.remove(self.file_path(group_index, path))
+                    except FileNotFoundError:
+                        pass # 文件已经不在, 仍然清理元数据
+                    except OSError as e:
+                        errors.append(f"{os.path.basename(path)}: {e}")
+                        continue
+                    deleted.append(path)
+                    base = f"{group_index}_{os.path.splitext(os.path.basename(path))[0]}"
+                    for name in screenshots.get(base, ()):
+                        img_path = os.path.join(engine.img_dir, name)
+                        try:
+                            os.remove(img_path)
+                        except OSError:
+                            pass
+                        remove_thumbnails(img_path)
+                        removed_images.append(img_path)
+                engine.store.delete_saves(group_index, deleted)
+                changed += len(deleted)
+            engine.screenshot_index.remove_many(removed_images)
+            self.after_files_changed(targets)
+        engine.save_config()
+        return BulkResult(changed, errors)
+
+    def move(self, targets, target_group):
+        """把存档连同截图和元数据移到另一组, 目标组已有同名存档时跳过"""
+        engine = self.engine
+        errors = []
+        changed = 0
+        screenshots = self.screenshot_names()
+        image_renames = []
+        moved_in = []
+        with engine.group_lock:
+            try:
+                self.unpack(target_group)
+            except OSError as e:
+                return BulkResult(0, [f"第{target_group}组: {e}"])
+            if target_group != engine.current_group:
+                os.makedirs(os.path.join(engine.save_dir, f"save{target_group}"), exist_ok=True)
+            for group_index, paths in targets.items():
+                if group_index == target_group:
+                    continue
+                try:
+                    self.unpack(group_index)
+                except OSError as e:
+                    errors.append(f"第{group_index}组: {e}")
+                    continue
+                moved = []
+                for path in paths:
+                    source = self.file_path(group_index, path)
+                    destination = self.file_path(target_group, path)
+                    try:
+                        rename_no_replace(source, destination)  # 移动期间游戏写入的同名存档也不会被覆盖
+                    except FileExistsError:
+                        errors.append(f"{os.path.basename(path)}: 第{target_group}组已有同名存档")
+                        continue
+                    except OSError as e:
+                        errors.append(f"{os.path.basename(path)}: {e}")
+                        continue
+                    moved.append(path)
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    for image in screenshots.get(f"{group_index}_{name}", ()):
+                        new_image = f"{target_group}_{name}{os.path.splitext(image)[1]}"
+                        old_path = os.path.join(engine.img_dir, image)
+                        new_path = os.path.join(engine.img_dir, new_image)
+                        try:
+                            rename_no_replace(old_path, new_path)
+                        except OSError:
+                            continue  # 目标组已有同名截图时保留两者, 不覆盖
+                        remove_thumbnails(old_path)
+                        image_renames.append((old_path, new_path))
+                if target_group == engine.current_group:
+                    moved_in.extend(moved)
+                engine.store.move_saves(group_index, target_group, moved)
+                changed += len(moved)
+            engine.screenshot_index.rename_many(image_renames)
+            if moved_in:
+                # 移入根目录的存档不是新存档, 不需要截图
+                moved_in = set(moved_in)
+                engine.save_fingerprints.accept(target_group, [file_info for file_info in scan_save_files(engine.save_dir)
+                                                               if file_info['path'] in moved_in])
+            self.after_files_changed({**targets, target_group: []})
+        engine.save_config()
+        return BulkResult(changed, errors)
+
+    def after_files_changed(self, targets):
+        """文件批量变化后, 每个涉及的组重新统计一次; 根目录的变化不当作外部事件"""
+        engine = self.engine
+        if engine.current_group in targets and engine.watcher is not None:
+            engine.watcher.resync()
+        for group_index in targets:
+            if group_index != engine.current_group:
+                engine.group_manifest.update_group(group_index, engine.get_files_in_group(group_index))
@@ -0,0 +1,152 @@
+import platform
+import collections
+
+# 与 get_title.py 中的定义相同: PrintWindow 捕获 DirectX/DWM 渲染的完整内容
+PW_RENDERFULLCONTENT = 0x00000002
+DIB_RGB_COLORS = 0
+SRCCOPY = 0x00CC0020
+DWMWA_EXTENDED_FRAME_BOUNDS = 9
+
+# raw: 原始像素字节, size: (宽, 高), raw_mode: PIL 的原始像素排列, 例如 BGRA
+Frame = collections.namedtuple("Frame", ["raw", "size", "raw_mode"])
+
+
+class GdiBackend:
+    """用 BitBlt 从窗口设备上下文复制像素, 窗口被遮挡或使用硬件加速时可能得到黑屏"""
+
+    name = "gdi"
+
+    def __init__(self):
+        self.available = platform.system() == "Windows"
+
+    def grab(self, window_title):
+        """读取窗口像素, 找不到窗口或不支持时返回 None"""
+        if not self.available:
+            print("截图功能仅支持 Windows 操作系统。")
+            return None
+        import ctypes
+        import win32gui
+
+        # 使用 ctypes 定义 RECT 结构体
+        class RECT(ctypes.Structure):
+            _fields_ = [
+                ("left", ctypes.c_long),
+                ("top", ctypes.c_long),
+                ("right", ctypes.c_long),
+                ("bottom", ctypes.c_long),
+            ]
+
+        # 使用 ctypes 定义 BITMAPINFOHEADER 结构体
+        class BITMAPINFOHEADER(ctypes.Structure):
+            _fields_ = [
+                ("biSize", ctypes.c_uint),
+                ("biWidth", ctypes.c_long),
+                ("biHeight", ctypes.c_long),
+                ("biPlanes", ctypes.c_short),
+                ("biBitCount", ctypes.c_short),
+                ("biCompression", ctypes.c_uint),
+                ("biSizeImage", ctypes.c_uint),
+                ("biXPelsPerMeter", ctypes.c_long),
+                ("biYPelsPerMeter", ctypes.c_long),
+                ("biClrUsed", ctypes.c_uint),
+                ("biClrImportant", ctypes.c_uint)
+            ]
+
+        hwnd = win32gui.FindWindow(None, window_title)
+        if not hwnd:
+            return None
+        # 获取窗口的实际大小
+        rect = RECT()
+        ctypes.windll.dwmapi.DwmGetWindowAttribute(
+            hwnd, DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(rect), ctypes.sizeof(rect)
+        )
+        width = rect.right - rect.left
+        height = rect.bottom - rect.top
+
+        # 创建一个与窗口大小匹配的设备上下文
+        hwnd_dc = win32gui.GetWindowDC(hwnd)
+        dc = ctypes.windll.gdi32.CreateCompatibleDC(hwnd_dc)
+        bitmap = ctypes.windll.gdi32.CreateCompatibleBitmap(hwnd_dc, width, height)
+        try:
+            ctypes.windll.gdi32.SelectObject(dc, bitmap)
+            self.copy_window(ctypes, hwnd, hwnd_dc, dc, width, height)
+
+            # 将设备上下文中的内容复制到缓冲区
+            bitmap_header = BITMAPINFOHEADER()
+            bitmap_header.biSize = ctypes.sizeof(bitmap_header)
+            bitmap_header.biWidth = width
+            bitmap_header.biHeight = -height  # 负数表示顶端为起始
+            bitmap_header.biPlanes = 1
+            bitmap_header.biBitCount = 32
+            bitmap_header.biCompression = 0  # BI_RGB
+            buffer = ctypes.create_string_buffer(width * height * 4)
+            ctypes.windll.gdi32.GetDIBits(dc, bitmap, 0, height, buffer, ctypes.byref(bitmap_header), DIB_RGB_COLORS)
+        finally:
+            # 清理资源
+            ctypes.windll.gdi32.DeleteObject(bitmap)
+            ctypes.windll.gdi32.DeleteDC(dc)
+            win32gui.ReleaseDC(hwnd, hwnd_dc)
+        return Frame(buffer.raw, (width, height), "BGRA")
+
+    def copy_window(self, ctypes, hwnd, hwnd_dc, dc, width, height):
+        """把窗口内容复制到内存设备上下文"""
+        ctypes.windll.gdi32.BitBlt(dc, 0, 0, width, height, hwnd_dc, 0, 0, SRCCOPY)
+
+
+class PrintWindowBackend(GdiBackend):
+    """用 PrintWindow(PW_RENDERFULLCONTENT) 让窗口自己绘制, 能捕获被遮挡和硬件加速的窗口, 但速度较慢"""
+
+    name = "printwindow"
+
+    def copy_window(self, ctypes, hwnd, hwnd_dc, dc, width, height):
+        """让窗口把完整内容绘制到内存设备上下文"""
+        if not ctypes.windll.user32.PrintWindow(hwnd, dc, PW_RENDERFULLCONTENT):
+            # PrintWindow 失败时退回 BitBlt
+            super().copy_window(ctypes, hwnd, hwnd_dc, dc, width, height)
+
+
+class FakeBackend:
+    """生成固定尺寸合成画面的假后端, 结果只取决于尺寸和第几帧, 用于测试和基准"""
+
+    name = "fake"
+
+    def __init__(self, size=(1920, 1080), fade_frames=0):
+        self.size = size
+        self.fade_frames = fade_frames  # 大于 0 时模拟从黑屏淡入, 之后画面静止
+        self.frames = 0  # 已生成的帧数
+
+    def grab(self, window_title):
+        """生成一帧 BGRA 渐变画面, 每帧水平偏移一点; 模拟淡入时亮度逐帧增加, 淡入结束后不再变化"""
+        width, height = self.size
+        if self.fade_frames:
+            offset = 0
+            brightness = min(self.frames, self.fade_frames) / self.fade_frames
+        else:
+            offset = self.frames * 8
+            brightness = 1.0
+        self.frames += 1
+        row = bytearray(width * 4)
+        for x in range(width):
+            value = (x + offset) & 0xFF
+            pixel = (value, 255 - value, (x >> 8) * 32 & 0xFF)
+            row[x * 4:x * 4 + 4] = bytes([int(c * brightness) for c in pixel] + [255])
+        # 每 16 行换一种亮度, 避免整幅画面只有一行重复
+        bands = [bytes(b // 2 if band % 2 else b for b in row) for band in range(2)]
+        raw = b"".join(bands[(y // 16) % 2] for y in range(height))
+        return Frame(raw, (width, height), "BGRA")
+
+
+CAPTURE_BACKENDS = {
+    GdiBackend.name: GdiBackend,
+    PrintWindowBackend.name: PrintWindowBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def create_backend(name, **kwargs):
+    """按名称创建截图后端, 未知名称时使用 gdi"""
+    backend_class = CAPTURE_BACKENDS.get(name)
+    if backend_class is None:
+        print(f"未知的截图后端 {name}, 使用 gdi")
+        backend_class = GdiBackend
+    return backend_class(**kwargs)
@@ -0,0 +1,77 @@
+"""截图延迟基准: 分别测量各截图后端在不同分辨率下读取、转换和编码一帧的耗时
+
+用法: python capture_benchmark.py --backend fake --sizes 1280x720,1920x1080,3840x2160 --formats webp,jpeg,png
+非 Windows 系统上只能使用 fake 后端.
+"""
+import io
+import time
+import argparse
+import statistics
+
+from capture_backend import create_backend, FakeBackend
+from capture_encoder import convert_frame, save_image, SCREENSHOT_FORMATS
+
+
+def parse_size(text):
+    """解析 1920x1080 格式的分辨率"""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def measure(func, repeat):
+    """运行 repeat 次, 返回 (中位数毫秒, 最后一次的结果)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def run_benchmark(backend_name, sizes, formats, quality=80, max_size=1920, repeat=5, window_title=""):
+    """返回 [(后端, 分辨率, 格式, 读取ms, 转换ms, 编码ms, 字节数), ...]"""
+    rows = []
+    for size in sizes:
+        if backend_name == FakeBackend.name:
+            backend = create_backend(backend_name, size=size)
+        else:
+            backend = create_backend(backend_name)  # 真实窗口的分辨率由窗口决定
+        grab_ms, frame = measure(lambda: backend.grab(window_title), repeat)
+        if frame is None:
+            print(f"{backend_name}: 未能读取窗口 '{window_title}'")
+            return rows
+        convert_ms, image = measure(lambda: convert_frame(frame.raw, frame.size, frame.raw_mode, max_size), repeat)
+        for fmt in formats:
+            def encode():
+                buffer = io.BytesIO()
+                save_image(image, buffer, fmt, quality)
+                return buffer.tell()
+            encode_ms, encoded_bytes = measure(encode, repeat)
+            rows.append((backend.name, f"{frame.size[0]}x{frame.size[1]}", fmt,
+                         grab_ms, convert_ms, encode_ms, encoded_bytes))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="截图读取、转换和编码延迟基准")
+    parser.add_argument("--backend", default="fake", help="gdi, printwindow 或 fake")
+    parser.add_argument("--sizes", default="1280x720,1920x1080,3840x2160", help="fake 后端生成的分辨率")
+    parser.add_argument("--formats", default=",".join(SCREENSHOT_FORMATS), help="编码格式")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--max-size", type=int, default=1920, help="保存的最长边, 0 表示不缩小")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--window", default="", help="真实后端要截图的窗口标题")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    formats = args.formats.split(",")
+    rows = run_benchmark(args.backend, sizes, formats, args.quality, args.max_size, args.repeat, args.window)
+    print(f"{'后端':<12}{'分辨率':<12}{'格式':<6}{'读取ms':>10}{'转换ms':>10}{'编码ms':>10}{'KB':>10}")
+    for backend, size, fmt, grab_ms, convert_ms, encode_ms, encoded_bytes in rows:
+        print(f"{backend:<12}{size:<12}{fmt:<6}{grab_ms:>10.1f}{convert_ms:>10.1f}{encode_ms:>10.1f}"
+              f"{encoded_bytes / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import threading
+import concurrent.futures
+
+from thumbnail_cache import write_thumbnails
+
+# 截图保存格式: 名称 -> (扩展名, PIL 格式)
+SCREENSHOT_FORMATS = {
+    "webp": (".webp", "WEBP"),
+    "jpeg": (".jpg", "JPEG"),
+    "png": (".png", "PNG"),
+}
+
+
+def screenshot_extensions(preferred):
+    """所有截图扩展名, 当前格式排在最前"""
+    first = SCREENSHOT_FORMATS[preferred][0]
+    return [first] + [ext for ext, _ in SCREENSHOT_FORMATS.values() if ext != first]
+
+
+def convert_frame(raw, size, raw_mode, max_size=0):
+    """把原始像素转换为 RGB 图像, 最长边超过 max_size 时缩小"""
+    from PIL import Image  # 在编码进程中第一次截图时导入
+    image = Image.frombuffer("RGBA", size, raw, "raw", raw_mode, 0, 1).convert("RGB")
+    if max_size and max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)  # 限制保存的最大分辨率
+    return image
+
+
+def save_image(image, fp, fmt, quality):
+    """按截图格式和质量编码图像, fp 可以是路径或文件对象"""
+    pil_format = SCREENSHOT_FORMATS[fmt][1]
+    options = {"optimize": True} if pil_format == "PNG" else {"quality": quality}
+    if pil_format == "WEBP":
+        options["method"] = 4
+    image.save(fp, pil_format, **options)
+
+
+def encode_capture(raw, size, raw_mode, save_path, fmt, quality, max_size):
+    """在工作进程中把原始像素编码为截图文件, 同时生成预缩放文件, 返回截图的 (dhash, sha256, 字节数)"""
+    from screenshot_index import hash_screenshot
+    image = convert_frame(raw, size, raw_mode, max_size)
+    tmp_path = save_path + ".tmp"
+    save_image(image, tmp_path, fmt, quality)
+    os.replace(tmp_path, save_path)  # 编码完成前不会出现不完整的截图
+    write_thumbnails(save_path, image)
+    return hash_screenshot(save_path, image)
+
+
+class CaptureEncoder:
+    """在进程池中编码截图, 截图线程只负责读取窗口像素"""
+
+    def __init__(self, fmt="webp", quality=80, max_size=1920, max_workers=2):
+        if fmt not in SCREENSHOT_FORMATS:
+            print(f"不支持的截图格式 {fmt}, 使用 webp")
+            fmt = "webp"
+        self.format = fmt
+        self.extension = SCREENSHOT_FORMATS[fmt][0]
+        self.quality = quality
+        self.max_size = max_size  # 保存的最长边, 0 表示不缩小
+        try:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        except (OSError, NotImplementedError) as e:
+            print(f"无法创建编码进程池, 改为在线程中编码: {e}")
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                                  thread_name_prefix="capture-encode")
+        self._pending = set()  # 正在编码的截图路径
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.bytes_written = 0
+
+    def is_pending(self, save_path):
+        """截图是否正在编码"""
+        with self._lock:
+            return save_path in self._pending
+
+    def submit_frame(self, frame, save_path, callback=None):
+        """提交截图后端读取的一帧"""
+        return self.submit(frame.raw, frame.size, save_path, frame.raw_mode, callback)
+
+    def submit(self, raw, size, save_path, raw_mode="BGRA", callback=None):
+        """提交原始像素, 编码完成后在工作线程中调用 callback(save_path, (dhash, sha256, 字节数), error)"""
+        with self._lock:
+            self._pending.add(save_path)
+        future = self.executor.submit(encode_capture, raw, size, raw_mode, save_path,
+                                      self.format, self.quality, self.max_size)
+
+        def done(f):
+            with self._lock:
+                self._pending.discard(save_path)
+            if f.cancelled():
+                return
+            error = f.exception()
+            result = None
+            if error is None:
+                result = f.result()
+                with self._lock:
+                    self.encoded += 1
+                    self.bytes_written += result[2]
+            if callback is not None:
+                callback(save_path, result, error)
+
+        future.add_done_callback(done)
+        return future
+
+    def stats(self):
+        """返回已编码的截图数量和写入的字节数"""
+        with self._lock:
+            return {
+                "encoded": self.encoded,
+                "bytes_written": self.bytes_written,
+                "pending": len(self._pending),
+            }
+
+    def shutdown(self, wait=True):
+        """关闭进程池, 默认等待正在编码的截图写完"""
+        self.executor.shutdown(wait=wait)
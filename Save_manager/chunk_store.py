@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import zlib
+import random
+import hashlib
+
+from save_index import scan_save_files, staging_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_files (
+    group_index INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    chunks TEXT NOT NULL,
+    PRIMARY KEY (group_index, name)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_unreferenced ON chunks (refs) WHERE refs <= 0;
+"""
+
+# 基于内容的分块参数: 平均约 8 KB, 最小 2 KB, 最大 64 KB
+MIN_CHUNK = 2 * 1024
+MAX_CHUNK = 64 * 1024
+CHUNK_MASK = (1 << 13) - 1
+
+# Gear 滚动哈希表, 固定种子保证每次分块结果相同
+_rng = random.Random(0x5EED)
+GEAR = [_rng.getrandbits(64) for _ in range(256)]
+del _rng
+
+
+def split_chunks(data):
+    """按内容切分数据, 插入或删除字节只影响附近的块"""
+    chunks = []
+    start = 0
+    length = len(data)
+    gear = GEAR
+    mask = CHUNK_MASK
+    while start < length:
+        end = min(start + MAX_CHUNK, length)
+        cut = end
+        h = 0
+        i = start + MIN_CHUNK
+        if i < end:
+            for i in range(i, end):
+                h = ((h << 1) + gear[data[i]]) & 0xFFFFFFFFFFFFFFFF
+                if not h & mask:
+                    cut = i + 1
+                    break
+        chunks.append(data[start:cut])
+        start = cut
+    return chunks
+
+
+class ChunkStore:
+    """存档内容按块去重保存在 chunks 目录中, 不在根目录的组可以只保留分块记录"""
+
+    def __init__(self, store, chunk_dir):
+        self.store = store
+        self.chunk_dir = chunk_dir
+        os.makedirs(chunk_dir, exist_ok=True)
+        with store.transaction() as conn:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def _write_chunk(self, digest, data):
+        """写入新的块文件, 返回压缩后的大小"""
+        path = self._chunk_path(digest)
+        packed = zlib.compress(data, 6)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(packed)
+            f.flush()
+            os.fsync(f.fileno())  # 块写入磁盘之后才会删除原文件
+        os.replace(tmp_path, path)
+        return len(packed)
+
+    def _read_chunk(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def is_packed(self, group_index):
+        """组是否以分块形式保存"""
+        with self.store.transaction() as conn:
+            return conn.execute("SELECT 1 FROM chunk_files WHERE group_index = ? LIMIT 1",
+                                (group_index,)).fetchone() is not None
+
+    def pack_group(self, group_index, group_dir):
+        """把组文件夹中的存档分块保存, 记录提交后删除原文件, 返回耗时 (秒)
+
+        调用方需要持有组文件锁; 删除原文件失败时抛出 OSError, 留下的文件下次还原时保留.
+        """
+        start = time.perf_counter()
+        self.restore_group(group_index, group_dir)  # 先补齐上次没有还原的文件, 重新分块时不会丢掉它们的记录
+        files = scan_save_files(group_dir) if os.path.isdir(group_dir) else []
+        if not files:
+            return 0.0
+        recipes = []
+        new_chunks = {}  # 本次新写入的块 -> (原始大小, 压缩后大小)
+        for file_info in files:
+            with open(file_info['path'], "rb") as f:
+                data = f.read()
+            pieces = split_chunks(data)
+            digests = [hashlib.sha256(chunk).hexdigest() for chunk in pieces]
+            with self.store.transaction() as conn:
+                # 块文件在事务外写入, 避免分块期间占用数据库
+                missing = [i for i, digest in enumerate(digests) if digest not in new_chunks and
+                           conn.execute("SELECT 1 FROM chunks WHERE hash = ?", (digest,)).fetchone() is None]
+            for i in missing:
+                if digests[i] not in new_chunks:
+                    new_chunks[digests[i]] = (len(pieces[i]), self._write_chunk(digests[i], pieces[i]))
+            recipes.append((group_index, file_info['original_name'], len(data), file_info['mtime'], digests))
+        with self.store.transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO chunks (hash, size, stored_size, refs) VALUES (?, ?, ?, 0)",
+                             [(digest, size, stored) for digest, (size, stored) in new_chunks.items()])
+            self._drop_group(conn, group_index)
+            conn.executemany("INSERT INTO chunk_files (group_index, name, size, mtime, chunks) VALUES (?, ?, ?, ?, ?)",
+                             [recipe[:4] + (json.dumps(recipe[4]),) for recipe in recipes])
+            self._add_refs(conn, [digest for recipe in recipes for digest in recipe[4]], 1)
+        for file_info in files:
+            try:
+                os.remove(file_info['path'])
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                raise OSError(f"删除已分块的存档 {file_info['original_name']} 失败: {e}") from e
+        return time.perf_counter() - start
+
+    def _add_refs(self, conn, digests, delta):
+        counts = {}
+        for digest in digests:
+            counts[digest] = counts.get(digest, 0) + delta
+        conn.executemany("UPDATE chunks SET refs = refs + ? WHERE hash = ?",
+                         [(count, digest) for digest, count in counts.items()])
+
+    def _drop_group(self, conn, group_index):
+        """删除组的分块记录并减少块的引用数"""
+        for (chunk_list,) in conn.execute("SELECT chunks FROM chunk_files WHERE group_index = ?",
+                                          (group_index,)).fetchall():
+            self._add_refs(conn, json.loads(chunk_list), -1)
+        conn.execute("DELETE FROM chunk_files WHERE group_index = ?", (group_index,))
+
+    def restore_group(self, group_index, group_dir):
+        """按分块记录重建组文件夹中缺少的存档, 已有的同名文件以文件夹为准; 返回耗时 (秒)
+
+        所有文件都在磁盘上之后才删除组的分块记录, 还原失败时抛出 OSError 并保留记录.
+        """
+        start = time.perf_counter()
+        with self.store.transaction() as conn:
+            rows = conn.execute("SELECT name, mtime, chunks FROM chunk_files WHERE group_index = ?",
+                                (group_index,)).fetchall()
+        if not rows:
+            return 0.0
+        os.makedirs(group_dir, exist_ok=True)
+        tmp_path = staging_path(group_dir)
+        for name, mtime, chunk_list in rows:
+            path = os.path.join(group_dir, name)
+            if os.path.exists(path):
+                continue  # 上次分块后没有删除或上次已经还原
+            with open(tmp_path, "wb") as f:
+                for digest in json.loads(chunk_list):
+                    f.write(self._read_chunk(digest))
+                f.flush()
+                os.fsync(f.fileno())
+            os.utime(tmp_path, (mtime, mtime))
+            os.replace(tmp_path, path)
+        with self.store.transaction() as conn:
+            self._drop_group(conn, group_index)  # 文件已经还原, 组不再以分块形式保存
+        return time.perf_counter() - start
+
+    def packed_group_stats(self):
+        """以分块形式保存的组的 {组序号: (文件数, 总字节数, 最后修改时间)}"""
+        with self.store.transaction() as conn:
+            rows = conn.execute("SELECT group_index, COUNT(*), SUM(size), MAX(mtime) FROM chunk_files "
+                                "GROUP BY group_index").fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def gc(self):
+        """删除不再被引用的块, 返回删除的块数"""
+        with self.store.transaction() as conn:
+            digests = [row[0] for row in conn.execute("SELECT hash FROM chunks WHERE refs <= 0").fetchall()]
+            conn.execute("DELETE FROM chunks WHERE refs <= 0")
+        for digest in digests:
+            try:
+                os.remove(self._chunk_path(digest))
+            except FileNotFoundError:
+                pass
+        return len(digests)
+
+    def stats(self):
+        """返回分块保存的原始字节数、实际占用字节数和去重比例"""
+        with self.store.transaction() as conn:
+            logical, files = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM chunk_files").fetchone()
+            stored, chunk_count = conn.execute("SELECT COALESCE(SUM(stored_size), 0), COUNT(*) FROM chunks "
+                                               "WHERE refs > 0").fetchone()
+        return {
+            "files": files,
+            "chunks": chunk_count,
+            "logical_bytes": logical,
+            "stored_bytes": stored,
+            "dedupe_ratio": logical / stored if stored else 0.0,
+        }
@@ -0,0 +1,258 @@
+import os
+import time
+import shutil
+import tarfile
+
+from save_index import scan_save_files, staging_path
+from capture_encoder import SCREENSHOT_FORMATS
+from thumbnail_cache import remove_thumbnails
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # 没有 zstandard 时使用标准库的 xz
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cold_groups (
+    group_index INTEGER PRIMARY KEY,
+    archive TEXT NOT NULL,
+    file_count INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL,
+    last_modified REAL NOT NULL,
+    archive_bytes INTEGER NOT NULL,
+    archived_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS group_access (
+    group_index INTEGER PRIMARY KEY,
+    last_access REAL NOT NULL,
+    switch_count INTEGER NOT NULL
+);
+"""
+
+# 默认参数, 可以用 cold_storage 设置覆盖
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "after_days": 30,  # 组内存档和切换记录都超过该天数没有变化时归档
+    "min_bytes": 1024 * 1024,  # 小于该字节数的组不值得归档
+    "format": "zstd",  # zstd 或 xz, 没有安装 zstandard 时使用 xz
+    "level": None,  # 压缩级别, None 使用各格式的默认值
+}
+
+SCREENSHOT_EXTENSIONS = tuple(ext for ext, _ in SCREENSHOT_FORMATS.values())
+SAVES_PREFIX = "saves/"
+IMAGES_PREFIX = "img/"
+COPY_BUFFER = 1024 * 1024
+
+
+def cold_storage_settings(settings):
+    """合并默认参数和 cold_storage 设置"""
+    merged = dict(DEFAULT_SETTINGS)
+    merged.update(settings or {})
+    if merged["format"] == "zstd" and zstandard is None:
+        merged["format"] = "xz"
+    return merged
+
+
+class _ZstdTar:
+    """让 tarfile 以流模式读写 zstd 压缩的文件"""
+
+    def __init__(self, path, mode, level):
+        self.file = open(path, mode + "b")
+        if mode == "w":
+            compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+            self.stream = compressor.stream_writer(self.file)
+        else:
+            self.stream = zstandard.ZstdDecompressor().stream_reader(self.file)
+        self.tar = tarfile.open(fileobj=self.stream, mode=mode + "|")
+
+    def __enter__(self):
+        return self.tar
+
+    def __exit__(self, *exc):
+        try:
+            self.tar.close()
+            self.stream.close()
+        finally:
+            self.file.close()
+
+
+def open_archive(path, mode, fmt, level=None):
+    """以流模式打开组归档, 读写都不需要把整个归档解压到内存或临时文件"""
+    if fmt == "zstd":
+        if zstandard is None:
+            raise OSError("读取 zstd 归档需要安装 zstandard")
+        return _ZstdTar(path, mode, level)
+    if mode == "w" and level is not None:
+        return tarfile.open(path, "w:xz", preset=level)  # 只有非流模式支持指定压缩级别
+    return tarfile.open(path, mode + "|xz")
+
+
+class ColdStorage:
+    """长期没有使用的组连同截图压缩为一个归档, 切换到该组时流式解压"""
+
+    def __init__(self, store, archive_dir, img_dir, settings):
+        self.store = store
+        self.archive_dir = archive_dir
+        self.img_dir = img_dir
+        self.settings = settings
+        os.makedirs(archive_dir, exist_ok=True)
+        with store.transaction() as conn:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    def record_access(self, group_index, now=None):
+        """记录组被切换进或切换出根目录的时间"""
+        now = time.time() if now is None else now
+        with self.store.transaction() as conn:
+            conn.execute("INSERT INTO group_access (group_index, last_access, switch_count) VALUES (?, ?, 1) "
+                         "ON CONFLICT (group_index) DO UPDATE SET last_access = excluded.last_access, "
+                         "switch_count = switch_count + 1", (group_index, now))
+
+    def access_stats(self):
+        """{组序号: (最后访问时间, 切换次数)}"""
+        with self.store.transaction() as conn:
+            rows = conn.execute("SELECT group_index, last_access, switch_count FROM group_access").fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def archived_group_stats(self):
+        """已归档的组的 {组序号: (文件数, 总字节数, 最后修改时间)}"""
+        with self.store.transaction() as conn:
+            rows = conn.execute("SELECT group_index, file_count, total_bytes, last_modified FROM cold_groups").fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def cold_groups(self, group_stats, current_group, now=None):
+        """按清单统计和访问记录选出应该归档的组, 字节数大的优先"""
+        now = time.time() if now is None else now
+        idle_seconds = self.settings["after_days"] * 86400
+        archived = self.archived_group_stats()
+        access = self.access_stats()
+        candidates = []
+        for group_index, (file_count, total_bytes, last_modified) in group_stats.items():
+            if group_index == current_group or group_index in archived or not file_count:
+                continue
+            if total_bytes < self.settings["min_bytes"]:
+                continue
+            last_used = max(last_modified, access.get(group_index, (0.0, 0))[0])
+            if now - last_used >= idle_seconds:
+                candidates.append((total_bytes, group_index))
+        candidates.sort(reverse=True)
+        return [group_index for _, group_index in candidates]
+
+    def _group_screenshots(self, group_index):
+        prefix = f"{group_index}_"
+        try:
+            names = os.listdir(self.img_dir)
+        except OSError:
+            return []
+        return [name for name in names if name.startswith(prefix) and name.endswith(SCREENSHOT_EXTENSIONS)]
+
+    def archive_group(self, group_index, group_dir):
+        """把组文件夹中的存档和组的截图写入归档, 记录提交后删除原文件; 返回 (原始字节数, 归档字节数)
+
+        调用方需要持有组文件锁; 删除原文件失败时还原并取消归档, 抛出 OSError.
+        """
+        files = scan_save_files(group_dir) if os.path.isdir(group_dir) else []
+        if not files:
+            return 0, 0
+        screenshots = self._group_screenshots(group_index)
+        fmt = self.settings["format"]
+        archive_path = os.path.join(self.archive_dir, f"save{group_index}.tar.{'zst' if fmt == 'zstd' else 'xz'}")
+        tmp_path = archive_path + ".tmp"
+        with open_archive(tmp_path, "w", fmt, self.settings["level"]) as tar:
+            for file_info in files:
+                tar.add(file_info['path'], SAVES_PREFIX + file_info['original_name'], recursive=False)
+            for name in screenshots:
+                tar.add(os.path.join(self.img_dir, name), IMAGES_PREFIX + name, recursive=False)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())  # 归档写入磁盘之后才会删除原文件
+        os.replace(tmp_path, archive_path)
+        total_bytes = sum(file_info['size'] for file_info in files)
+        archive_bytes = os.path.getsize(archive_path)
+        with self.store.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO cold_groups (group_index, archive, file_count, total_bytes, "
+                         "last_modified, archive_bytes, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (group_index, os.path.basename(archive_path), len(files), total_bytes,
+                          max(file_info['mtime'] for file_info in files), archive_bytes, time.time()))
+        for path in [file_info['path'] for file_info in files] + [os.path.join(self.img_dir, name) for name in screenshots]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # 不能留下一部分在归档中、一部分在磁盘上的组: 还原已删除的文件并取消归档
+                self.restore_group(group_index, group_dir)
+                raise OSError(f"删除已归档的文件 {os.path.basename(path)} 失败, 已取消归档: {e}") from e
+        for name in screenshots:
+            remove_thumbnails(os.path.join(self.img_dir, name))
+        return total_bytes, archive_bytes
+
+    def restore_group(self, group_index, group_dir):
+        """把归档流式解压到组文件夹和截图目录, 已有的同名文件以磁盘为准; 返回耗时 (秒)
+
+        归档中的每个文件都在磁盘上之后才删除记录和归档, 否则保留归档并抛出 OSError.
+        """
+        start = time.perf_counter()
+        with self.store.transaction() as conn:
+            row = conn.execute("SELECT archive FROM cold_groups WHERE group_index = ?", (group_index,)).fetchone()
+        if row is None:
+            return 0.0
+        archive_path = os.path.join(self.archive_dir, row[0])
+        os.makedirs(group_dir, exist_ok=True)
+        fmt = "zstd" if archive_path.endswith(".zst") else "xz"
+        paths = []
+        try:
+            with open_archive(archive_path, "r", fmt) as tar:
+                for member in tar:
+                    path = self._extract(tar, member, group_dir)
+                    if path is not None:
+                        paths.append(path)
+        except tarfile.TarError as e:
+            raise OSError(f"归档 {row[0]} 已损坏: {e}") from e
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            raise OSError(f"归档 {row[0]} 中有 {len(missing)} 个文件没有还原")
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM cold_groups WHERE group_index = ?", (group_index,))
+        try:
+            os.remove(archive_path)
+        except FileNotFoundError:
+            pass
+        return time.perf_counter() - start
+
+    def _extract(self, tar, member, group_dir):
+        """解压一个成员, 只接受归档时写入的普通文件; 返回成员对应的路径, 已存在的文件不覆盖"""
+        if not member.isfile():
+            return None
+        if member.name.startswith(SAVES_PREFIX):
+            target_dir = group_dir
+        elif member.name.startswith(IMAGES_PREFIX):
+            target_dir = self.img_dir
+        else:
+            return None
+        name = os.path.basename(member.name.split("/", 1)[1])
+        if not name or name in (".", ".."):
+            return None
+        path = os.path.join(target_dir, name)
+        if os.path.exists(path):
+            return path  # 上次还原到一半或归档后又出现的同名文件
+        tmp_path = staging_path(target_dir)
+        with tar.extractfile(member) as source, open(tmp_path, "wb") as f:
+            shutil.copyfileobj(source, f, COPY_BUFFER)
+            f.flush()
+            os.fsync(f.fileno())
+        os.utime(tmp_path, (member.mtime, member.mtime))
+        os.replace(tmp_path, path)
+        return path
+
+    def stats(self):
+        """返回归档的组数、原始字节数和归档字节数"""
+        with self.store.transaction() as conn:
+            groups, logical, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(total_bytes), 0), "
+                                                   "COALESCE(SUM(archive_bytes), 0) FROM cold_groups").fetchone()
+        return {
+            "groups": groups,
+            "logical_bytes": logical,
+            "stored_bytes": stored,
+            "ratio": logical / stored if stored else 0.0,
+        }
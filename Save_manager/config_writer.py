@@ -0,0 +1,84 @@
+import os
+import json
+import threading
+
+
+def write_json_atomic(path, data):
+    """先写入临时文件再替换, 写入过程中崩溃不会损坏原文件, 返回写入的字节数"""
+    content = json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(content)
+
+
+class ConfigWriter:
+    """合并短时间内的多次保存请求, 在等待时间结束后只写入一次"""
+
+    def __init__(self, path, get_data, delay_ms=1000, schedule=None, cancel=None, on_written=None):
+        self.path = path
+        self.get_data = get_data  # 返回需要保存的数据
+        self.on_written = on_written  # 每次实际写入完成后以写入的字节数调用
+        self.delay_ms = delay_ms  # 合并写入的等待时间
+        # schedule(delay_ms, callback) -> 定时器标识, cancel(标识); 默认使用 threading.Timer
+        self.schedule = schedule or self._schedule_timer
+        self.cancel = cancel or (lambda timer: timer.cancel())
+        self.dirty = False
+        self.logical_writes = 0  # 请求保存的次数
+        self.physical_writes = 0  # 实际写入磁盘的次数
+        self.bytes_written = 0
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def _schedule_timer(self, delay_ms, callback):
+        """默认的定时器实现"""
+        timer = threading.Timer(delay_ms / 1000, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def mark_dirty(self):
+        """记录一次保存请求, 等待时间内的多次请求合并为一次写入"""
+        with self._lock:
+            self.logical_writes += 1
+            self.dirty = True
+            if self._timer is None:
+                self._timer = self.schedule(self.delay_ms, self._on_timer)
+
+    def _on_timer(self):
+        """等待时间结束, 写入磁盘"""
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        """立即写入尚未保存的修改"""
+        with self._lock:
+            if self._timer is not None:
+                self.cancel(self._timer)
+                self._timer = None
+            if not self.dirty:
+                return
+            self.dirty = False
+            try:
+                written = write_json_atomic(self.path, self.get_data())
+                self.bytes_written += written
+                self.physical_writes += 1
+                if self.on_written is not None:
+                    self.on_written(written)
+            except Exception as e:
+                self.dirty = True  # 写入失败, 保留修改等待下次写入
+                print(f"保存配置文件失败: {e}")
+
+    def stats(self):
+        """返回逻辑写入与实际写入次数的统计"""
+        with self._lock:
+            return {
+                "logical_writes": self.logical_writes,
+                "physical_writes": self.physical_writes,
+                "bytes_written": self.bytes_written,
+                "pending": self.dirty,
+            }
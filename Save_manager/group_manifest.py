@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+
+from save_index import scan_save_files
+
+GROUP_DIR_PATTERN = re.compile(r'^save(\d+)$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS group_stats (
+    group_index INTEGER PRIMARY KEY,
+    file_count INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL,
+    last_modified REAL NOT NULL
+);
+"""
+
+
+def summarize_files(files):
+    """根据扫描结果统计 (文件数, 总字节数, 最后修改时间)"""
+    total_bytes = sum(file_info['size'] for file_info in files)
+    last_modified = max((file_info['mtime'] for file_info in files), default=0.0)
+    return len(files), total_bytes, last_modified
+
+
+class GroupManifest:
+    """保存在元数据库中的存档组清单, 记录每组的文件数、总字节数和最后修改时间"""
+
+    def __init__(self, store):
+        self.store = store
+        with store.transaction() as conn:
+            conn.execute(SCHEMA)
+            rows = conn.execute("SELECT group_index, file_count, total_bytes, last_modified FROM group_stats").fetchall()
+        self._groups = {row[0]: tuple(row[1:]) for row in rows}  # 组序号 -> (文件数, 总字节数, 最后修改时间)
+        self._lock = threading.RLock()  # 刷新和索引通道的线程会同时更新, 其他线程通过 all_groups 读取副本
+        self._last_group = 1
+        self._recompute_last_group()
+
+    def is_empty(self):
+        """清单是否还没有建立"""
+        with self._lock:
+            return not self._groups
+
+    def all_groups(self):
+        """所有组的 {组序号: (文件数, 总字节数, 最后修改时间)} 副本, 遍历期间不受其他线程更新影响"""
+        with self._lock:
+            return dict(self._groups)
+
+    def get(self, group_index):
+        """获取组的统计信息"""
+        with self._lock:
+            return self._groups.get(group_index, (0, 0, 0.0))
+
+    def file_count(self, group_index):
+        """获取组内的存档数量"""
+        return self.get(group_index)[0]
+
+    def set_stats(self, group_index, stats):
+        """更新组的统计信息, 没有变化时不写入数据库"""
+        with self._lock:
+            if self._groups.get(group_index) == stats:
+                return
+            with self.store.transaction() as conn:
+                conn.execute("INSERT INTO group_stats (group_index, file_count, total_bytes, last_modified) "
+                             "VALUES (?, ?, ?, ?) ON CONFLICT (group_index) DO UPDATE SET "
+                             "file_count = excluded.file_count, total_bytes = excluded.total_bytes, "
+                             "last_modified = excluded.last_modified", (group_index, *stats))
+            self._groups[group_index] = stats
+            if stats[0] > 0:
+                if group_index > self._last_group:
+                    self._last_group = group_index
+            elif group_index == self._last_group:
+                self._recompute_last_group()
+
+    def update_group(self, group_index, files):
+        """根据扫描结果更新组的统计信息"""
+        self.set_stats(group_index, summarize_files(files))
+
+    def _recompute_last_group(self):
+        """重新计算最后一个有存档的组"""
+        self._last_group = max((group_index for group_index, stats in self._groups.items() if stats[0] > 0),
+                               default=1)
+
+    def last_group_with_saves(self):
+        """获取最后有存档的组, 没有时为 1"""
+        return self._last_group
+
+    def rebuild(self, save_dir, current_group, ignored_paths=None, packed_groups=None):
+        """从磁盘重新统计所有组, 当前组的存档在根目录中; packed_groups 为不在磁盘上的组的统计信息"""
+        groups = dict(packed_groups or {})
+        groups[current_group] = summarize_files(scan_save_files(save_dir, ignored_paths))
+        with os.scandir(save_dir) as entries:
+            for entry in entries:
+                match = GROUP_DIR_PATTERN.match(entry.name)
+                if match and entry.is_dir():
+                    group_index = int(match.group(1))
+                    if group_index == current_group:
+                        continue
+                    stats = summarize_files(scan_save_files(entry.path))
+                    if stats[0] or group_index not in groups:
+                        groups[group_index] = stats
+        with self._lock:
+            with self.store.transaction() as conn:
+                conn.execute("DELETE FROM group_stats")
+                conn.executemany("INSERT INTO group_stats (group_index, file_count, total_bytes, last_modified) "
+                                 "VALUES (?, ?, ?, ?)", [(group_index, *stats) for group_index, stats in groups.items()])
+            self._groups = groups
+            self._recompute_last_group()
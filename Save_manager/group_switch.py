@@ -0,0 +1,262 @@
+import os
+import json
+import errno
+import time
+import threading
+import concurrent.futures
+
+
+class GroupSwitchError(Exception):
+    """组切换失败, 已完成的重命名已经回滚; stuck 为未能恢复原位置的文件"""
+
+    def __init__(self, message, stuck=()):
+        super().__init__(message)
+        self.stuck = list(stuck)
+
+
+class SwitchPlan:
+    """一次组切换需要执行的全部重命名, 在执行前一次性规划好"""
+
+    def __init__(self, moves_out, moves_in):
+        self.moves_out = moves_out  # 根目录 -> save{旧组} 的 [(源路径, 目标路径), ...]
+        self.moves_in = moves_in  # save{目标组} -> 根目录 的 [(源路径, 目标路径), ...]
+
+    def __len__(self):
+        return len(self.moves_out) + len(self.moves_in)
+
+
+def plan_group_switch(save_dir, old_group_dir, target_group_dir, root_files, target_files):
+    """根据扫描结果规划重命名, 目标已存在或跨磁盘时在移动任何文件之前报错"""
+    device = os.stat(save_dir).st_dev
+    if os.stat(old_group_dir).st_dev != device or os.stat(target_group_dir).st_dev != device:
+        raise GroupSwitchError("存档组文件夹与存档目录不在同一磁盘, 无法直接重命名")
+    moves_out = [(f['path'], os.path.join(old_group_dir, f['original_name'])) for f in root_files]
+    moved_out = set(src for src, _ in moves_out)
+    moves_in = [(f['path'], os.path.join(save_dir, f['original_name'])) for f in target_files]
+    for _, dst in moves_out:
+        if os.path.lexists(dst):
+            raise GroupSwitchError(f"目标文件已存在: {dst}")
+    for _, dst in moves_in:
+        if dst not in moved_out and os.path.lexists(dst):
+            raise GroupSwitchError(f"目标文件已存在: {dst}")
+    return SwitchPlan(moves_out, moves_in)
+
+
+def rename_no_replace(src, dst):
+    """同盘重命名, 目标已存在时抛出 FileExistsError 而不是覆盖 (例如切换期间游戏写入的同名存档)"""
+    if os.name == "nt":
+        os.rename(src, dst)  # Windows 的 rename 不覆盖已有文件
+        return
+    try:
+        os.link(src, dst)  # POSIX 的 rename 会直接替换目标, 先建立硬链接, 目标存在时失败
+    except FileExistsError:
+        if not os.path.samefile(src, dst):
+            raise
+        # 上次在建立链接后中断, 两个名字指向同一文件, 删除源即完成移动
+    except OSError:
+        # 不支持硬链接的文件系统, 移动前再检查一次
+        if os.path.lexists(dst):
+            raise FileExistsError(errno.EEXIST, "目标文件已存在", dst)
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+
+class SwitchJournal:
+    """组切换的预写日志: 先记录全部计划移动, 每批完成后追加记录, 切换完成后删除
+
+    第一行是计划 {"old_group", "target_group", "moves_out", "moves_in"},
+    之后每行是 {"done": [移动序号, ...]} 或 {"rollback": true}, 移动序号先移出后移入连续编号.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        """追加一行记录并刷到磁盘"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def begin(self, old_group, target_group, plan):
+        """在移动任何文件之前写入完整计划"""
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({"old_group": old_group, "target_group": target_group,
+                     "moves_out": plan.moves_out, "moves_in": plan.moves_in})
+
+    def mark_done(self, indexes):
+        """记录一批已完成的移动"""
+        with self._lock:
+            self._write({"done": indexes})
+
+    def mark_rollback(self):
+        """记录切换失败, 开始回滚"""
+        with self._lock:
+            self._write({"rollback": True})
+
+    def close(self, remove=True):
+        """切换完成 (或已回滚) 后删除日志"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def _is_moved(src, dst):
+    """根据文件系统判断一次移动是否已经完成"""
+    return os.path.lexists(dst) and not os.path.lexists(src)
+
+
+def recover_group_switch(journal_path):
+    """处理未完成的组切换, 能继续完成则继续, 否则回滚; 返回根目录实际所属的组, 没有日志时为 None
+
+    回滚仍不完整时保留日志并抛出 OSError.
+    """
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break  # 崩溃时写了一半的最后一行
+    if not records or "moves_out" not in records[0]:
+        print("组切换日志已损坏, 忽略")
+        os.remove(journal_path)
+        return None
+    header = records[0]
+    moves = [tuple(move) for move in header["moves_out"] + header["moves_in"]]
+    done = set()
+    rollback = False
+    for record in records[1:]:
+        done.update(record.get("done", ()))
+        rollback = rollback or record.get("rollback", False)
+    # 未标记的移动可能在写入标记前已经完成; 移出阶段全部完成后才开始移入, 所以逐个检查不会混淆
+    done.update(i for i, (src, dst) in enumerate(moves) if i not in done and _is_moved(src, dst))
+
+    result = header["target_group"]
+    if not rollback:
+        try:
+            for i, (src, dst) in enumerate(moves):
+                if i not in done:
+                    rename_no_replace(src, dst)
+                    done.add(i)
+        except OSError as e:
+            print(f"继续组切换失败, 回滚: {e}")
+            rollback = True
+    if rollback:
+        result = header["old_group"]
+        stuck = []
+        for i in sorted(done, reverse=True):
+            src, dst = moves[i]
+            if not os.path.lexists(dst):
+                continue  # 中断前已经撤销
+            try:
+                rename_no_replace(dst, src)
+            except OSError as e:
+                print(f"回滚 {os.path.basename(dst)} 失败: {e}")
+                stuck.append(dst)
+        if stuck:
+            # 日志是这些文件原位置的唯一记录, 保留到下次恢复
+            raise OSError(f"{len(stuck)} 个文件未能恢复原位置, 保留组切换日志")
+    os.remove(journal_path)
+    action = "回滚到" if rollback else "完成切换到"
+    print(f"已恢复中断的组切换: {action}第{result}组")
+    return result
+
+
+class GroupSwitcher:
+    """只使用同一文件系统内的重命名执行组切换, 分批并行, 不覆盖已有文件, 失败时回滚"""
+
+    def __init__(self, max_workers=4, batch_size=256):
+        self.max_workers = max_workers
+        self.batch_size = batch_size  # 每个批次的重命名数量
+        self.timings = {}  # 最近一次切换各阶段的耗时 (秒)
+
+    def _run_batches(self, moves, first_index, done, failed, journal):
+        """分批并行重命名, 成功的移动记录到 done, 第一个失败记录到 failed, 每批完成后写入日志"""
+        indexed = list(enumerate(moves, first_index))
+        batches = [indexed[i:i + self.batch_size] for i in range(0, len(indexed), self.batch_size)]
+        lock = threading.Lock()
+
+        def run(batch):
+            completed = []
+            try:
+                for index, (src, dst) in batch:
+                    if failed:
+                        return  # 其他批次已经失败, 不再继续
+                    try:
+                        rename_no_replace(src, dst)
+                    except OSError as e:
+                        with lock:
+                            failed.append((src, e))
+                        return
+                    completed.append(index)
+                    with lock:
+                        done.append((src, dst))
+            finally:
+                if journal is not None and completed:
+                    journal.mark_done(completed)
+
+        if len(batches) <= 1 or self.max_workers <= 1:
+            for batch in batches:
+                run(batch)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                       thread_name_prefix="group-switch") as executor:
+                list(executor.map(run, batches))
+
+    def _rollback(self, done):
+        """按相反顺序撤销已完成的重命名, 返回无法撤销的文件"""
+        stuck = []
+        for src, dst in reversed(done):
+            try:
+                rename_no_replace(dst, src)
+            except OSError as e:
+                print(f"回滚 {os.path.basename(dst)} 失败: {e}")
+                stuck.append(dst)
+        return stuck
+
+    def plan(self, save_dir, old_group_dir, target_group_dir, root_files, target_files):
+        """规划一次组切换, 同时开始记录新的各阶段耗时"""
+        self.timings = {}
+        start = time.perf_counter()
+        plan = plan_group_switch(save_dir, old_group_dir, target_group_dir, root_files, target_files)
+        self.timings["plan"] = time.perf_counter() - start
+        return plan
+
+    def execute(self, plan, journal=None):
+        """执行规划好的重命名, 先移出根目录再移入, 任何一步失败都回滚全部移动
+
+        传入 journal 时每批完成后写入日志, 进程中途退出后由 recover_group_switch 恢复.
+        """
+        done = []
+        failed = []
+        phases = (("move_out", plan.moves_out, 0), ("move_in", plan.moves_in, len(plan.moves_out)))
+        for phase, moves, first_index in phases:
+            start = time.perf_counter()
+            self._run_batches(moves, first_index, done, failed, journal)
+            self.timings[phase] = time.perf_counter() - start
+            if failed:
+                break
+        if failed:
+            if journal is not None:
+                journal.mark_rollback()
+            start = time.perf_counter()
+            stuck = self._rollback(done)
+            self.timings["rollback"] = time.perf_counter() - start
+            src, error = failed[0]
+            message = f"移动文件 {os.path.basename(src)} 失败: {error}"
+            if stuck:
+                message += f"; {len(stuck)} 个文件未能恢复原位置"
+            raise GroupSwitchError(message, stuck) from error
+        return self.timings
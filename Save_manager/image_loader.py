@@ -0,0 +1,70 @@
+import concurrent.futures
+
+from thumbnail_cache import load_scaled
+
+
+class ImageDecodePool:
+    """在后台线程中解码和缩放截图, 完成后通过 root.after 交回 Tk 主线程"""
+
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-decode")
+        self.generation = 0  # 每次新的显示请求加一, 旧请求的结果不再显示
+        self._futures = []  # 当前代的请求 (包括预取)
+        self._closed = False
+
+    def cancel_pending(self):
+        """取消尚未开始的旧请求, 已经开始的请求结果会被丢弃"""
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+
+    def _submit(self, key, img_path, target_size, callback, generation):
+        """提交一个解码任务, 完成后在主线程中调用 callback(key, image, generation)"""
+        future = self.executor.submit(load_scaled, img_path, target_size[0], target_size[1])
+
+        def done(f):
+            if f.cancelled() or self._closed:
+                return
+            try:
+                self.root.after(0, self._deliver, f, key, callback, generation)
+            except RuntimeError:
+                pass  # 主窗口已经关闭
+
+        future.add_done_callback(done)
+        self._futures.append(future)
+
+    def _deliver(self, future, key, callback, generation):
+        """在主线程中把解码结果交给回调"""
+        try:
+            image = future.result()
+        except Exception as e:
+            print(f"Error loading image {key[0]}: {e}")
+            image = None
+        callback(key, image, generation)
+
+    def start_generation(self):
+        """选中项变化时调用, 之前尚未完成的请求全部作废"""
+        self.generation += 1
+        self.cancel_pending()
+        return self.generation
+
+    def request(self, key, img_path, target_size, callback):
+        """请求显示一张截图"""
+        generation = self.start_generation()
+        self._submit(key, img_path, target_size, callback, generation)
+        return generation
+
+    def prefetch(self, items, callback):
+        """预取截图 [(key, 路径, 目标尺寸), ...], 选中项变化时会被取消"""
+        for key, img_path, target_size in items:
+            self._submit(key, img_path, target_size, callback, self.generation)
+
+    def is_current(self, generation):
+        """判断请求是否仍是最新的"""
+        return generation == self.generation
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,166 @@
+import math
+import time
+import functools
+import threading
+import contextlib
+import collections
+
+from config_writer import write_json_atomic
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+def percentile(sorted_values, fraction):
+    """已排序数据的最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class _Timer:
+    """一个命名计时器: 调用次数、总耗时和最近若干次耗时"""
+
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = collections.deque(maxlen=window)  # 最近的耗时 (秒), 用于计算百分位数
+
+
+class _Phase:
+    """with 块结束时把耗时记入计时器"""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """热点操作的命名计时器和计数器; 未启用时不包装任何方法, phase 返回共享的空上下文"""
+
+    def __init__(self, enabled=False, window=1024):
+        self.enabled = enabled
+        self.window = window  # 每个计时器保留的最近耗时数, 百分位数只按这些计算
+        self.timers = {}  # 名称 -> _Timer
+        self.counters = collections.Counter()
+        self.started = time.time()
+        self._wrapped = {}  # id(对象) -> (对象, 方法名列表)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        """记录一次耗时"""
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = _Timer(self.window)
+            timer.count += 1
+            timer.total += seconds
+            timer.max = max(timer.max, seconds)
+            timer.recent.append(seconds)
+
+    def count(self, name, amount=1):
+        """增加计数器, 例如写入的字节数"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += amount
+
+    def phase(self, name):
+        """计时的 with 块; 未启用时返回共享的空上下文"""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def instrument(self, obj, names):
+        """用计时包装对象上的方法 (作为实例属性), 计时器名称与方法名相同"""
+        wrapped = []
+        for name in names:
+            method = getattr(obj, name)
+
+            def timed(*args, _method=method, _name=name, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    self.record(_name, time.perf_counter() - start)
+
+            setattr(obj, name, functools.wraps(method)(timed))
+            wrapped.append(name)
+        self._wrapped[id(obj)] = (obj, wrapped)
+
+    def uninstrument(self):
+        """移除所有包装, 恢复类中定义的方法"""
+        for obj, names in self._wrapped.values():
+            for name in names:
+                obj.__dict__.pop(name, None)
+        self._wrapped = {}
+
+    def set_enabled(self, enabled, *targets):
+        """开启或关闭统计, 开启时包装 targets 中每个 (对象, 方法名列表), 关闭时移除包装"""
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            for obj, names in targets:
+                self.instrument(obj, names)
+        else:
+            self.uninstrument()
+
+    def reset(self):
+        """清空所有计时器和计数器"""
+        with self._lock:
+            self.timers = {}
+            self.counters = collections.Counter()
+            self.started = time.time()
+
+    def snapshot(self):
+        """返回 {"timers": {名称: 统计}, "counters": {名称: 数值}}, 耗时单位为毫秒"""
+        with self._lock:
+            timers = {name: (timer.count, timer.total, timer.max, sorted(timer.recent))
+                      for name, timer in self.timers.items()}
+            counters = dict(self.counters)
+        result = {}
+        for name, (count, total, longest, recent) in sorted(timers.items()):
+            result[name] = {
+                "count": count,
+                "p50_ms": percentile(recent, 0.50) * 1000,
+                "p95_ms": percentile(recent, 0.95) * 1000,
+                "max_ms": longest * 1000,
+                "total_ms": total * 1000,
+            }
+        return {"since": self.started, "timers": result, "counters": counters}
+
+    def dump_json(self, path, extra=None):
+        """把当前统计写入 JSON 文件, extra 为附加的组件统计"""
+        data = self.snapshot()
+        if extra:
+            data.update(extra)
+        return write_json_atomic(path, data)
+
+    def format_table(self):
+        """调试面板中显示的文本表格"""
+        data = self.snapshot()
+        lines = [f"{'名称':<40}{'次数':>8}{'p50ms':>10}{'p95ms':>10}{'最大ms':>10}{'总ms':>12}"]
+        for name, stats in data["timers"].items():
+            lines.append(f"{name:<40}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                         f"{stats['max_ms']:>10.2f}{stats['total_ms']:>12.1f}")
+        if data["counters"]:
+            lines.append("")
+            for name, value in sorted(data["counters"].items()):
+                lines.append(f"{name:<40}{value:>12}")
+        return "\n".join(lines)
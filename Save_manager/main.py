@@ -4,9 +4,52 @@ import os
 import shutil
 import subprocess
 import json
-import psutil
 import time
 
+# 启动存档管理器时需要复制到存档路径的文件
+SAVE_MANAGER_FILES = [
+    "get_title.py",
+    "save_manager.py",
+    "save_index.py",
+    "save_watcher.py",
+    "tree_reconciler.py",
+    "virtual_list.py",
+    "thumbnail_cache.py",
+    "image_loader.py",
+    "config_writer.py",
+    "metadata_store.py",
+    "group_manifest.py",
+    "group_switch.py",
+    "task_scheduler.py",
+    "capture_encoder.py",
+    "capture_backend.py",
+    "stable_capture.py",
+    "screenshot_index.py",
+    "chunk_store.py",
+    "save_fingerprints.py",
+    "cold_storage.py",
+    "instrumentation.py",
+    "save_engine.py",
+    "bulk_ops.py",
+    "save_search.py",
+    "save_cli.py",
+    "startup_snapshot.py",
+]
+
+
+def copy_if_changed(src, dst_dir):
+    """复制到目标目录, 大小和修改时间都相同时跳过; 保留修改时间, 存档目录中已编译的 .pyc 不会失效"""
+    dst = os.path.join(dst_dir, os.path.basename(src))
+    src_stat = os.stat(src)
+    try:
+        dst_stat = os.stat(dst)
+        if dst_stat.st_size == src_stat.st_size and int(dst_stat.st_mtime) == int(src_stat.st_mtime):
+            return False
+    except FileNotFoundError:
+        pass
+    shutil.copy2(src, dst)
+    return True
+
 class MainApp:
     def __init__(self, root):
         self.root = root
@@ -204,10 +247,10 @@ class MainApp:
         # 获取当前脚本的目录
         current_dir = os.path.dirname(os.path.abspath(__file__))
 
-        # 复制 get_title.py 和 save_manager.py 到存档路径
+        # 复制 get_title.py、save_manager.py 及其依赖模块到存档路径, 没有变化的文件不再复制
         try:
-            shutil.copy(os.path.join(current_dir, "get_title.py"), save_path)
-            shutil.copy(os.path.join(current_dir, "save_manager.py"), save_path)
+            for file_name in SAVE_MANAGER_FILES:
+                copy_if_changed(os.path.join(current_dir, file_name), save_path)
         except Exception as e:
             messagebox.showerror("错误", f"复制文件失败: {e}")
             return
@@ -0,0 +1,383 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import contextlib
+
+# 每个存档的标记字段, 保存在 flags 表中; NULL 表示配置中没有该字段
+FLAG_FIELDS = ("important", "ignore", "indent", "is_new")
+
+# save_config.json 中由专门的表保存的顶层字段, 其余字段保存在 settings 表中
+TABLE_KEYS = ("groups", "group_names", "selected_files")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    group_key TEXT PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS saves (
+    id INTEGER PRIMARY KEY,
+    group_key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    extra TEXT,
+    UNIQUE (group_key, path)
+);
+CREATE INDEX IF NOT EXISTS saves_path ON saves (path);
+CREATE TABLE IF NOT EXISTS notes (
+    save_id INTEGER PRIMARY KEY REFERENCES saves (id) ON DELETE CASCADE,
+    note TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flags (
+    save_id INTEGER PRIMARY KEY REFERENCES saves (id) ON DELETE CASCADE,
+    important INTEGER,
+    ignore INTEGER,
+    indent INTEGER,
+    is_new INTEGER
+);
+CREATE INDEX IF NOT EXISTS flags_ignore ON flags (ignore) WHERE ignore = 1;
+CREATE TABLE IF NOT EXISTS selections (
+    group_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (group_key, position)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class MetadataStore:
+    """基于 SQLite 的存档元数据存储, 单个存档的修改只写入对应的行"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._depth = 0  # 嵌套事务层数
+        self._observers = []  # 元数据变化的回调, 例如搜索索引
+        self._pending = []  # 事务中产生的通知, 提交后发出, 回滚时丢弃
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.conn.close()
+
+    def add_observer(self, callback):
+        """注册元数据变化的回调 callback(kind, group_key, data)
+
+        kind 为 "fields" (data 为 (字段, {路径: 值})), "delete" (路径列表), "move" ((目标组, 路径列表)),
+        "group_name" (组名) 或 "reset" (整体导入); 回调在写入的线程中调用, 不应再访问数据库
+        """
+        self._observers.append(callback)
+
+    def _notify(self, kind, group_key, data=None):
+        """发出修改通知; 在事务中时等到最外层事务提交后再发出"""
+        with self._lock:
+            if self._depth:
+                self._pending.append((kind, group_key, data))
+                return
+        self._dispatch([(kind, group_key, data)])
+
+    def _dispatch(self, notifications):
+        for kind, group_key, data in notifications:
+            for callback in self._observers:
+                callback(kind, group_key, data)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """事务上下文, 可以嵌套, 最外层结束时提交; 事务中的修改通知在提交后 (锁外) 发出"""
+        with self._lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self.conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pending = []
+                    self.conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth:
+                return
+            self.conn.execute("COMMIT")
+            notifications, self._pending = self._pending, []
+        self._dispatch(notifications)
+
+    # ---- 存档元数据 ----
+
+    def _save_id(self, conn, group_key, path, create=True):
+        """获取存档行的 id, 不存在时按需创建"""
+        row = conn.execute("SELECT id FROM saves WHERE group_key = ? AND path = ?", (group_key, path)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        conn.execute("INSERT OR IGNORE INTO groups (group_key) VALUES (?)", (group_key,))
+        return conn.execute("INSERT INTO saves (group_key, path) VALUES (?, ?)", (group_key, path)).lastrowid
+
+    def _row_to_info(self, note, important, ignore, indent, is_new, extra):
+        """将查询结果转换为与 save_config.json 相同的字典格式"""
+        info = json.loads(extra) if extra else {}
+        if note is not None:
+            info["note"] = note
+        for field, value in zip(FLAG_FIELDS, (important, ignore, indent, is_new)):
+            if value is not None:
+                info[field] = value if field == "indent" else bool(value)
+        return info
+
+    _SELECT_SAVES = """
+        SELECT s.path, n.note, f.important, f.ignore, f.indent, f.is_new, s.extra
+        FROM saves s
+        LEFT JOIN notes n ON n.save_id = s.id
+        LEFT JOIN flags f ON f.save_id = s.id
+    """
+
+    def get_save(self, group_key, path):
+        """获取单个存档的元数据"""
+        with self._lock:
+            row = self.conn.execute(self._SELECT_SAVES + " WHERE s.group_key = ? AND s.path = ?",
+                                    (str(group_key), path)).fetchone()
+        return self._row_to_info(*row[1:]) if row else {}
+
+    def get_group_saves(self, group_key):
+        """获取一个组所有存档的元数据 {路径: 元数据}"""
+        with self._lock:
+            rows = self.conn.execute(self._SELECT_SAVES + " WHERE s.group_key = ?", (str(group_key),)).fetchall()
+        return {row[0]: self._row_to_info(*row[1:]) for row in rows}
+
+    def set_field(self, group_key, path, field, value):
+        """设置单个存档的一个字段"""
+        group_key = str(group_key)
+        with self.transaction() as conn:
+            save_id = self._save_id(conn, group_key, path)
+            if field == "note":
+                conn.execute("INSERT INTO notes (save_id, note) VALUES (?, ?) "
+                             "ON CONFLICT (save_id) DO UPDATE SET note = excluded.note", (save_id, value))
+            elif field in FLAG_FIELDS:
+                conn.execute(f"INSERT INTO flags (save_id, {field}) VALUES (?, ?) "
+                             f"ON CONFLICT (save_id) DO UPDATE SET {field} = excluded.{field}", (save_id, value))
+            else:
+                row = conn.execute("SELECT extra FROM saves WHERE id = ?", (save_id,)).fetchone()
+                extra = json.loads(row[0]) if row[0] else {}
+                extra[field] = value
+                conn.execute("UPDATE saves SET extra = ? WHERE id = ?", (json.dumps(extra, ensure_ascii=False), save_id))
+        self._notify("fields", group_key, (field, {path: value}))
+
+    def set_fields(self, group_key, field, values):
+        """一次写入一批存档的同一字段, values 为 {路径: 值}"""
+        group_key = str(group_key)
+        if field != "note" and field not in FLAG_FIELDS:
+            with self.transaction():
+                for path, value in values.items():
+                    self.set_field(group_key, path, field, value)
+            return
+        table, column = ("notes", "note") if field == "note" else ("flags", field)
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO groups (group_key) VALUES (?)", (group_key,))
+            conn.executemany("INSERT OR IGNORE INTO saves (group_key, path) VALUES (?, ?)",
+                             [(group_key, path) for path in values])
+            conn.executemany(f"INSERT INTO {table} (save_id, {column}) "
+                             f"SELECT id, ? FROM saves WHERE group_key = ? AND path = ? "
+                             f"ON CONFLICT (save_id) DO UPDATE SET {column} = excluded.{column}",
+                             [(value, group_key, path) for path, value in values.items()])
+        self._notify("fields", group_key, (field, values))
+
+    def delete_save(self, group_key, path):
+        """删除存档的元数据"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM saves WHERE group_key = ? AND path = ?", (str(group_key), path))
+        self._notify("delete", str(group_key), [path])
+
+    def delete_saves(self, group_key, paths):
+        """删除一批存档的元数据和选中记录"""
+        group_key = str(group_key)
+        rows = [(group_key, path) for path in paths]
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM saves WHERE group_key = ? AND path = ?", rows)
+            conn.executemany("DELETE FROM selections WHERE group_key = ? AND path = ?", rows)
+        self._notify("delete", group_key, paths)
+
+    def move_saves(self, group_key, target_key, paths):
+        """把一批存档的元数据移到另一组, 目标组中同路径的旧记录被替换"""
+        group_key, target_key = str(group_key), str(target_key)
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO groups (group_key) VALUES (?)", (target_key,))
+            conn.executemany("DELETE FROM saves WHERE group_key = ? AND path = ?", [(target_key, path) for path in paths])
+            conn.executemany("UPDATE saves SET group_key = ? WHERE group_key = ? AND path = ?",
+                             [(target_key, group_key, path) for path in paths])
+            conn.executemany("DELETE FROM selections WHERE group_key = ? AND path = ?",
+                             [(group_key, path) for path in paths])
+        self._notify("move", group_key, (target_key, paths))
+
+    def get_all_saves(self):
+        """一次读取所有组的存档元数据 {组: {路径: 元数据}}"""
+        with self._lock:
+            rows = self.conn.execute(self._SELECT_SAVES.replace("SELECT s.path", "SELECT s.group_key, s.path")).fetchall()
+        result = {}
+        for row in rows:
+            result.setdefault(row[0], {})[row[1]] = self._row_to_info(*row[2:])
+        return result
+
+    def get_notes(self):
+        """所有组中有备注的存档 [(组, 路径, 备注), ...]"""
+        with self._lock:
+            return self.conn.execute("SELECT s.group_key, s.path, n.note FROM notes n "
+                                     "JOIN saves s ON s.id = n.save_id").fetchall()
+
+    def ignored_paths(self):
+        """获取所有组中被标记为忽略的存档路径"""
+        with self._lock:
+            rows = self.conn.execute("SELECT DISTINCT s.path FROM flags f JOIN saves s ON s.id = f.save_id "
+                                     "WHERE f.ignore = 1").fetchall()
+        return set(row[0] for row in rows)
+
+    # ---- 选中项、组名和设置 ----
+
+    def get_selection(self, group_key):
+        """获取组内保存的选中项"""
+        with self._lock:
+            rows = self.conn.execute("SELECT path FROM selections WHERE group_key = ? ORDER BY position",
+                                     (str(group_key),)).fetchall()
+        return [row[0] for row in rows]
+
+    def set_selection(self, group_key, paths):
+        """保存组内的选中项"""
+        group_key = str(group_key)
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM selections WHERE group_key = ?", (group_key,))
+            conn.executemany("INSERT INTO selections (group_key, position, path) VALUES (?, ?, ?)",
+                             [(group_key, i, path) for i, path in enumerate(paths)])
+
+    def get_group_name(self, group_key):
+        """获取组名"""
+        with self._lock:
+            row = self.conn.execute("SELECT name FROM groups WHERE group_key = ?", (str(group_key),)).fetchone()
+        return row[0] if row and row[0] is not None else ""
+
+    def set_group_name(self, group_key, name):
+        """修改组名"""
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO groups (group_key, name) VALUES (?, ?) "
+                         "ON CONFLICT (group_key) DO UPDATE SET name = excluded.name", (str(group_key), name))
+        self._notify("group_name", str(group_key), name)
+
+    def get_group_names(self):
+        """所有有名称的组 {组: 组名}"""
+        with self._lock:
+            return dict(self.conn.execute("SELECT group_key, name FROM groups WHERE name IS NOT NULL"))
+
+    def get_setting(self, key, default=None):
+        """读取设置项"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_setting(self, key, value):
+        """保存设置项"""
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO settings (key, value) VALUES (?, ?) "
+                         "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                         (key, json.dumps(value, ensure_ascii=False)))
+
+    def delete_setting(self, key):
+        """删除设置项"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM settings WHERE key = ?", (key,))
+
+    # ---- 与 save_config.json 互相转换 ----
+
+    def import_json(self, data):
+        """用 save_config.json 格式的数据替换全部内容"""
+        with self.transaction() as conn:
+            for table in ("selections", "notes", "flags", "saves", "groups"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute("DELETE FROM settings WHERE key NOT LIKE 'internal:%'")
+            for group_key, name in data.get("group_names", {}).items():
+                self.set_group_name(group_key, name)
+            for group_key, group_files in data.get("groups", {}).items():
+                conn.execute("INSERT OR IGNORE INTO groups (group_key) VALUES (?)", (str(group_key),))
+                for path, info in group_files.items():
+                    save_id = self._save_id(conn, str(group_key), path)
+                    extra = {k: v for k, v in info.items() if k != "note" and k not in FLAG_FIELDS}
+                    if extra:
+                        conn.execute("UPDATE saves SET extra = ? WHERE id = ?",
+                                     (json.dumps(extra, ensure_ascii=False), save_id))
+                    if "note" in info:
+                        conn.execute("INSERT INTO notes (save_id, note) VALUES (?, ?)", (save_id, info["note"]))
+                    flags = [info.get(field) for field in FLAG_FIELDS]
+                    if any(value is not None for value in flags):
+                        conn.execute("INSERT INTO flags (save_id, important, ignore, indent, is_new) "
+                                     "VALUES (?, ?, ?, ?, ?)", (save_id, *flags))
+            for group_key, paths in data.get("selected_files", {}).items():
+                self.set_selection(group_key, paths)
+            for key, value in data.items():
+                if key not in TABLE_KEYS:
+                    self.set_setting(key, value)
+        self._notify("reset", None)
+
+    def export_json(self):
+        """导出为 save_config.json 格式的数据"""
+        with self._lock:
+            data = {}
+            for key, value in self.conn.execute("SELECT key, value FROM settings ORDER BY key"):
+                if not key.startswith("internal:"):
+                    data[key] = json.loads(value)
+            data["groups"] = {}
+            for (group_key,) in self.conn.execute("SELECT group_key FROM groups ORDER BY rowid").fetchall():
+                group_saves = self.get_group_saves(group_key)
+                if group_saves:
+                    data["groups"][group_key] = group_saves
+            data["group_names"] = {group_key: name for group_key, name in
+                                   self.conn.execute("SELECT group_key, name FROM groups WHERE name IS NOT NULL "
+                                                     "ORDER BY rowid")}
+            data["selected_files"] = {}
+            for (group_key,) in self.conn.execute("SELECT DISTINCT group_key FROM selections").fetchall():
+                data["selected_files"][group_key] = self.get_selection(group_key)
+        return data
+
+    def sync_from_json(self, json_path):
+        """首次使用或 save_config.json 被外部修改时, 将它导入数据库
+
+        导出有延迟, 崩溃时 JSON 可能落后于数据库, 所以只有内容与上次导出 (或导入) 的不同时才导入;
+        修改时间没有变化时不读取文件.
+        """
+        try:
+            mtime = os.stat(json_path).st_mtime_ns
+        except OSError:
+            return False
+        if self.get_setting("internal:json_mtime_ns") == mtime:
+            return False
+        with open(json_path, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if self.get_setting("internal:json_sha256") == digest:
+            self.set_setting("internal:json_mtime_ns", mtime)  # 只是被 touch 或重新写入了相同内容
+            return False
+        data = json.loads(content.decode("utf-8"))
+        with self.transaction():
+            self.import_json(data)
+            self.set_setting("internal:json_mtime_ns", mtime)
+            self.set_setting("internal:json_sha256", digest)
+        print(f"已从 {os.path.basename(json_path)} 导入存档配置")
+        return True
+
+    def mark_json_exported(self, json_path):
+        """记录导出后的 JSON 文件修改时间和内容哈希, 避免下次启动时重复导入"""
+        try:
+            mtime = os.stat(json_path).st_mtime_ns
+            with open(json_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return
+        with self.transaction():
+            self.set_setting("internal:json_mtime_ns", mtime)
+            self.set_setting("internal:json_sha256", digest)
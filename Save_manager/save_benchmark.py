@@ -0,0 +1,392 @@
+"""存档管理基准: 生成合成存档目录, 在没有显示器的环境中运行 SaveManagerApp 的热点操作, 以 JSON 报告耗时、系统调用和峰值内存
+
+用法: python save_benchmark.py --groups 20 --files 500 --output result.json
+      python save_benchmark.py --files 2000 --baseline result.json  # 与保存的结果对比, 变慢超过 --tolerance 时返回 1
+Tk 控件由不创建窗口的替身代替, 不需要显示器.
+"""
+import io
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import threading
+import contextlib
+import statistics
+
+# 只记录文件系统相关的审计事件, 审计钩子无法移除, 由 _audit_counts 是否为 None 控制是否计数
+AUDIT_EVENTS = ("open", "os.scandir", "os.listdir", "os.rename", "os.remove", "os.mkdir", "os.utime",
+                "os.link", "shutil.move", "shutil.copyfile", "sqlite3.connect")
+_audit_counts = None
+
+
+def _audit_hook(event, args):
+    counts = _audit_counts
+    if counts is not None and event in AUDIT_EVENTS:
+        counts[event] = counts.get(event, 0) + 1
+
+
+def read_proc_io():
+    """Linux 上进程累计的读写系统调用次数, 其他系统返回 None"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["syscr"]), int(fields["syscw"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+# ---- 合成存档目录 ----
+
+def generate_save_tree(save_dir, groups=10, files_per_group=200, pattern="save{num}.dat", file_size=64 * 1024,
+                       metadata_density=0.3, screenshot_size=(1280, 720), screenshot_ratio=1.0, seed=0):
+    """生成合成存档目录: 第 1 组在根目录, 其余组在 saveN 文件夹中, 截图在 img 中, 元数据写入数据库"""
+    from PIL import Image  # 启动基准在子进程中导入本模块的替身, 不应提前载入 PIL 和 sqlite3
+    from metadata_store import MetadataStore
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(save_dir, "img"), exist_ok=True)
+    payload = bytes(rng.getrandbits(8) for _ in range(min(file_size, 4096)))
+    payload = (payload * (file_size // len(payload) + 1))[:file_size] if payload else b""
+    screenshot = b""
+    if screenshot_ratio > 0:
+        buffer = io.BytesIO()
+        Image.effect_noise(screenshot_size, 64).convert("RGB").save(buffer, "JPEG", quality=80)
+        screenshot = buffer.getvalue()
+    now = time.time()
+    store = MetadataStore(os.path.join(save_dir, "save_metadata.db"))
+    try:
+        with store.transaction():
+            for group_index in range(1, groups + 1):
+                group_dir = save_dir if group_index == 1 else os.path.join(save_dir, f"save{group_index}")
+                os.makedirs(group_dir, exist_ok=True)
+                for num in range(1, files_per_group + 1):
+                    name = pattern.format(num=num)
+                    path = os.path.join(group_dir, name)
+                    with open(path, "wb") as f:
+                        f.write(payload)
+                    mtime = now - (groups - group_index) * 86400 - (files_per_group - num)
+                    os.utime(path, (mtime, mtime))
+                    if screenshot and rng.random() < screenshot_ratio:
+                        img_name = f"{group_index}_{name.rsplit('.', 1)[0]}.jpg"
+                        with open(os.path.join(save_dir, "img", img_name), "wb") as f:
+                            f.write(screenshot)
+                    if rng.random() < metadata_density:
+                        # 元数据以存档在根目录时的路径为键
+                        root_path = os.path.join(save_dir, name)
+                        store.set_field(group_index, root_path, "note", f"第{group_index}组 存档{num}")
+                        store.set_field(group_index, root_path, "important", rng.random() < 0.2)
+                        store.set_field(group_index, root_path, "indent", rng.randrange(3))
+            store.set_setting("current_group", 1)
+    finally:
+        store.close()
+
+
+# ---- 不创建窗口的 Tk 替身 ----
+
+class HeadlessRoot:
+    """代替 tk.Tk: after 回调放入队列, 由 pump 在调用线程中执行到期的回调"""
+
+    def __init__(self):
+        self._queue = []  # [(到期时间, 序号, 回调, 参数), ...]
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def after(self, delay_ms, callback=None, *args):
+        with self._lock:
+            self._counter += 1
+            self._queue.append((time.monotonic() + delay_ms / 1000, self._counter, callback, args))
+            return self._counter
+
+    def after_cancel(self, timer_id):
+        with self._lock:
+            self._queue = [item for item in self._queue if item[1] != timer_id]
+
+    def pump(self, timeout=0.0):
+        """执行已经到期的回调, timeout 秒内继续等待新到期的回调; 返回执行的回调数"""
+        end = time.monotonic() + timeout
+        count = 0
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                due = sorted(item for item in self._queue if item[0] <= now)
+                self._queue = [item for item in self._queue if item[0] > now]
+            for _, _, callback, args in due:
+                callback(*args)
+            count += len(due)
+            if not due:
+                if now >= end:
+                    return count
+                time.sleep(0.01)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None  # title, geometry, protocol, destroy 等
+
+
+class HeadlessWidget:
+    """代替 ttk 控件, 接受任何参数和方法调用"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("winfo_"):
+            return lambda *args: 0  # 尺寸为 0 时截图显示直接返回
+        return lambda *args, **kwargs: None
+
+
+class HeadlessTree(HeadlessWidget):
+    """代替 ttk.Treeview, 维护行顺序、内容和选中状态, 调用次数计入 calls"""
+
+    def __init__(self, *args, **kwargs):
+        self.items = {}  # iid -> {"values": ..., "tags": ...}
+        self.order = []
+        self.selected = ()
+        self.calls = 0
+
+    def insert(self, parent, index, iid=None, **kwargs):
+        self.calls += 1
+        self.items[iid] = kwargs
+        self.order.insert(index if index != "end" else len(self.order), iid)
+        return iid
+
+    def delete(self, *iids):
+        self.calls += 1
+        for iid in iids:
+            self.items.pop(iid, None)
+        removed = set(iids)
+        self.order = [iid for iid in self.order if iid not in removed]
+        self.selected = tuple(iid for iid in self.selected if iid not in removed)
+
+    def move(self, iid, parent, index):
+        self.calls += 1
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def item(self, iid, option=None, **kwargs):
+        self.calls += 1
+        if kwargs:
+            self.items[iid].update(kwargs)
+            return None
+        return self.items[iid].get(option) if option else self.items[iid]
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def get_children(self, item=""):
+        return tuple(self.order)
+
+    def selection(self):
+        return self.selected
+
+    def selection_set(self, iids):
+        self.calls += 1
+        self.selected = tuple(iid for iid in (iids if isinstance(iids, (list, tuple)) else (iids,)) if iid in self.items)
+
+    def selection_add(self, iids):
+        self.selection_set(tuple(self.selected) + tuple(iids))
+
+
+HEADLESS_TTK = types.SimpleNamespace(Frame=HeadlessWidget, Label=HeadlessWidget, Button=HeadlessWidget,
+                                     Scrollbar=HeadlessWidget, Entry=HeadlessWidget, Treeview=HeadlessTree,
+                                     Style=HeadlessWidget)
+HEADLESS_DIALOGS = types.SimpleNamespace(showinfo=lambda *args, **kwargs: None,
+                                         showerror=lambda title, message, **kwargs: print(f"{title}: {message}"),
+                                         askyesno=lambda *args, **kwargs: True,
+                                         askdirectory=lambda *args, **kwargs: "",
+                                         askstring=lambda *args, **kwargs: None,
+                                         askinteger=lambda *args, **kwargs: None)
+
+
+def import_headless_app():
+    """导入 save_manager 并把 Tk 控件、快照预览图和对话框换成替身"""
+    import tkinter
+    import save_manager
+    import virtual_list
+    save_manager.tk = types.SimpleNamespace(**dict(vars(tkinter), PhotoImage=HeadlessWidget))
+    save_manager.ttk = HEADLESS_TTK
+    save_manager.messagebox = save_manager.filedialog = save_manager.simpledialog = HEADLESS_DIALOGS
+    virtual_list.ttk = HEADLESS_TTK
+    return save_manager.SaveManagerApp
+
+
+@contextlib.contextmanager
+def headless_app(save_dir):
+    """在 save_dir 中启动不创建窗口的 SaveManagerApp"""
+    app_class = import_headless_app()
+    old_cwd = os.getcwd()
+    os.chdir(save_dir)  # 与正常启动相同, 以工作目录作为存档目录
+    root = HeadlessRoot()
+    app = app_class(root)
+    try:
+        root.pump(0.2)
+        yield app, root
+    finally:
+        app.on_close()
+        os.chdir(old_cwd)
+
+
+def wait_idle(app, root, timeout=600.0):
+    """等待后台任务 (例如截图哈希补算) 全部结束, 避免与测量的操作争用"""
+    end = time.monotonic() + timeout
+    while app.engine.task_scheduler.pending and time.monotonic() < end:
+        root.pump(0.05)
+
+
+# ---- 测量 ----
+
+def measure(func, repeat, prepare=None):
+    """先计时运行 repeat 次 (不开启内存跟踪), 再运行一次统计系统调用、审计事件和峰值内存"""
+    global _audit_counts
+    timings = []
+    for i in range(repeat):
+        if prepare is not None:
+            prepare(i)
+        start = time.perf_counter()
+        func(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    if prepare is not None:
+        prepare(repeat)
+    io_before = read_proc_io()
+    _audit_counts = {}
+    tracemalloc.start()
+    try:
+        func(repeat)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        counts, _audit_counts = _audit_counts, None
+    io_after = read_proc_io()
+    result = {
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+        "peak_kb": peak / 1024,
+        "fs_events": counts,
+    }
+    if io_before and io_after:
+        result["syscalls"] = {"read": io_after[0] - io_before[0], "write": io_after[1] - io_before[1]}
+    return result
+
+
+def run_benchmark(save_dir, repeat=5):
+    """在已生成的存档目录中测量各项操作, 返回 {操作名: 结果}"""
+    sys.addaudithook(_audit_hook)
+    results = {}
+    with headless_app(save_dir) as (app, root):
+        def prepare(i):
+            app.engine.stop_watcher()  # 基准中的文件变化由操作本身产生, 不需要自动刷新; 组切换后会重新启动
+            wait_idle(app, root)
+
+        results["startup_update_save_list"] = measure(lambda i: app.update_save_list(), repeat, prepare)
+        engine = app.engine
+        results["get_save_files_in_dir"] = measure(lambda i: engine.get_save_files_in_dir(engine.save_dir), repeat, prepare)
+        results["get_last_group_with_saves"] = measure(lambda i: engine.get_last_group_with_saves(), repeat, prepare)
+        results["rebuild_group_manifest"] = measure(lambda i: engine.rebuild_group_manifest(), repeat, prepare)
+
+        def save_config(i):
+            engine.store.set_field(engine.current_group, os.path.join(engine.save_dir, "save1.dat"), "note", f"备注{i}")
+            engine.save_config()
+            engine.config_writer.flush()  # 包括导出 save_config.json
+        results["save_config"] = measure(save_config, repeat, prepare)
+
+        def toggle_group(i):
+            engine.switch_group(2 if engine.current_group == 1 else 1)
+        # 沿用原来的名称, 以便与之前保存的基准结果对比
+        results["execute_group_change"] = measure(toggle_group, repeat, prepare)
+        if engine.current_group != 1:
+            engine.switch_group(1)
+        root.pump(0.05)  # 处理组切换通知的列表刷新
+        engine.ensure_search_index()
+        queries = ("存档", "第3组", "is:important 存档1")  # 前后两次查询互不包含, 不复用上次的结果
+        results["search"] = measure(lambda i: engine.search(queries[i % len(queries)]), repeat, prepare)
+        tree = app.save_tree
+        app.metrics.set_enabled(True, *instrumented_methods(app))  # 最后一项同时记录各阶段的耗时
+        results["update_save_list"] = measure(lambda i: app.update_save_list(), repeat, prepare)
+        results["update_save_list"]["tree_calls"] = tree.calls
+        results["update_save_list"]["phases"] = app.metrics.snapshot()["timers"]
+    return results
+
+
+def instrumented_methods(app):
+    """开启统计时计时的引擎和界面方法, save_manager 已由 import_headless_app 导入"""
+    import save_manager
+    import save_engine
+    return (app.engine, save_engine.INSTRUMENTED_METHODS), (app, save_manager.INSTRUMENTED_METHODS)
+
+
+def compare(results, baseline, tolerance=0.2, min_delta_ms=0.5):
+    """与保存的结果对比中位数耗时, 返回 [(操作名, 基准ms, 本次ms, 比值, 是否变慢), ...]; 差值小于 min_delta_ms 时不算变慢"""
+    rows = []
+    for name, result in results.items():
+        base = baseline.get("operations", {}).get(name)
+        if base is None:
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        regressed = ratio > 1 + tolerance and result["median_ms"] - base["median_ms"] >= min_delta_ms
+        rows.append((name, base["median_ms"], result["median_ms"], ratio, regressed))
+    return rows
+
+
+def parse_size(text):
+    """解析 1920x1080 格式的分辨率"""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存档管理热点操作基准")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--files", type=int, default=200, help="每组存档数")
+    parser.add_argument("--pattern", default="save{num}.dat", help="存档文件名, {num} 为序号")
+    parser.add_argument("--file-size", type=int, default=64 * 1024, help="每个存档的字节数")
+    parser.add_argument("--metadata-density", type=float, default=0.3, help="有备注和标记的存档比例")
+    parser.add_argument("--screenshot-size", default="1280x720")
+    parser.add_argument("--screenshot-ratio", type=float, default=1.0, help="有截图的存档比例")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", help="生成存档的目录, 默认使用临时目录并在结束后删除")
+    parser.add_argument("--output", help="结果写入的 JSON 文件")
+    parser.add_argument("--baseline", help="对比的基准结果 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许变慢的比例")
+    args = parser.parse_args()
+
+    config = {"groups": args.groups, "files_per_group": args.files, "pattern": args.pattern,
+              "file_size": args.file_size, "metadata_density": args.metadata_density,
+              "screenshot_size": args.screenshot_size, "screenshot_ratio": args.screenshot_ratio,
+              "repeat": args.repeat}
+    save_dir = args.dir or tempfile.mkdtemp(prefix="save_benchmark_")
+    try:
+        generate_save_tree(save_dir, args.groups, args.files, args.pattern, args.file_size, args.metadata_density,
+                           parse_size(args.screenshot_size), args.screenshot_ratio)
+        results = run_benchmark(save_dir, args.repeat)
+    finally:
+        if not args.dir:
+            shutil.rmtree(save_dir, ignore_errors=True)
+    report = {"config": config, "python": platform.python_version(), "platform": platform.platform(),
+              "operations": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("警告: 基准结果使用的参数不同, 对比仅供参考")
+        rows = compare(results, baseline, args.tolerance)
+        print(f"{'操作':<28}{'基准ms':>10}{'本次ms':>10}{'比值':>8}")
+        for name, base_ms, new_ms, ratio, regressed in rows:
+            print(f"{name:<28}{base_ms:>10.2f}{new_ms:>10.2f}{ratio:>8.2f}{'  变慢' if regressed else ''}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""存档管理命令行: list / search / switch / note / mark / delete / move / retag / stats, 以及常驻的 daemon 模式
+
+存档目录有正在运行的 daemon 时命令发给 daemon 执行, 否则直接打开存档目录执行一次.
+
+    python save_cli.py -d <存档目录> list
+    python save_cli.py search boss is:important
+    python save_cli.py switch next
+    python save_cli.py note 3 "boss 战前"
+    python save_cli.py mark 3 5 --flag important
+    python save_cli.py move --match "B线" --to 7
+    python save_cli.py retag "A线" "B线"
+    python save_cli.py daemon
+"""
+import os
+import re
+import sys
+import json
+import signal
+import secrets
+import argparse
+import threading
+import contextlib
+from multiprocessing.connection import Listener, Client
+
+from save_engine import SaveEngine, CallbackLoop, FLAG_LIMITS
+
+DAEMON_FILE = "save_engine.daemon"  # daemon 的端口、认证密钥和进程号, 在存档目录中
+
+
+class CommandError(Exception):
+    """命令参数错误, 例如找不到指定的存档"""
+
+
+def entry_summary(entry):
+    """命令输出中的存档信息"""
+    return {key: entry.get(key) for key in ("path", "original_name", "date", "size", "note", "important", "ignore", "indent")}
+
+
+def resolve_saves(engine, refs):
+    paths = []
+    for ref in refs:
+        path = engine.resolve_save(ref)
+        if path is None:
+            raise CommandError(f"找不到存档: {ref}")
+        paths.append(path)
+    return paths
+
+
+def command_targets(engine, args):
+    """--match 或 --search 时在所有组中查找, 否则为当前组中指定的存档"""
+    if args.get("search"):
+        targets = {}
+        for entry in engine.search(args["search"]):
+            targets.setdefault(entry['group'], []).append(entry['path'])
+        return targets
+    if args.get("match"):
+        try:
+            return engine.bulk.query(args["match"])
+        except re.error as e:
+            raise CommandError(f"无效的正则表达式: {e}")
+    if not args.get("saves"):
+        raise CommandError("请指定存档或 --match")
+    return {engine.current_group: resolve_saves(engine, args["saves"])}
+
+
+def bulk_summary(result):
+    return {"changed": result.changed, "errors": result.errors}
+
+
+def run_command(engine, command, args):
+    """在引擎的调度线程中执行一条命令, 返回可以序列化为 JSON 的结果"""
+    if command == "list":
+        group = args.get("group") or engine.current_group
+        return {"group": group, "name": engine.get_group_display_name(group),
+                "saves": [entry_summary(entry) for entry in engine.list_group(group)]}
+    if command == "search":
+        entries = engine.search(" ".join(args["query"]), args.get("limit"))
+        return {"saves": [dict(entry_summary(entry), group=entry['group']) for entry in entries],
+                "group_names": {entry['group']: engine.get_group_display_name(entry['group']) for entry in entries}}
+    if command == "switch":
+        target = args["target"]
+        if target == "next":
+            target = engine.current_group + 1
+        elif target == "prev":
+            target = max(1, engine.current_group - 1)
+        elif str(target).isdigit() and int(target) >= 1:
+            target = int(target)
+        else:
+            raise CommandError(f"无效的组: {target}")
+        if target != engine.current_group and not engine.switch_group(target):
+            raise CommandError(f"切换到第{target}组失败")
+        return {"group": engine.current_group, "name": engine.get_group_display_name(engine.current_group)}
+    if command == "note":
+        path, = resolve_saves(engine, [args["save"]])
+        engine.set_note(path, args["text"])
+        return {"path": path, "note": args["text"]}
+    if command == "mark":
+        value = args.get("value")
+        if args["flag"] == "indent" and value is None:
+            value = 1
+        return bulk_summary(engine.bulk.set_flag(command_targets(engine, args), args["flag"], value))
+    if command == "delete":
+        return bulk_summary(engine.bulk.delete(command_targets(engine, args)))
+    if command == "move":
+        if args["to"] < 1:
+            raise CommandError(f"无效的组: {args['to']}")
+        return bulk_summary(engine.bulk.move(command_targets(engine, args), args["to"]))
+    if command == "retag":
+        try:
+            return bulk_summary(engine.bulk.retag(args["pattern"], args["replacement"]))
+        except re.error as e:
+            raise CommandError(f"无效的正则表达式: {e}")
+    if command == "stats":
+        return engine.stats()
+    raise CommandError(f"未知命令: {command}")
+
+
+def read_daemon_file(save_dir):
+    try:
+        with open(os.path.join(save_dir, DAEMON_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def send_to_daemon(save_dir, command, args):
+    """把命令发给存档目录的 daemon, 没有可用的 daemon 时返回 None"""
+    info = read_daemon_file(save_dir)
+    if info is None:
+        return None
+    try:
+        with contextlib.closing(Client(("127.0.0.1", info["port"]), authkey=bytes.fromhex(info["authkey"]))) as conn:
+            conn.send((command, args))
+            return conn.recv()
+    except (OSError, EOFError):
+        return None  # daemon 已经退出, 留下的文件在下次启动 daemon 时覆盖
+
+
+def run_direct(save_dir, command, args):
+    """没有 daemon 时在当前进程中打开存档目录执行一次命令, 不监视目录"""
+    loop = CallbackLoop()
+    thread = threading.Thread(target=loop.run, name="save-engine", daemon=True)
+    thread.start()
+    engine = loop.call(SaveEngine, save_dir, loop.after, loop.after_cancel)
+    try:
+        return ("ok", loop.call(run_command, engine, command, args))
+    except CommandError as e:
+        return ("error", str(e))
+    finally:
+        loop.call(engine.close)
+        loop.stop()
+        thread.join()
+
+
+class SaveDaemon:
+    """常驻的存档引擎: 监视目录、自动截图和组切换, 并通过本地连接接受命令"""
+
+    def __init__(self, save_dir):
+        self.save_dir = save_dir
+        self.loop = CallbackLoop()
+        self.engine = SaveEngine(save_dir, self.loop.after, self.loop.after_cancel)
+        self.authkey = secrets.token_bytes(16)
+        self.listener = Listener(("127.0.0.1", 0), authkey=self.authkey)
+        self.daemon_file = os.path.join(save_dir, DAEMON_FILE)
+
+    def serve(self):
+        """在当前线程运行引擎的调度循环, 直到收到 stop 命令或 Ctrl+C"""
+        with open(self.daemon_file, "w", encoding="utf-8") as f:
+            json.dump({"port": self.listener.address[1], "authkey": self.authkey.hex(), "pid": os.getpid()}, f)
+        threading.Thread(target=self.accept_loop, name="save-daemon-accept", daemon=True).start()
+        signal.signal(signal.SIGINT, lambda *_: self.loop.after(0, self.loop.stop))
+        self.loop.after(0, self.engine.refresh) # 记录指纹基线, 之后的新存档会自动截图
+        self.loop.after(0, self.engine.start)
+        print(f"存档引擎已启动: {self.save_dir} (端口 {self.listener.address[1]})")
+        try:
+            self.loop.run()
+        finally:
+            self.listener.close()
+            try:
+                os.remove(self.daemon_file)
+            except OSError:
+                pass
+            self.engine.close()
+
+    def accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return  # 监听已关闭
+            threading.Thread(target=self.handle_connection, args=(conn,), daemon=True).start()
+
+    def handle_connection(self, conn):
+        """每个连接处理一条命令, 命令在调度线程中执行"""
+        with contextlib.closing(conn):
+            try:
+                command, args = conn.recv()
+            except (OSError, EOFError, ValueError):
+                return
+            if command == "stop":
+                self.loop.after(0, self.loop.stop)
+                response = ("ok", {"stopped": True})
+            else:
+                try:
+                    response = ("ok", self.loop.call(run_command, self.engine, command, args))
+                except CommandError as e:
+                    response = ("error", str(e))
+                except Exception as e:
+                    response = ("error", f"{type(e).__name__}: {e}")
+            try:
+                conn.send(response)
+            except OSError:
+                pass
+
+
+def format_result(command, result):
+    """命令结果的文本输出"""
+    if command == "list":
+        lines = [result["name"]]
+        for i, save in enumerate(result["saves"], 1):
+            flags = ("★" if save["important"] else "") + ("(忽略)" if save["ignore"] else "")
+            lines.append(f"{i:>4}  {'→ ' * (save['indent'] or 0)}{save['original_name']:<20} {save['date']:<20} "
+                         f"{flags} {save['note']}".rstrip())
+        return "\n".join(lines)
+    if command == "search":
+        lines = []
+        group = None
+        for save in result["saves"]:
+            if save["group"] != group:
+                group = save["group"]
+                lines.append(result["group_names"][group])
+            flags = ("★" if save["important"] else "") + ("(忽略)" if save["ignore"] else "")
+            lines.append(f"      {save['original_name']:<20} {save['date']:<20} {flags} {save['note']}".rstrip())
+        return "\n".join(lines) or "没有匹配的存档"
+    if command == "switch":
+        return f"当前组: {result['name']}"
+    if command == "stats":
+        return json.dumps(result, indent=2, ensure_ascii=False)
+    if command == "note":
+        return f"{os.path.basename(result['path'])}: {result['note']}"
+    if command in ("mark", "delete", "move", "retag"):
+        return "\n".join([f"已处理 {result['changed']} 个存档"] + result["errors"])
+    return json.dumps(result, ensure_ascii=False)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="存档管理命令行")
+    parser.add_argument("-d", "--save-dir", default=os.getcwd(), help="存档目录, 默认为当前目录")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="列出存档", parents=[output])
+    list_parser.add_argument("-g", "--group", type=int, help="组序号, 默认为根目录所属的组")
+    search_parser = commands.add_parser("search", help="在所有组中搜索备注、文件名、日期和组名", parents=[output])
+    search_parser.add_argument("query", nargs="+",
+                               help="关键词, 可以加 is:important、is:ignored、g:组号、date:日期前缀、after:、before:、indent:")
+    search_parser.add_argument("-n", "--limit", type=int, help="最多显示的存档数")
+    switch_parser = commands.add_parser("switch", help="切换存档组", parents=[output])
+    switch_parser.add_argument("target", help="组序号, 或 next / prev")
+    note_parser = commands.add_parser("note", help="设置存档备注", parents=[output])
+    note_parser.add_argument("save", help="存档的序号、文件名或路径")
+    note_parser.add_argument("text")
+    selection = argparse.ArgumentParser(add_help=False)
+    selection.add_argument("saves", nargs="*", help="当前组中存档的序号、文件名或路径")
+    selection.add_argument("-m", "--match", help="改为处理所有组中备注或文件名匹配该正则表达式的存档")
+    selection.add_argument("-s", "--search", help="改为处理所有组中与 search 命令结果相同的存档")
+    mark_parser = commands.add_parser("mark", help="设置存档标记", parents=[output, selection])
+    mark_parser.add_argument("-f", "--flag", choices=sorted(FLAG_LIMITS), default="important")
+    mark_parser.add_argument("-v", "--value", type=int,
+                             help="important/ignore 为 1 或 0, 不指定时切换; indent 为增量, 默认 1")
+    commands.add_parser("delete", help="删除存档和截图", parents=[output, selection])
+    move_parser = commands.add_parser("move", help="把存档移到其他组", parents=[output, selection])
+    move_parser.add_argument("-t", "--to", type=int, required=True, help="目标组序号")
+    retag_parser = commands.add_parser("retag", help="在所有组的备注中按正则表达式替换", parents=[output])
+    retag_parser.add_argument("pattern")
+    retag_parser.add_argument("replacement")
+    commands.add_parser("stats", help="组、后台任务和存储的统计", parents=[output])
+    daemon_parser = commands.add_parser("daemon", help="常驻运行, 监视存档目录并接受命令")
+    daemon_parser.add_argument("--stop", action="store_true", help="停止正在运行的 daemon")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    save_dir = os.path.abspath(args.save_dir)
+    if args.command == "daemon":
+        if args.stop:
+            if send_to_daemon(save_dir, "stop", {}) is None:
+                print("没有正在运行的 daemon", file=sys.stderr)
+                return 1
+            return 0
+        if send_to_daemon(save_dir, "stats", {}) is not None:
+            print("存档目录已有正在运行的 daemon", file=sys.stderr)
+            return 1
+        SaveDaemon(save_dir).serve()
+        return 0
+    command_args = {key: value for key, value in vars(args).items()
+                    if key not in ("save_dir", "json", "command")}
+    out = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr): # 引擎的日志不混入命令输出
+        response = send_to_daemon(save_dir, args.command, command_args)
+        if response is None:
+            response = run_direct(save_dir, args.command, command_args)
+    status, result = response
+    if status != "ok":
+        print(result, file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2, ensure_ascii=False) if args.json else format_result(args.command, result), file=out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,814 @@
+import os
+import json
+import time
+import heapq
+import queue
+import itertools
+import threading
+
+from save_index import scan_save_files, format_timestamp, SAVE_FILE_PATTERN
+from save_watcher import SaveWatcher
+from capture_encoder import CaptureEncoder, screenshot_extensions
+from capture_backend import create_backend
+from stable_capture import StableFrameCapture, capture_settings
+from screenshot_index import ScreenshotIndex
+from chunk_store import ChunkStore
+from cold_storage import ColdStorage, cold_storage_settings
+from save_fingerprints import FingerprintIndex, NO_CHANGES
+from config_writer import ConfigWriter
+from bulk_ops import BulkOperations, FLAG_LIMITS
+from save_search import SearchIndex
+from instrumentation import Metrics
+from metadata_store import MetadataStore
+from group_manifest import GroupManifest
+from task_scheduler import TaskScheduler
+from group_switch import GroupSwitcher, GroupSwitchError, SwitchJournal, recover_group_switch
+
+GAME_LIST_FILE = r"D:\Tools\Save_manager\game_list.json"
+
+# 开启统计时计时的方法, 名称即计时器名称
+INSTRUMENTED_METHODS = ("refresh", "get_save_files_in_dir", "save_config", "switch_group", "capture_window_image",
+                        "search")
+
+
+class CallbackLoop:
+    """代替 Tk 事件循环的回调队列: after 安排的回调都在调用 run 的线程中执行, 用于守护进程"""
+
+    def __init__(self):
+        self._heap = []  # [(到期时间, 序号), ...]
+        self._callbacks = {}  # 序号 -> (回调, 参数)
+        self._counter = itertools.count(1)
+        self._wakeup = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def after(self, delay_ms, callback, *args):
+        """delay_ms 毫秒后在循环线程中调用 callback(*args), 返回可以取消的标识; 可以从任何线程调用"""
+        with self._lock:
+            timer_id = next(self._counter)
+            self._callbacks[timer_id] = (callback, args)
+            heapq.heappush(self._heap, (time.monotonic() + delay_ms / 1000, timer_id))
+        self._wakeup.put(None)
+        return timer_id
+
+    def after_cancel(self, timer_id):
+        with self._lock:
+            self._callbacks.pop(timer_id, None)
+
+    def call(self, func, *args, timeout=None):
+        """在循环线程中执行 func 并等待结果, 异常会在调用线程中重新抛出"""
+        done = threading.Event()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["result"] = func(*args)
+            except BaseException as e:
+                outcome["error"] = e
+            done.set()
+
+        self.after(0, run)
+        if not done.wait(timeout):
+            raise TimeoutError("引擎没有响应")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.put(None)
+
+    def run(self):
+        """执行到期的回调, 直到 stop 被调用"""
+        while not self._stopped:
+            with self._lock:
+                now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, timer_id = heapq.heappop(self._heap)
+                    entry = self._callbacks.pop(timer_id, None)
+                    if entry is not None:
+                        due.append(entry)
+                wait = self._heap[0][0] - now if self._heap else None
+            for callback, args in due:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"回调 {getattr(callback, '__name__', callback)} 失败: {e}")
+            if due:
+                continue
+            try:
+                self._wakeup.get(timeout=wait)
+            except queue.Empty:
+                pass
+
+
+class SaveEngine:
+    """不依赖 tkinter 的存档管理核心: 扫描根目录、元数据、组切换、截图调度和后台任务
+
+    schedule/cancel 与 Tk 的 after/after_cancel 相同, 所有定时回调都经过它们;
+    状态变化通过 add_listener 注册的回调 listener(event, *args) 通知, 回调可能在后台线程中调用.
+    """
+
+    def __init__(self, save_dir, schedule, cancel):
+        self.save_dir = save_dir
+        self.schedule = schedule
+        self.cancel = cancel
+        self.started = False  # start 之后才监视目录变化并运行启动后的后台任务
+        self.config_file = os.path.join(save_dir, "save_config.json")
+        self.db_file = os.path.join(save_dir, "save_metadata.db")
+        self.journal_file = os.path.join(save_dir, "group_switch.journal")
+        self.temp_dir = os.path.join(save_dir, "temp_save")
+        self.titles_file = os.path.join(save_dir, "titles.json")
+        self.img_dir = os.path.join(save_dir, "img")
+        os.makedirs(self.img_dir, exist_ok=True)
+        self.listeners = []
+
+        self.metrics = Metrics() # 热点操作的计时和计数, 未开启时没有额外开销
+        self.store = self.load_config()
+        self.config_writer = self.create_config_writer()
+        self.chunk_store = self.load_chunk_store()
+        self.cold_storage = self.load_cold_storage()
+        self.recover_group_switch()
+        self.current_group = self.get_current_group()
+        self.group_manifest = self.load_group_manifest()
+        self.refresh_debounce_ms = 300 # 目录变化后合并刷新的等待时间
+        self._auto_refresh_id = None
+        self.auto_refresh_paused = False # 编辑或切换组时暂停响应目录变化
+        self.pending_events = [] # 尚未处理的目录事件
+        self.group_switcher = GroupSwitcher() # 用同盘重命名分批执行组切换
+        self.watcher = None
+        self.current_title = self.load_titles()
+        # 后台任务调度: 组切换和截图分别在两条通道中执行, 互不阻塞
+        self.task_scheduler = TaskScheduler({"group": 1, "capture": 1, "index": 1}, schedule=schedule, cancel=cancel)
+        self._refresh_lock = threading.RLock() # 主线程的刷新和组切换通道中的刷新不同时进行
+        self.group_lock = threading.RLock() # 组切换和批量移动、删除不同时操作文件
+        self.all_files_info = {} # 用于存储所有文件信息
+        self.root_files = None # 最近一次扫描根目录的结果 (含忽略的存档)
+        self.entries = [] # 最近一次刷新的根目录存档
+        self.bulk = BulkOperations(self) # 批量修改标记、备注, 批量删除和移动存档
+        self.game_list_file = self.find_game_list_file()
+        self.game_list = self.load_game_list()
+        self.current_game_title = self.get_current_game_title()
+        self.max_saves_per_group = self.store.get_setting("max_saves_per_group", 9999) # 默认最大存档数
+        self.capture_encoder = self.create_capture_encoder() # 在进程池中编码截图
+        self.capture_backend = create_backend(self.store.get_setting("capture_backend", "gdi")) # gdi 或 printwindow
+        self.stable_capture = self.create_stable_capture() # 等画面稳定后再截图
+        self.screenshot_index = ScreenshotIndex(self.store) # 所有组截图的感知哈希索引
+        self.save_fingerprints = FingerprintIndex(self.store.get_setting("fingerprint_fast_hash", False)) # 根目录存档的指纹
+        self.search_index = SearchIndex(self.store) # 所有组存档的内存搜索索引, 随元数据修改增量更新
+        if self.store.get_setting("instrumentation", False):
+            self.metrics.set_enabled(True, (self, INSTRUMENTED_METHODS))
+
+    # ---- 事件 ----
+
+    def add_listener(self, listener):
+        """注册状态变化回调 listener(event, *args)
+
+        事件: saves_changed(存档列表), group_changed(旧组, 新组, 存档列表), capture_requested(存档路径),
+        capture_saved(截图路径), error(消息)
+        """
+        self.listeners.append(listener)
+
+    def emit(self, event, *args):
+        for listener in self.listeners:
+            listener(event, *args)
+
+    # ---- 初始化 ----
+
+    def load_config(self):
+        """打开元数据数据库, 首次使用或 save_config.json 被外部修改时导入"""
+        store = MetadataStore(self.db_file)
+        try:
+            store.sync_from_json(self.config_file)
+        except (OSError, ValueError) as e:
+            print(f"导入配置文件失败: {e}")
+        return store
+
+    def create_config_writer(self):
+        """创建 save_config.json 的合并写入器, 数据库中的元数据会定期导出为 JSON"""
+        delay_ms = self.store.get_setting("json_mirror_delay_ms", 10000) # 合并导出的等待时间, 元数据已先写入数据库
+        return ConfigWriter(self.config_file, self.store.export_json, delay_ms,
+                            schedule=self.schedule, cancel=self.cancel, on_written=self.on_config_written)
+
+    def on_config_written(self, written):
+        """save_config.json 导出完成"""
+        self.store.mark_json_exported(self.config_file)
+        self.metrics.count("bytes_written.save_config", written)
+
+    def create_capture_encoder(self):
+        """按设置创建截图编码器: 格式 (webp/jpeg/png)、质量和保存的最长边"""
+        return CaptureEncoder(self.store.get_setting("screenshot_format", "webp"),
+                              self.store.get_setting("screenshot_quality", 80),
+                              self.store.get_setting("screenshot_max_size", 1920))
+
+    def create_stable_capture(self):
+        """按整体设置和当前游戏的设置创建稳定帧检测"""
+        return StableFrameCapture(capture_settings(self.store.get_setting("stable_capture", {}),
+                                                   self.store.get_setting("stable_capture_games", {}),
+                                                   self.current_game_title))
+
+    def recover_group_switch(self):
+        """按日志恢复上次中断或回滚不完整的组切换, 并修正当前组"""
+        try:
+            group = recover_group_switch(self.journal_file)
+        except OSError as e:
+            print(f"恢复组切换失败: {e}")
+            return
+        if group is not None:
+            self.set_current_group(group)
+            GroupManifest(self.store).rebuild(self.save_dir, group, self.store.ignored_paths(),
+                                              self.packed_group_stats())
+
+    def load_group_manifest(self):
+        """加载存档组清单, 首次使用时从磁盘统计"""
+        manifest = GroupManifest(self.store)
+        if manifest.is_empty():
+            manifest.rebuild(self.save_dir, self.current_group, self.store.ignored_paths(), self.packed_group_stats())
+        return manifest
+
+    def rebuild_group_manifest(self):
+        """从磁盘重新统计所有存档组"""
+        self.group_manifest.rebuild(self.save_dir, self.current_group, self.store.ignored_paths(),
+                                    self.packed_group_stats())
+
+    def load_chunk_store(self):
+        """开启 chunk_store 设置时, 不在根目录的组以去重分块的形式保存"""
+        if self.store.get_setting("chunk_store", False):
+            return ChunkStore(self.store, os.path.join(self.save_dir, "chunks"))
+        return None
+
+    def load_cold_storage(self):
+        """开启 cold_storage 设置时, 长期没有使用的组压缩归档"""
+        settings = cold_storage_settings(self.store.get_setting("cold_storage", {}))
+        if settings["enabled"]:
+            return ColdStorage(self.store, os.path.join(self.save_dir, "cold"), self.img_dir, settings)
+        return None
+
+    def start(self):
+        """开始监视目录, 并在后台建立搜索索引、为还没有索引的截图补算哈希、检查需要归档的组; 命令行单次执行时不调用"""
+        self.started = True
+        self.start_auto_refresh()
+        self.task_scheduler.submit("index", ("search",), self.ensure_search_index)
+        self.task_scheduler.submit("index", ("backfill", self.img_dir), self.screenshot_index.backfill, self.img_dir,
+                                   self.store.get_setting("screenshot_dedupe", False))
+        self.schedule_cold_archive()
+
+    def close(self):
+        """停止所有后台任务并保存配置"""
+        self.stop_auto_refresh()
+        self.stop_watcher()
+        self.task_scheduler.shutdown()
+        self.capture_encoder.shutdown() # 等待正在编码的截图写完
+        self.config_writer.flush()
+        self.store.close()
+
+    # ---- 分块和归档 ----
+
+    def packed_group_stats(self):
+        """以分块或归档形式保存的组的统计信息"""
+        stats = self.chunk_store.packed_group_stats() if self.chunk_store is not None else {}
+        if self.cold_storage is not None:
+            stats.update(self.cold_storage.archived_group_stats())
+        return stats
+
+    def schedule_cold_archive(self, delay=30.0):
+        """延迟检查需要归档的组, 避免影响启动"""
+        if self.cold_storage is not None:
+            self.task_scheduler.submit("group", ("cold",), self.archive_cold_groups, delay=delay)
+
+    def archive_cold_groups(self):
+        """在组切换通道中按清单统计和访问记录归档长期没有使用的组, 期间不与组切换和批量移动同时操作文件"""
+        with self.group_lock:
+            for group_index in self.cold_storage.cold_groups(self.group_manifest.all_groups(), self.current_group):
+                if group_index == self.current_group:
+                    continue
+                group_dir = os.path.join(self.save_dir, f"save{group_index}")
+                start = time.perf_counter()
+                try:
+                    total_bytes, archive_bytes = self.cold_storage.archive_group(group_index, group_dir)
+                except OSError as e:
+                    print(f"归档第{group_index}组失败: {e}")
+                    continue
+                if total_bytes:
+                    print(f"第{group_index}组已归档, 耗时 {(time.perf_counter() - start) * 1000:.0f}ms, "
+                          f"{total_bytes // 1024} KB -> {archive_bytes // 1024} KB")
+
+    def pack_group(self, group_index):
+        """在组切换通道中把不在根目录的组分块保存"""
+        if self.chunk_store is None or group_index == self.current_group:
+            return
+        group_dir = os.path.join(self.save_dir, f"save{group_index}")
+        with self.group_lock:  # 不与组切换和批量移动同时操作组文件夹
+            if group_index == self.current_group:
+                return
+            try:
+                elapsed = self.chunk_store.pack_group(group_index, group_dir)
+            except OSError as e:
+                print(f"分块保存第{group_index}组失败: {e}")
+                return
+            removed = self.chunk_store.gc()
+        stats = self.chunk_store.stats()
+        print(f"第{group_index}组已分块保存, 耗时 {elapsed * 1000:.0f}ms, 清理 {removed} 个块, "
+              f"去重比例 {stats['dedupe_ratio']:.2f} ({stats['logical_bytes'] // 1024} KB -> "
+              f"{stats['stored_bytes'] // 1024} KB)")
+
+    # ---- 配置 ----
+
+    def save_config(self):
+        """元数据已写入数据库, 这里只标记 save_config.json 需要重新导出"""
+        self.config_writer.mark_dirty()
+
+    def load_titles(self):
+        """加载标题配置文件"""
+        if os.path.exists(self.titles_file):
+            with open(self.titles_file, "r", encoding="utf-8") as f:
+                try:
+                    return json.load(f)
+                except json.JSONDecodeError:
+                    return {}
+        else:
+            return {}
+
+    def save_titles(self):
+        """保存标题配置文件"""
+        with open(self.titles_file, "w", encoding="utf-8") as f:
+            json.dump(self.current_title, f, indent=4, ensure_ascii=False)
+
+    def find_game_list_file(self):
+        """查找 game_list.json 文件"""
+        file_path = GAME_LIST_FILE
+        print(f"尝试查找 game_list.json 路径: {file_path}")
+        if os.path.exists(file_path):
+            print(f"找到 game_list.json 文件: {file_path}")
+            return file_path
+        else:
+            return None
+
+    def load_game_list(self):
+        """加载游戏列表"""
+        if self.game_list_file and os.path.exists(self.game_list_file):
+            with open(self.game_list_file, "r", encoding="utf-8") as f:
+                try:
+                    return json.load(f)
+                except json.JSONDecodeError:
+                    return []
+        else:
+            return []
+
+    def get_current_game_title(self):
+        """获取当前游戏的标题"""
+        if self.game_list:
+            for game in self.game_list:
+                if os.path.abspath(self.save_dir) == os.path.abspath(game.get("save_path", "")):
+                    return game.get("title", "")
+        return ""
+
+    def get_game_dir(self):
+        """从 game_list.json 中找到当前游戏的目录, 没有时返回 None"""
+        for game in self.load_game_list():
+            if game.get("title", "") == self.current_game_title:
+                process_path = game.get("process_path", "")
+                if process_path:
+                    return os.path.dirname(process_path)
+        return None
+
+    def set_max_saves(self, max_saves):
+        """设置每组的最大存档数"""
+        self.max_saves_per_group = max_saves
+        self.store.set_setting("max_saves_per_group", max_saves)
+        self.save_config()
+
+    # ---- 目录监视 ----
+
+    def start_auto_refresh(self):
+        """启动存档目录监视, 目录变化时自动刷新"""
+        self.auto_refresh_paused = False
+        if not self.started:
+            return
+        if self.watcher is None:
+            self.watcher = SaveWatcher(self.save_dir, self.on_save_dir_changed, name_filter=SAVE_FILE_PATTERN.match)
+            self.watcher.start()
+        if self.pending_events:
+            self.schedule_auto_refresh() # 处理暂停期间积累的事件
+
+    def stop_auto_refresh(self):
+        """暂停自动刷新, 期间的目录事件会保留到恢复后处理"""
+        self.auto_refresh_paused = True
+        if self._auto_refresh_id:
+            self.cancel(self._auto_refresh_id)
+            self._auto_refresh_id = None
+
+    def stop_watcher(self):
+        """停止存档目录监视"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.pending_events = []
+
+    def on_save_dir_changed(self, events):
+        """监视线程回调, 转交给调度线程处理"""
+        self.schedule(0, self.handle_save_dir_events, events)
+
+    def handle_save_dir_events(self, events):
+        """记录目录事件并安排一次合并刷新"""
+        self.pending_events.extend(events)
+        if not self.auto_refresh_paused:
+            self.schedule_auto_refresh()
+
+    def schedule_auto_refresh(self):
+        """在短暂等待后刷新, 合并连续的多个事件"""
+        if self._auto_refresh_id is None:
+            self._auto_refresh_id = self.schedule(self.refresh_debounce_ms, self.auto_refresh)
+
+    def auto_refresh(self):
+        """目录变化后自动刷新, 新增和被覆盖的存档由 refresh 根据指纹捕获截图"""
+        self._auto_refresh_id = None
+        self.pending_events = []
+        self.emit("saves_changed", self.refresh())
+
+    # ---- 存档列表 ----
+
+    def refresh(self, rescan=True):
+        """扫描根目录, 更新清单并为新增和被覆盖的存档截图, 返回带元数据的存档列表 (不含忽略的存档)
+
+        只修改了元数据时 rescan 为 False, 沿用上次的扫描结果
+        """
+        with self._refresh_lock:
+            rescan = rescan or self.root_files is None
+            if not rescan:
+                all_files = self.root_files
+                ignored_paths = self.store.ignored_paths()
+                files = [file_info for file_info in all_files if file_info['path'] not in ignored_paths]
+                self.group_manifest.update_group(self.current_group, files) # 忽略标记会改变组的统计
+                changes = NO_CHANGES
+            else:
+                with self.metrics.phase("refresh.scan"):
+                    all_files = scan_save_files(self.save_dir)  # 直接获取根目录的存档文件
+                    ignored_paths = self.store.ignored_paths()
+                    files = [file_info for file_info in all_files if file_info['path'] not in ignored_paths]
+                    self.group_manifest.update_group(self.current_group, files) # 目录变化、删除存档后都经过这里更新清单
+                    # 与上次刷新的指纹对比, 切换组或启动后的第一次刷新只记录基线
+                    changes = self.save_fingerprints.classify(self.current_group, all_files)
+                self.root_files = all_files
+            group_saves = self.store.get_group_saves(self.current_group) # 一次查询当前组所有存档的元数据
+            if rescan:
+                self.search_index.update_group(self.current_group, all_files, group_saves) # 只重新索引变化的存档
+            entries = []
+            self.all_files_info[str(self.current_group)] = {} # 初始化当前组的文件信息
+            for file_info in files:
+                file_path = file_info['path']
+                self.all_files_info[str(self.current_group)][file_path] = file_info # 存储文件信息
+                save_info = group_saves.get(file_path, {})
+                if save_info.get('is_new'):
+                    # 其他工具标记的新存档
+                    self.store.set_field(self.current_group, file_path, 'is_new', False) # 避免重复触发
+                    self.capture_save_image(file_path, file_info)
+                entries.append(self.make_entry(file_info, save_info))
+            self.entries = entries
+            for file_info in changes.added:
+                if file_info['path'] not in ignored_paths:
+                    self.capture_save_image(file_info['path'], file_info) # 新存档捕获截图
+            for file_info in changes.overwritten:
+                if file_info['path'] not in ignored_paths:
+                    self.capture_save_image(file_info['path'], file_info, replace=True) # 覆盖的存档重新截图
+            if files:
+                self.check_and_auto_switch_group() # 检查是否需要自动切换组
+            return entries
+
+    @staticmethod
+    def make_entry(file_info, save_info):
+        """合并扫描结果和元数据"""
+        return dict(file_info, note=save_info.get('note', ''), important=save_info.get('important', False),
+                    ignore=save_info.get('ignore', False), indent=save_info.get('indent', 0))
+
+    def list_group(self, group_index):
+        """列出任意组的存档; 当前组扫描根目录, 其他组扫描组文件夹 (已分块或归档的组为空)"""
+        if group_index == self.current_group:
+            return self.refresh()
+        group_saves = self.store.get_group_saves(group_index)
+        entries = []
+        for file_info in self.get_files_in_group(group_index):
+            root_path = os.path.join(self.save_dir, file_info['original_name']) # 元数据以存档在根目录时的路径为键
+            entries.append(self.make_entry(file_info, group_saves.get(root_path, {})))
+        return entries
+
+    def get_save_files_in_dir(self, directory):
+        """获取指定目录下所有匹配规则的存档文件，并按数字排序"""
+        ignored_paths = self.store.ignored_paths()
+        return scan_save_files(directory, ignored_paths)
+
+    def get_files_in_group(self, group_index):
+        """获取指定存档组的所有文件信息，并按数字排序"""
+        group_dir = os.path.join(self.save_dir, f"save{group_index}")
+        if os.path.exists(group_dir):
+            return scan_save_files(group_dir)
+        return []
+
+    def get_file_creation_date(self,filepath):
+        """获取文件的创建日期"""
+        return format_timestamp(os.path.getctime(filepath))
+
+    def resolve_save(self, ref):
+        """把路径、文件名或列表中的序号 (从 1 开始) 解析为根目录存档的路径, 找不到时返回 None"""
+        entries = self.entries or self.refresh()
+        if ref.isdigit() and 1 <= int(ref) <= len(entries):
+            return entries[int(ref) - 1]['path']
+        for entry in entries:
+            if ref in (entry['path'], entry['original_name'], entry['original_name'].rsplit('.', 1)[0]):
+                return entry['path']
+        path = os.path.abspath(ref)
+        return path if os.path.dirname(path) == os.path.abspath(self.save_dir) and os.path.exists(path) else None
+
+    # ---- 元数据 ----
+
+    def set_note(self, file_path, note, group_index=None):
+        """设置存档备注, 默认为当前组的存档"""
+        self.store.set_field(self.current_group if group_index is None else group_index, file_path, 'note', note)
+        self.save_config()
+
+    def set_flags(self, file_paths, field, value=None):
+        """设置当前组一批存档的标记; value 为 None 时切换布尔标记, indent 的 value 为增量"""
+        return self.bulk.set_flag({self.current_group: file_paths}, field, value)
+
+    def delete_saves(self, file_paths):
+        """删除当前组的一批存档及其截图, 返回 BulkResult"""
+        return self.bulk.delete({self.current_group: file_paths})
+
+    def move_saves(self, file_paths, target_group):
+        """把当前组的一批存档移到另一组, 返回 BulkResult"""
+        return self.bulk.move({self.current_group: file_paths}, target_group)
+
+    # ---- 搜索 ----
+
+    def ensure_search_index(self):
+        """还没有建立搜索索引时扫描所有组建立; 持有组切换锁, 扫描期间存档不会在组之间移动"""
+        with self.group_lock:
+            if not self.search_index.ready:
+                start = time.perf_counter()
+                self.search_index.build(self.save_dir, self.current_group, self.packed_group_stats())
+                stats = self.search_index.stats()
+                print(f"搜索索引已建立: {stats['saves']} 个存档, {stats['grams']} 个词, "
+                      f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def search(self, query, limit=None):
+        """在所有组中搜索备注、文件名、日期和组名, 支持 is:important、g:组号、date:前缀等过滤条件
+
+        返回带 'group' 的存档列表; 索引建立后只读内存
+        """
+        if not self.search_index.ready:
+            self.ensure_search_index()
+        return self.search_index.search(query, limit)
+
+    def get_group_display_name(self, group_index):
+        """获取组的显示名称"""
+        group_name = self.store.get_group_name(group_index)
+        return f"第{group_index}页, {group_name}"
+
+    def rename_group(self, group_index, name):
+        """修改组的名称"""
+        self.store.set_group_name(group_index, name)
+        self.save_config()
+
+    def get_selection(self):
+        return self.store.get_selection(self.current_group)
+
+    def set_selection(self, paths):
+        """记录当前组选中的存档"""
+        self.store.set_selection(self.current_group, paths)
+        self.save_config()
+
+    # ---- 组切换 ----
+
+    def get_current_group(self):
+       """ 获取当前根目录所属的存档组，没有则默认为1"""
+       return self.store.get_setting("current_group", 1)
+
+    def set_current_group(self, group_index):
+        """设置当前根目录所属的存档组"""
+        self.store.set_setting("current_group", group_index) # 立即写入数据库, 与磁盘上的文件位置保持一致
+        self.save_config()
+
+    def change_group(self, target_group):
+        """在组切换通道中切换存档组, 已有组切换在排队或执行时忽略"""
+        return self.task_scheduler.submit("group", ("group",), self.switch_group, target_group)
+
+    def switch_group(self, target_group):
+        """执行组切换: 根目录的存档移入旧组文件夹, 目标组移入根目录; 成功时返回 True"""
+        with self.group_lock:
+            return self._switch_group(target_group)
+
+    def _switch_group(self, target_group):
+        self.stop_auto_refresh() # 切换组时停止自动刷新
+
+        if os.path.exists(self.journal_file):
+            # 上次切换的回滚不完整, 先按日志恢复; 新的切换会覆盖日志, 恢复不了时不切换
+            self.recover_group_switch()
+            if os.path.exists(self.journal_file):
+                self.emit("error", "上次组切换有文件未能恢复原位置, 请检查后重试")
+                self.start_auto_refresh()
+                return False
+            self.current_group = self.get_current_group()
+            self.rebuild_group_manifest()
+            if self.current_group == target_group:
+                self.emit("saves_changed", self.refresh())
+                self.start_auto_refresh()
+                return True
+
+        old_group = self.current_group
+        old_group_dir = os.path.join(self.save_dir, f"save{old_group}")
+        target_group_dir = os.path.join(self.save_dir, f"save{target_group}")
+        os.makedirs(old_group_dir, exist_ok=True)
+        os.makedirs(target_group_dir, exist_ok=True)
+
+        unpack_time = 0.0
+        if self.chunk_store is not None:
+            try:
+                unpack_time = self.chunk_store.restore_group(target_group, target_group_dir) # 按分块记录重建目标组
+            except OSError as e:
+                print(f"Error restoring save{target_group} from chunks: {e}")
+                self.emit("error", f"还原第{target_group}组存档失败：{e}")
+                self.start_auto_refresh()
+                return False
+        if self.cold_storage is not None:
+            try:
+                unpack_time += self.cold_storage.restore_group(target_group, target_group_dir) # 流式解压归档的组
+            except OSError as e:
+                print(f"Error restoring save{target_group} from archive: {e}")
+                self.emit("error", f"解压第{target_group}组存档失败：{e}")
+                self.start_auto_refresh()
+                return False
+
+        # 一次性规划全部重命名: 根目录 -> 旧组文件夹, 目标组文件夹 -> 根目录
+        scan_start = time.perf_counter()
+        current_root_save_files = self.get_save_files_in_dir(self.save_dir)
+        target_group_save_files = self.get_files_in_group(target_group)
+        scan_time = time.perf_counter() - scan_start
+        journal = SwitchJournal(self.journal_file)
+        try:
+            plan = self.group_switcher.plan(self.save_dir, old_group_dir, target_group_dir,
+                                            current_root_save_files, target_group_save_files)
+            journal.begin(old_group, target_group, plan) # 移动前写入日志, 中途退出时下次启动恢复
+            self.group_switcher.execute(plan, journal)
+        except (GroupSwitchError, OSError) as e:
+            journal.close(remove=not getattr(e, "stuck", None)) # 回滚不完整时保留日志
+            print(f"Error switching from save{old_group} to save{target_group}: {e}")
+            self.emit("error", f"切换存档组失败：{e}")
+            if self.watcher is not None:
+                self.watcher.resync()
+            self.group_manifest.update_group(old_group, scan_save_files(old_group_dir))
+            self.emit("saves_changed", self.refresh())
+            self.start_auto_refresh()
+            return False
+        timings = dict(self.group_switcher.timings, scan=scan_time)
+        if unpack_time:
+            timings["unpack"] = unpack_time
+        for phase, seconds in timings.items():
+            self.metrics.record(f"switch_group.{phase}", seconds)
+        self.metrics.count("switch_group.files_moved", len(plan))
+        print(f"切换到第{target_group}组, 移动 {len(plan)} 个文件: " +
+              ", ".join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in timings.items()))
+
+        if self.watcher is not None:
+            self.watcher.resync() # 切换组产生的移动不视为新存档
+        self.group_manifest.update_group(old_group, scan_save_files(old_group_dir))
+
+        self.current_group = target_group
+        self.set_current_group(target_group)
+        journal.close() # 当前组已写入数据库, 切换完成
+        if self.cold_storage is not None:
+            self.cold_storage.record_access(old_group)
+            self.cold_storage.record_access(target_group)
+        self.emit("group_changed", old_group, target_group, self.refresh())
+
+        self.start_auto_refresh()  # 切换完成后重新启动自动刷新
+        if self.chunk_store is not None:
+            # 延迟分块保存旧组, 连续切换时先处理切换
+            self.task_scheduler.submit("group", ("pack", old_group), self.pack_group, old_group, delay=5.0)
+        return True
+
+    def check_and_auto_switch_group(self):
+        """检查是否需要自动切换到下一组, 存档数量直接从组清单读取"""
+        last_group = self.get_last_group_with_saves()
+        if self.current_group == last_group:
+            file_count = self.group_manifest.file_count(self.current_group)
+            if file_count and file_count >= self.max_saves_per_group:
+                self.change_group(self.current_group + 1)
+
+    def get_last_group_with_saves(self):
+        """获取最后有存档的组"""
+        return self.group_manifest.last_group_with_saves()
+
+    # ---- 截图 ----
+
+    def capture_save_image(self, file_path, file_info, replace=False):
+        """捕获指定存档的窗口截图, replace 时覆盖已有截图"""
+        if not self.current_game_title:
+            return
+        title = self.current_game_title
+        group_str = str(self.current_group)
+        if replace:
+            img_path = self.get_save_image_path(file_path, group_str, existing=False)
+        else:
+            img_path = self.get_save_image_path(file_path, group_str)
+        try:
+            # 检查是否已经存在或正在编码截图，如果存在则跳过
+            if (replace or not os.path.exists(img_path)) and not self.capture_encoder.is_pending(img_path):
+                # 相同截图的任务已在排队或执行时 submit 返回 False
+                if self.task_scheduler.submit("capture", ("capture", img_path), self.capture_window_image,
+                                              title, img_path, delay=self.stable_capture.initial_delay):
+                    # 立即将 is_new 设置为 False，避免重复触发
+                    if 'is_new' in self.store.get_save(group_str, file_path):
+                        self.store.set_field(group_str, file_path, 'is_new', False)
+                    self.emit("capture_requested", file_path)
+        except Exception as e:
+            print(f"Error capturing image for {file_path}: {e}")
+
+    def capture_window_image(self, window_title, save_path):
+        """用截图后端读取窗口像素, 编码和保存交给进程池"""
+        grab_start = time.perf_counter()
+        try:
+            frame = self.stable_capture.capture(self.capture_backend, window_title) # 跳过转场和黑屏
+            self.metrics.record("capture_window_image.grab", time.perf_counter() - grab_start)
+            if frame is None:
+                return
+            print(f"使用 {self.capture_backend.name} 截取窗口 '{window_title}' 耗时 "
+                  f"{(time.perf_counter() - grab_start) * 1000:.1f}ms, 稳定帧检测: {self.stable_capture.last_report}")
+            # 编码和保存在进程池中进行, 同时生成预缩放文件
+            self.capture_encoder.submit_frame(frame, save_path, callback=self.on_capture_encoded)
+        except Exception as e:
+            print(f"捕获窗口截图失败: {e}")
+
+    def on_capture_encoded(self, save_path, result, error):
+        """编码进程回调, 转交给调度线程处理"""
+        try:
+            self.schedule(0, self.handle_capture_encoded, save_path, result, error)
+        except RuntimeError:
+            pass # 主窗口已经关闭
+
+    def handle_capture_encoded(self, save_path, result, error):
+        """截图写入完成后加入哈希索引"""
+        if error is not None:
+            print(f"保存截图 '{save_path}' 失败: {error}")
+            return
+        print(f"截图已保存到 '{save_path}'")
+        self.metrics.count("bytes_written.screenshot", result[2])
+        self.remove_stale_screenshots(save_path)
+        saved = self.screenshot_index.add(save_path, *result, dedupe=self.store.get_setting("screenshot_dedupe", False))
+        if saved:
+            print(f"截图与已有截图完全相同, 合并后节省 {saved // 1024} KB")
+        self.emit("capture_saved", save_path)
+
+    def get_save_image_path(self, file_path, group_str=None, existing=True):
+        """获取存档对应的截图路径, 已有其他格式的截图时返回已有的文件; existing 为 False 时总是使用当前格式"""
+        if group_str is None:
+            group_str = str(self.current_group)
+        base_path = os.path.join(self.img_dir, f"{group_str}_{os.path.basename(file_path).rsplit('.', 1)[0]}")
+        extensions = screenshot_extensions(self.capture_encoder.format)
+        if existing:
+            for ext in extensions:
+                if os.path.exists(base_path + ext):
+                    return base_path + ext
+        return base_path + extensions[0] # 还没有截图, 使用当前格式
+
+    def remove_stale_screenshots(self, img_path):
+        """重新截图后删除同一存档其他格式的旧截图"""
+        base_path, current_ext = os.path.splitext(img_path)
+        for ext in screenshot_extensions(self.capture_encoder.format):
+            if ext != current_ext and os.path.exists(base_path + ext):
+                os.remove(base_path + ext)
+                self.screenshot_index.remove(base_path + ext)
+
+    def find_similar(self, file_path, group_index=None):
+        """查找与存档截图相似的其他截图 [(差异, 组显示名称, 存档名), ...]; 没有截图时返回 None"""
+        img_path = self.get_save_image_path(file_path, None if group_index is None else str(group_index))
+        if img_path not in self.screenshot_index:
+            return None
+        matches = self.screenshot_index.find_similar(img_path, self.store.get_setting("similar_max_distance", 6))
+        result = []
+        for distance, path in matches:
+            group_str, _, save_name = os.path.basename(path).rsplit('.', 1)[0].partition('_')
+            result.append((distance, self.get_group_display_name(group_str), save_name))
+        return result
+
+    # ---- 统计 ----
+
+    def stats(self):
+        """组清单、后台任务、配置写入、截图编码和存储的统计"""
+        result = {
+            "save_dir": self.save_dir,
+            "current_group": self.current_group,
+            "groups": {str(group_index): dict(zip(("files", "bytes", "last_modified"), stats))
+                       for group_index, stats in sorted(self.group_manifest.all_groups().items())},
+            "scheduler": self.task_scheduler.stats(),
+            "config_writer": self.config_writer.stats(),
+            "capture_encoder": self.capture_encoder.stats(),
+            "search": self.search_index.stats(),
+        }
+        if self.chunk_store is not None:
+            result["chunk_store"] = self.chunk_store.stats()
+        if self.cold_storage is not None:
+            result["cold_storage"] = self.cold_storage.stats()
+        if self.metrics.enabled:
+            result["metrics"] = self.metrics.snapshot()
+        return result
@@ -0,0 +1,103 @@
+import hashlib
+import collections
+
+# added: 新出现的存档, overwritten: 被覆盖的存档, removed: 消失的存档路径, unchanged: 未变化的存档数
+FingerprintChanges = collections.namedtuple("FingerprintChanges", ["added", "overwritten", "removed", "unchanged"])
+
+NO_CHANGES = FingerprintChanges([], [], [], 0)
+
+FAST_HASH_BYTES = 64 * 1024  # 快速哈希读取文件开头和结尾各 64 KB
+
+
+def fingerprint(file_info):
+    """存档的 (inode, 大小, 修改时间纳秒), 来自扫描时的 stat 信息"""
+    return file_info['ino'], file_info['size'], file_info['mtime_ns']
+
+
+def fast_hash(path, size):
+    """只读取文件开头和结尾计算的哈希, 用于确认修改时间变化时内容是否真的变化"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(FAST_HASH_BYTES))
+        if size > FAST_HASH_BYTES * 2:
+            f.seek(-FAST_HASH_BYTES, 2)
+            digest.update(f.read(FAST_HASH_BYTES))
+    return digest.digest()
+
+
+class FingerprintIndex:
+    """根目录中每个存档的指纹, 每次刷新时一次遍历即可分出新增、覆盖、未变化和删除的存档"""
+
+    def __init__(self, use_fast_hash=False):
+        self.use_fast_hash = use_fast_hash
+        self.group = None  # 指纹所属的组, 组变化后重新建立基线
+        self.fingerprints = {}  # 路径 -> 指纹
+        self.hashes = {}  # 路径 -> 快速哈希, 开启 use_fast_hash 时在建立基线和存档变化时计算
+
+    def reset(self):
+        """丢弃所有指纹, 下次刷新重新建立基线"""
+        self.group = None
+        self.fingerprints = {}
+        self.hashes = {}
+
+    def _remember_hash(self, path, size):
+        """记录存档当前内容的快速哈希, 之后只修改时间变化时与它比较"""
+        if not self.use_fast_hash:
+            return
+        try:
+            self.hashes[path] = fast_hash(path, size)
+        except OSError:
+            self.hashes.pop(path, None)
+
+    def accept(self, group, files):
+        """把移入根目录的存档记为已知, 下次刷新不当作新存档"""
+        if group == self.group:
+            for file_info in files:
+                self.fingerprints[file_info['path']] = fingerprint(file_info)
+                self._remember_hash(file_info['path'], file_info['size'])
+
+    def _same_content(self, path, size):
+        """修改时间变化但内容相同时 (例如只是被 touch) 返回 True"""
+        try:
+            new_hash = fast_hash(path, size)
+        except OSError:
+            return False
+        old_hash = self.hashes.get(path)
+        self.hashes[path] = new_hash
+        return old_hash == new_hash
+
+    def classify(self, group, files):
+        """对比扫描结果与上次的指纹; 组变化或首次调用时只记录基线, 不报告变化"""
+        if group != self.group:
+            self.group = group
+            self.fingerprints = {file_info['path']: fingerprint(file_info) for file_info in files}
+            self.hashes = {}
+            for file_info in files:
+                self._remember_hash(file_info['path'], file_info['size'])  # 第一次被 touch 时也能确认内容没变
+            return NO_CHANGES
+        added = []
+        overwritten = []
+        unchanged = 0
+        seen = {}
+        old = self.fingerprints
+        for file_info in files:
+            path = file_info['path']
+            new = fingerprint(file_info)
+            seen[path] = new
+            previous = old.get(path)
+            if previous is None:
+                self._remember_hash(path, new[1])
+                added.append(file_info)
+            elif previous == new:
+                unchanged += 1
+            elif self.use_fast_hash and previous[1] == new[1] and self._same_content(path, new[1]):
+                unchanged += 1
+            else:
+                if previous[1] != new[1]:
+                    self._remember_hash(path, new[1])  # 大小相同时 _same_content 已经记录
+                overwritten.append(file_info)
+        removed = [path for path in old if path not in seen] if len(seen) - len(added) != len(old) else []
+        for path in removed:
+            self.hashes.pop(path, None)
+        self.fingerprints = seen
+        return FingerprintChanges(added, overwritten, removed, unchanged)
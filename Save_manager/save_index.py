@@ -0,0 +1,61 @@
+import os
+import re
+import datetime
+
+# 存档文件名规则: 任意前缀 + 数字 + 后缀, 例如 save12.dat
+SAVE_FILE_PATTERN = re.compile(r'^(?P<base>.*?)(?P<num>\d+)(?P<ext>\..*)$')
+# 还原文件时的临时文件名, 不含数字, 不会被当作存档或截图
+STAGING_NAME = ".restoring.tmp"
+
+
+def staging_path(directory):
+    """在目标目录中写入临时文件再替换, 文件名不匹配存档规则"""
+    return os.path.join(directory, STAGING_NAME)
+
+
+_date_cache = {}  # 秒级时间戳 -> 日期字符串
+
+
+def format_timestamp(timestamp):
+    """将时间戳格式化为日期字符串, 同一秒内的结果直接复用"""
+    key = int(timestamp)
+    date = _date_cache.get(key)
+    if date is None:
+        if len(_date_cache) > 4096:
+            _date_cache.clear()
+        date = datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        _date_cache[key] = date
+    return date
+
+
+def scan_save_files(directory, ignored_paths=None):
+    """单次 scandir 扫描目录, 返回按数字排序的存档文件信息列表"""
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = SAVE_FILE_PATTERN.match(entry.name)
+            if not match:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()  # 复用 DirEntry 缓存的 stat 信息
+            except OSError:
+                continue  # 扫描期间文件被删除或移动
+            file_path = os.path.join(directory, entry.name)
+            if ignored_paths and file_path in ignored_paths:
+                continue  # 如果被忽略则跳过
+            files.append({
+                'original_name': entry.name,
+                'base_name': match.group("base"),
+                'num': int(match.group("num")),
+                'ext': match.group("ext"),
+                'path': file_path,
+                'date': format_timestamp(stat.st_ctime),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'mtime_ns': stat.st_mtime_ns,
+                'ino': stat.st_ino
+            })
+    files.sort(key=lambda x: x['num'])  # 稳定排序, 同号文件保持扫描顺序
+    return files
@@ -1,110 +1,164 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
-import shutil
-import json
-import datetime
-import re
 import time
-import threading
-import subprocess
-import queue
-from PIL import Image, ImageTk
-import psutil
-import pygetwindow as gw
-from utils import logger
+import functools
+from virtual_list import VirtualSaveList
+from thumbnail_cache import ThumbnailCache
+from capture_encoder import screenshot_extensions
+from image_loader import ImageDecodePool
+from startup_snapshot import load_snapshot, write_snapshot, write_preview, remove_snapshot, preview_path
+
+# PIL 和 SaveEngine 在窗口显示之后才导入
+
+# 开启统计时计时的界面方法, 名称即计时器名称; 存档管理的方法由 SaveEngine 计时
+INSTRUMENTED_METHODS = ("update_save_list", "show_selected_image")
+
+
+def requires_engine(method):
+    """按快照显示、引擎还没有创建时忽略界面操作"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.engine is None:
+            return None
+        return method(self, *args, **kwargs)
+    return wrapper
+
 
 class SaveManagerApp:
+    """存档管理器界面: 存档管理都由 SaveEngine 完成, 这里只负责显示、选中状态和截图预览"""
+
     def __init__(self, root):
         self.root = root
         self.root.title("存档管理器")
         self.root.geometry("1200x550")
 
-        self.save_dir = os.getcwd()  # 获取当前工作目录作为存档目录
-        self.config_file = os.path.join(self.save_dir, "save_config.json")
-        self.temp_dir = os.path.join(self.save_dir, "temp_save")
-        self.titles_file = os.path.join(self.save_dir, "titles.json")
-        self.img_dir = os.path.join(self.save_dir, "img")
-        os.makedirs(self.img_dir, exist_ok=True)
-
-        self.save_data = self.load_config()
-        self.current_group = self.get_current_group()
-        self.auto_refresh_interval = 3 # 自动刷新间隔
-        self._auto_refresh_id = None
+        save_dir = os.getcwd()  # 当前工作目录作为存档目录
+        snapshot = load_snapshot(save_dir) # 上次关闭时的列表, 有快照时先显示窗口再创建引擎
+        self.engine = None
         self.editing_item = None
         self.editing_column = None
         self.edit_entry = None
-        self.current_title = self.load_titles()
-        # self.last_file_info = {} # 用于存储上次的文件信息，用于判断是否是新增存档
-        self.task_queue = queue.Queue() # 任务队列
-        self.is_processing_task = False # 是否正在处理任务
-        self.all_files_info = {} # 用于存储所有文件信息
-        self.selected_item_path = None # 当前选中的存档路径
-        self.game_list_file = self.find_game_list_file()
-        self.game_list = self.load_game_list()
-        self.current_game_title = self.get_current_game_title()
-        self.max_saves_per_group = 9999 # 默认最大存档数
-        self.pending_group_change = None # 待处理的组切换
+        self.selected_item_path = None # 当前选中存档的 iid, 当前组为存档路径, 其他组为 "组序号|路径"
+        self.search_query = "" # 搜索框中生效的查询, 非空时列表显示所有组的搜索结果
+        self.search_delay_ms = 30 # 输入停顿后再搜索
+        self._search_after_id = None
+        self.virtual_list_threshold = snapshot["threshold"] if snapshot else 1000 # 超过该存档数时启用虚拟列表
+        self.rendered_group = None # 存档列表当前显示的组
+        self.shown_image_key = None # 当前显示截图的 (路径, 修改时间, 尺寸)
+        self.thumbnail_cache = ThumbnailCache() # 已解码截图的 LRU 缓存
+        self.image_pool = ImageDecodePool(self.root) # 后台解码截图
+        self.pending_image_key = None # 正在后台解码、等待显示的截图
+        self.image_requested_at = 0.0 # 开始解码 pending_image_key 的时间
+        self.image_frame_size = None
+        self.debug_panel = None
 
         self.create_widgets()
-        self.update_save_list()
-        self.start_auto_refresh()
-        self.root.after(100, self.init_show_selected_image) # 初始化时加载截图
-
-    def load_config(self):
-        """加载配置文件"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.max_saves_per_group = data.get("max_saves_per_group", 9999) # 加载最大存档数
-                return data
+        if snapshot is not None:
+            self.show_snapshot(snapshot)
+            self.root.update() # 先显示窗口, 引擎和目录扫描在之后进行
+            self.root.after(0, self.start_engine, save_dir, True)
         else:
-            return {
-                "current_group": 1,
-                "groups": {},
-                "group_names": {},
-                "selected_files": {},
-                "max_saves_per_group": 9999
-            }
-
-    def save_config(self):
-        """保存配置文件"""
-        self.save_data["max_saves_per_group"] = self.max_saves_per_group # 保存最大存档数
-        with open(self.config_file, "w", encoding="utf-8") as f:
-            json.dump(self.save_data, f, indent=4, ensure_ascii=False)
-
-    def load_titles(self):
-        """加载标题配置文件"""
-        if os.path.exists(self.titles_file):
-            with open(self.titles_file, "r", encoding="utf-8") as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    return {}
+            self.start_engine(save_dir)
+
+    def create_engine(self, save_dir):
+        """创建存档目录的引擎, 定时回调都在 Tk 主线程中执行"""
+        from save_engine import SaveEngine
+        engine = SaveEngine(save_dir, schedule=self.root.after, cancel=self.root.after_cancel)
+        engine.add_listener(self.on_engine_event)
+        return engine
+
+    def start_engine(self, save_dir, from_snapshot=False):
+        """创建引擎并显示存档列表; 已按快照显示时在后台扫描目录, 完成后通过 saves_changed 更新"""
+        self.engine = self.create_engine(save_dir) # 按新目录的设置决定是否统计
+        if self.metrics.enabled:
+            self.metrics.instrument(self, INSTRUMENTED_METHODS)
+        self.virtual_list_threshold = self.engine.store.get_setting("virtual_list_threshold", 1000)
+        self.save_list.threshold = self.virtual_list_threshold
+        self.update_title_label()
+        if from_snapshot:
+            engine = self.engine
+            engine.task_scheduler.submit("index", ("startup",), lambda: engine.emit("saves_changed", engine.refresh()))
         else:
-            return {}
-
-    def save_titles(self):
-        """保存标题配置文件"""
-        with open(self.titles_file, "w", encoding="utf-8") as f:
-            json.dump(self.current_title, f, indent=4, ensure_ascii=False)
-
-    def start_auto_refresh(self):
-        """启动定时自动刷新"""
-        self.stop_auto_refresh()  # 确保只有一个定时器在运行
-        self._auto_refresh_id = self.root.after(self.auto_refresh_interval * 1000 , self.auto_refresh)
-
-    def stop_auto_refresh(self):
-        """停止定时自动刷新"""
-        if self._auto_refresh_id:
-            self.root.after_cancel(self._auto_refresh_id)
-            self._auto_refresh_id = None
-
-    def auto_refresh(self):
-         """定时自动刷新"""
-         self.update_save_list()
-         self.process_task_queue() # 每次刷新都检查是否有任务
-         self.start_auto_refresh()
+            self.update_save_list()
+        self.engine.start()
+        self.root.after(100, self.init_show_selected_image) # 初始化时加载截图
+
+    def show_snapshot(self, snapshot):
+        """按快照显示存档列表、选中项和截图, 不访问存档目录"""
+        self.rendered_group = snapshot["current_group"]
+        self.group_label.config(text=snapshot["group_label"])
+        if snapshot["search"]:
+            self.search_query = snapshot["search"]
+            self.search_entry.insert(0, self.search_query)
+        self.save_list.set_rows([(iid, (index, note, date, name), (iid, tag))
+                                 for iid, index, note, date, name, tag in snapshot["rows"]])
+        self.save_list.select(snapshot["selection"])
+        self.selected_item_path = snapshot["selected"]
+        if snapshot["preview"]:
+            try:
+                photo = tk.PhotoImage(file=preview_path(os.path.join(snapshot["save_dir"], "img")))
+            except tk.TclError:
+                return
+            self.image_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+            self.image_label.config(image=photo, text="")
+            self.image_label.image = photo
+
+    def write_startup_snapshot(self):
+        """关闭时保存列表、选中项和正在显示的截图, 供下次启动立即显示"""
+        if not self.engine.store.get_setting("startup_snapshot", True):
+            remove_snapshot(self.save_dir, self.engine.img_dir)
+            return
+        preview = False
+        if self.shown_image_key is not None:
+            img_path, _, size = self.shown_image_key
+            preview = write_preview(self.engine.img_dir, img_path, size)
+        try:
+            write_snapshot(self.save_dir, {
+                "current_group": self.current_group,
+                "group_label": self.engine.get_group_display_name(self.current_group),
+                "search": self.search_query,
+                "threshold": self.virtual_list_threshold,
+                "rows": [(iid, *values, tags[1]) for iid, values, tags in self.save_list.rows],
+                "selection": self.save_list.selected_paths(),
+                "selected": self.selected_item_path,
+                "preview": preview,
+            })
+        except OSError as e:
+            print(f"保存启动快照失败: {e}")
+
+    @property
+    def metrics(self):
+        return self.engine.metrics
+
+    @property
+    def current_group(self):
+        return self.engine.current_group
+
+    @property
+    def save_dir(self):
+        return self.engine.save_dir
+
+    def on_engine_event(self, event, *args):
+        """引擎事件可能来自组切换通道, 统一转交给 Tk 主线程处理"""
+        try:
+            self.root.after(0, self.handle_engine_event, event, args)
+        except RuntimeError:
+            pass # 主窗口已经关闭
+
+    def handle_engine_event(self, event, args):
+        if event == "saves_changed":
+            self.update_save_list(args[0])
+        elif event == "group_changed":
+            self.update_save_list(args[2])
+            # 切换组后更新截图显示
+            self.root.after(100, self.show_selected_image)  # 延迟执行，确保文件移动完成
+        elif event == "capture_requested":
+            self.root.after(100, self.select_tree_item, args[0]) # 截图后选中对应的项
+        elif event == "capture_saved":
+            self.on_capture_saved(args[0])
+        elif event == "error":
+            messagebox.showerror("错误", args[0])
 
     def create_widgets(self):
         """创建GUI组件"""
@@ -114,13 +168,18 @@ class SaveManagerApp:
         nav_frame.pack(fill=tk.X, padx=10, pady=5)
 
         ttk.Button(nav_frame, text="选择存档目录", command=self.select_save_directory).pack(side=tk.LEFT, padx=5)
-        self.group_label = ttk.Label(nav_frame, text=self.get_group_display_name(self.current_group))
+        self.group_label = ttk.Label(nav_frame, text="")
         self.group_label.pack(side=tk.LEFT, padx=5)
         self.prev_button = ttk.Button(nav_frame, text="上一组", command=self.prev_group)
         self.prev_button.pack(side=tk.LEFT, padx=5)
         self.next_button = ttk.Button(nav_frame, text="下一组", command=self.next_group)
         self.next_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(nav_frame, text="修改组名", command=self.rename_group).pack(side=tk.LEFT, padx=5)
+        ttk.Label(nav_frame, text="搜索").pack(side=tk.LEFT, padx=(5, 0))
+        self.search_entry = ttk.Entry(nav_frame, width=24)
+        self.search_entry.pack(side=tk.LEFT, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.on_search_changed)
+        self.search_entry.bind("<Escape>", self.clear_search)
         self.title_label = ttk.Label(nav_frame, text="")
         self.title_label.pack(side=tk.LEFT, padx=5)
         ttk.Button(nav_frame, text="打开游戏目录", command=self.open_game_dir).pack(side=tk.LEFT, padx=5) # 打开游戏目录按钮
@@ -148,11 +207,14 @@ class SaveManagerApp:
         self.save_tree.tag_configure("important", anchor="e") # 星星靠右对齐
         self.save_tree.tag_configure("normal", anchor="w") # 序号靠左对齐
         self.save_tree.bind("<Double-1>", self.on_tree_double_click)
+        self.save_tree.bind("<KeyRelease-Up>", self.on_tree_key_select)
+        self.save_tree.bind("<KeyRelease-Down>", self.on_tree_key_select)
 
         # 滚动条
-        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.save_tree.yview)
+        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.save_tree.configure(yscrollcommand=scrollbar.set)
+        # 存档数量超过阈值时只渲染可见区域, 滚动条由 save_list 接管
+        self.save_list = VirtualSaveList(self.save_tree, scrollbar, threshold=self.virtual_list_threshold)
 
         # 右侧功能按钮框架
         button_frame = ttk.Frame(main_frame)
@@ -169,253 +231,141 @@ class SaveManagerApp:
         self.ignore_button.pack(side=tk.LEFT, padx=2)
 
         ttk.Button(button_frame, text="删除存档", command=self.delete_save).pack(fill=tk.X, pady=5)
-        
+        ttk.Button(button_frame, text="移动到其他组", command=self.move_save).pack(fill=tk.X, pady=5)
+        ttk.Button(button_frame, text="查找相似截图", command=self.find_similar_saves).pack(fill=tk.X, pady=5)
+
         # 截图显示区域
         self.image_frame = ttk.Frame(button_frame, width=600, height=400, relief=tk.SOLID, borderwidth=1) # 宽度和高度都放大到原来的两倍
         self.image_frame.pack(fill=tk.BOTH, expand=True, pady=10)
         self.image_label = ttk.Label(self.image_frame)
         self.image_label.pack(fill=tk.BOTH, expand=True)
         self.show_default_image()
-        self.update_title_label()
         self.image_label.bind("<Double-1>", self.open_image)
+        self.image_frame.bind("<Configure>", self.on_image_frame_resized)
 
         # 启动按钮框架
         self.button_frame = ttk.Frame(self.root)
         self.button_frame.pack(fill=tk.X, padx=10, pady=5)
         self.launch_save_button = ttk.Button(self.button_frame, text="打开存档目录", command=self.open_save_dir, state=tk.DISABLED, padding=10)
         self.launch_save_button.pack(side=tk.RIGHT, padx=5)
+        self.root.bind("<Control-Shift-D>", self.toggle_debug_panel) # 隐藏的性能统计面板
+        self.root.bind("<Control-f>", lambda event: self.search_entry.focus_set())
 
+    @requires_engine
     def select_save_directory(self):
         """选择存档目录"""
         directory = filedialog.askdirectory(title="选择存档目录")
         if directory:
-            self.save_dir = directory
-            os.chdir(self.save_dir) # 将程序的工作目录切换到新选的存档目录
-            self.config_file = os.path.join(self.save_dir, "save_config.json") # 同时更新配置文件路径
-            self.temp_dir = os.path.join(self.save_dir, "temp_save")
-            self.titles_file = os.path.join(self.save_dir, "titles.json")
-            self.img_dir = os.path.join(self.save_dir, "img")
-            os.makedirs(self.img_dir, exist_ok=True)
-            self.save_data = self.load_config()
-            self.current_group = self.get_current_group()
-            self.current_title = self.load_titles()
-            self.update_save_list()
-            self.update_title_label()
-            self.current_game_title = self.get_current_game_title()
-
-    def update_save_list(self):
-        """更新存档列表显示，现在显示根目录的存档"""
-        self.save_tree.delete(*self.save_tree.get_children())
-        self.group_label.config(text=self.get_group_display_name(self.current_group))
-        files = self.get_save_files_in_dir(self.save_dir)  # 直接获取根目录的存档文件
-        if files:
-            self.all_files_info[str(self.current_group)] = {} # 初始化当前组的文件信息
-            for i, file_info in enumerate(files):
-                group_char = chr(64 + self.current_group)  # 获取组序号 A, B, C...
-                file_path = file_info.get("path","")
-                self.all_files_info[str(self.current_group)][file_path] = file_info # 存储文件信息
-                note = self.save_data.get('groups',{}).get(str(self.current_group),{}).get(file_path, {}).get('note', '')
-                is_important = self.save_data.get('groups',{}).get(str(self.current_group),{}).get(file_path, {}).get('important', False)
-                indent_level = self.save_data.get('groups',{}).get(str(self.current_group),{}).get(file_path, {}).get('indent', 0) # 获取缩进级别
-                file_name = file_info['original_name'].rsplit('.', 1)[0] # 去除后缀
-                display_name = f"{file_name}" # 名称
-                date = file_info.get("date","")
-                is_ignored = self.save_data.get('groups',{}).get(str(self.current_group),{}).get(file_path, {}).get('ignore', False)
-                if is_ignored:
-                    continue # 如果被忽略则跳过
-                # 检查存档是否是新的
-                is_new = self.is_new_save(file_path, file_info)
-                if is_new:
-                    self.capture_save_image(file_path, file_info) # 如果是新存档则捕获截图
-                # 记录存档新旧状态
-                self.save_data.setdefault('groups', {}).setdefault(str(self.current_group), {}).setdefault(file_path, {})['is_new'] = is_new # 记录新旧状态
-                
+            self.metrics.set_enabled(False) # 移除旧引擎和界面上的计时包装
+            self.write_startup_snapshot()
+            self.engine.close() # 切换目录前保存旧目录的配置
+            os.chdir(directory) # 将程序的工作目录切换到新选的存档目录
+            self.rendered_group = None
+            self.selected_item_path = None
+            self.start_engine(directory)
+
+    def update_save_list(self, entries=None):
+        """更新存档列表显示，现在显示根目录的存档; entries 为空时由引擎重新扫描
+
+        搜索框有内容时改为显示所有组的搜索结果, 结果只来自内存中的索引
+        """
+        if entries is None:
+            entries = self.engine.refresh()
+        self.group_label.config(text=self.engine.get_group_display_name(self.current_group))
+        if self.rendered_group != self.current_group:
+            self.save_list.clear_selection() # 切换组后选中状态由新组的配置恢复
+            self.rendered_group = self.current_group
+        if self.search_query:
+            rows = self.search_rows()
+        else:
+            rows = []
+            group_char = chr(64 + self.current_group)  # 获取组序号 A, B, C...
+            for i, entry in enumerate(entries):
+                file_path = entry['path']
+                is_important = entry['important']
+                indent_level = entry['indent'] # 获取缩进级别
+                display_name = entry['original_name'].rsplit('.', 1)[0] # 去除后缀
                 tag = "important" if is_important else "normal"  # 根据是否重要设置tag
                 index = f"{'→ ' * indent_level}Save {group_char}{i + 1} {'★' if is_important else ''}" # 将星星和缩进添加到序号中
-                self.save_tree.insert("", "end", iid=file_path, values=(index, note, date, display_name), tags=(file_path,tag))
-            self.restore_selected_items()
-            self.show_selected_image()
-            self.check_and_auto_switch_group() # 检查是否需要自动切换组
-
-    def get_save_files_in_dir(self, directory):
-        """获取指定目录下所有匹配规则的存档文件，并按数字排序"""
-        files = []
-        pattern = re.compile(r'^(?P<base>.*?)(?P<num>\d+)(?P<ext>\..*)$')
-        all_files = os.listdir(directory)
-        for filename in all_files:
-            if os.path.isfile(os.path.join(directory, filename)):
-                match = pattern.match(filename)
-                if match:
-                    base = match.group("base")
-                    num = int(match.group("num"))
-                    ext = match.group("ext")
-                    count = 0
-                    for other_filename in all_files:
-                        if os.path.isfile(os.path.join(directory, other_filename)):
-                            other_match = pattern.match(other_filename)
-                            if other_match and other_match.group("base") == base and other_match.group("ext") == ext:
-                                count+=1
-                    # 修改这里，允许只有一组存档时也能显示
-                    if count >= 1:
-                        file_path = os.path.join(directory, filename)
-                        is_ignored = False
-                        for group_key in self.save_data.get('groups', {}):
-                            if file_path in self.save_data['groups'].get(group_key, {}):
-                                if self.save_data['groups'][group_key][file_path].get('ignore', False):
-                                    is_ignored = True
-                                    break
-                        if is_ignored:
-                            continue # 如果被忽略则跳过
-                        files.append({
-                            'original_name': filename,
-                            'base_name': base,
-                            'num': num,
-                            'ext': ext,
-                            'path': file_path,
-                            'date': self.get_file_creation_date(file_path)
-                        })
-        files.sort(key=lambda x: x['num'])
-        return files
-
-    def get_files_in_group(self, group_index):
-        """获取指定存档组的所有文件信息，并按数字排序"""
-        group_dir = os.path.join(self.save_dir, f"save{group_index}")
-        if os.path.exists(group_dir):
-            files = []
-            pattern = re.compile(r'^(?P<base>.*?)(?P<num>\d+)(?P<ext>\..*)$')
-            for f in os.listdir(group_dir):
-                if os.path.isfile(os.path.join(group_dir, f)):
-                    match = pattern.match(f)
-                    if match:
-                        files.append({
-                            'original_name': f,
-                            'base_name': match.group("base"),
-                            'num': int(match.group("num")),
-                            'ext': match.group("ext"),
-                            'path': os.path.join(group_dir, f),
-                            'date': self.get_file_creation_date(os.path.join(group_dir, f))
-                        })
-            files.sort(key=lambda x: x['num'])
-            return files
-        return []
-
-    def get_file_creation_date(self,filepath):
-        """获取文件的创建日期"""
-        timestamp = os.path.getctime(filepath)
-        date = datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        return date
-
-    def is_new_save(self, file_path, file_info):
-        """判断存档是否是新的"""
-        group_str = str(self.current_group)
-        # 优先使用 JSON 中的新旧状态
-        if 'groups' in self.save_data and group_str in self.save_data['groups'] and file_path in self.save_data['groups'][group_str] and 'is_new' in self.save_data['groups'][group_str][file_path]:
-            if self.save_data['groups'][group_str][file_path]['is_new']:
-                self.save_data['groups'][group_str][file_path]['is_new'] = False # 修改为False，避免重复触发
-                self.check_and_auto_switch_group() # 检查是否需要自动切换组
-                return True
-            else:
-                return False
-
-        img_name = f"{group_str}_{file_info['original_name'].rsplit('.', 1)[0]}.png"
-        img_path = os.path.join(self.img_dir, img_name)
-        if not os.path.exists(img_path):
-            creation_time = os.path.getctime(file_path)
-            current_time = time.time()
-            return current_time - creation_time <= 60  # 一分钟内创建的认为是新存档
-        return False
-
-    def get_current_group(self):
-       """ 获取当前根目录所属的存档组，没有则默认为1"""
-       return self.save_data.get("current_group",1)
-
-    def set_current_group(self, group_index):
-        """设置当前根目录所属的存档组"""
-        self.save_data["current_group"] = group_index
-        self.save_config()
-
+                rows.append((file_path, (index, entry['note'], entry.get("date", ""), display_name), (file_path, tag)))
+        with self.metrics.phase("update_save_list.tree"):
+            inserted = self.save_list.set_rows(rows) # 只增删改有变化的行
+        if rows:
+            self.restore_selected_items(inserted)
+            self.show_selected_image() # 截图未变化时不会重新加载
+
+    def search_rows(self):
+        """搜索结果的行, 序号列显示存档所在的组"""
+        rows = []
+        for entry in self.engine.search(self.search_query):
+            group_index = entry['group']
+            iid = entry['path'] if group_index == self.current_group else f"{group_index}|{entry['path']}"
+            is_important = entry['important']
+            display_name = entry['original_name'].rsplit('.', 1)[0]
+            tag = "important" if is_important else "normal"
+            index = f"{'→ ' * entry['indent']}第{group_index}组 {'★' if is_important else ''}"
+            rows.append((iid, (index, entry['note'], entry['date'], display_name), (iid, tag)))
+        return rows
+
+    def on_search_changed(self, event=None):
+        """搜索框内容变化后稍等再搜索, 连续输入时只搜索一次"""
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(self.search_delay_ms, self.apply_search)
+
+    def clear_search(self, event=None):
+        self.search_entry.delete(0, tk.END)
+        self.apply_search()
+
+    @requires_engine
+    def apply_search(self, query=None):
+        """按搜索框的内容重新显示列表, 清空时恢复当前组的存档; 不重新扫描目录"""
+        self._search_after_id = None
+        if query is None:
+            query = self.search_entry.get()
+        query = query.strip()
+        if query != self.search_query:
+            self.search_query = query
+            self.update_save_list(self.engine.entries)
+
+    def split_iid(self, iid):
+        """把列表行的 iid 拆分为 (组序号, 存档路径)"""
+        group_str, sep, path = iid.partition("|")
+        if sep and group_str.isdigit():
+            return int(group_str), path
+        return self.current_group, iid
+
+    def selected_targets(self):
+        """选中的存档按组整理为 {组序号: [存档路径, ...]}, 搜索时可能包含多个组"""
+        targets = {}
+        for iid in self.save_list.selected_paths():
+            group_index, path = self.split_iid(iid)
+            targets.setdefault(group_index, []).append(path)
+        return targets
+
+    def image_path_of(self, iid):
+        """列表行对应的截图路径"""
+        group_index, path = self.split_iid(iid)
+        return self.engine.get_save_image_path(path, str(group_index))
+
+    @requires_engine
     def prev_group(self):
         """切换到上一组存档"""
         target_group = max(1, self.current_group - 1)
         self.change_group(target_group)
 
+    @requires_engine
     def next_group(self):
         """切换到下一组存档"""
         self.change_group(self.current_group + 1)
 
+    @requires_engine
     def change_group(self, target_group):
-        """切换存档组核心逻辑"""
-        if self.pending_group_change is not None:
-            return # 如果有待处理的组切换，则直接返回
-        self.pending_group_change = target_group
-        self.task_queue.put(target_group) # 添加任务到队列
-        self.process_task_queue() # 尝试处理任务
-
-    def process_task_queue(self):
-        """处理任务队列"""
-        if self.is_processing_task:
-            return  # 如果正在处理任务则直接返回
-        if not self.task_queue.empty():
-            self.is_processing_task = True
-            task = self.task_queue.get()
-            if isinstance(task, tuple) and len(task) == 3:
-                title, img_path, delay_time = task
-                if time.time() >= delay_time:
-                    threading.Thread(target=self.execute_capture_image, args=(title, img_path)).start()
-                    self.is_processing_task = False  # 只有在执行任务后才释放锁
-                    self.process_task_queue() # 执行完任务后，再次尝试处理队列
-                else:
-                    self.task_queue.put((title, img_path, delay_time))  # 如果时间未到，则重新放回队列
-                    self.is_processing_task = False # 释放锁，以便下次处理
-                    self.root.after(100, self.process_task_queue)  # 延迟100毫秒后再次尝试
-            else:
-                threading.Thread(target=self.execute_group_change, args=(task,)).start()
-
-    def execute_group_change(self, target_group):
-        """执行组切换的核心逻辑"""
-        try:
-            self.save_selected_items() # 保存当前选中项
-            self.stop_auto_refresh() # 切换组时停止自动刷新
-
-            old_group = self.current_group
-
-            # 移动当前根目录的存档文件到旧的组文件夹
-            old_group_dir = os.path.join(self.save_dir, f"save{old_group}")
-            os.makedirs(old_group_dir, exist_ok=True)
-            current_root_save_files = self.get_save_files_in_dir(self.save_dir)
-            for file_info in current_root_save_files:
-                try:
-                    shutil.move(file_info['path'], old_group_dir)
-                except Exception as e:
-                    print(f"Error moving {file_info['original_name']} to save{old_group}: {e}")
-                    messagebox.showerror("错误", f"移动文件 {file_info['original_name']} 失败：{e}")
-
-            # 移动目标组的存档文件到根目录
-            target_group_dir = os.path.join(self.save_dir, f"save{target_group}")
-            if not os.path.exists(target_group_dir):
-                os.makedirs(target_group_dir)
-
-            target_group_save_files = self.get_files_in_group(target_group)
-            for file_info in target_group_save_files:
-                try:
-                    shutil.move(file_info['path'], self.save_dir)
-                except Exception as e:
-                    print(f"Error moving {file_info['original_name']} from save{target_group} to root: {e}")
-                    messagebox.showerror("错误", f"移动文件 {file_info['original_name']} 失败：{e}")
-
-            self.current_group = target_group
-            self.set_current_group(target_group)
-            self.update_save_list()
-            
-            # 切换组后更新截图显示
-            self.root.after(100, self.show_selected_image)  # 延迟执行，确保文件移动完成
-
-            self.start_auto_refresh()  # 切换完成后重新启动自动刷新
-        finally:
-            self.is_processing_task = False
-            self.pending_group_change = None # 清除待处理的组切换
-            self.process_task_queue() # 再次尝试处理任务
+        """保存选中项后由引擎在后台切换存档组, 完成后通过 group_changed 事件刷新"""
+        self.save_selected_items() # 保存当前选中项
+        self.engine.change_group(target_group)
 
+    @requires_engine
     def edit_note(self, item_id, column):
         """在 Treeview 的单元格上编辑备注"""
         if self.edit_entry:  # 如果已经有编辑器，则销毁
@@ -423,7 +373,7 @@ class SaveManagerApp:
 
         self.editing_item = item_id
         self.editing_column = column
-        current_note = self.save_data.get('groups',{}).get(str(self.current_group), {}).get(item_id, {}).get('note', '')
+        current_note = self.engine.store.get_save(*self.split_iid(item_id)).get('note', '')
 
         # 获取单元格的 bounding box
         x, y, width, height = self.save_tree.bbox(item_id, column)
@@ -436,136 +386,159 @@ class SaveManagerApp:
         self.edit_entry.bind("<FocusOut>", self.finish_edit)
         self.edit_entry.bind("<Return>", self.finish_edit)
         self.edit_entry.place(x=x, y=y, width=width, height=height)
-        self.stop_auto_refresh() # 编辑时停止自动刷新
+        self.engine.stop_auto_refresh() # 编辑时停止自动刷新
 
+    @requires_engine
     def finish_edit(self, event=None):
         """完成编辑并保存备注"""
         if self.editing_item and self.editing_column and self.edit_entry:
             new_note = self.edit_entry.get()
-            group_str = str(self.current_group)
-            self.save_data.setdefault('groups', {}).setdefault(group_str, {}).setdefault(self.editing_item, {})['note'] = new_note
-            self.save_config()
+            group_index, file_path = self.split_iid(self.editing_item)
+            self.engine.set_note(file_path, new_note, group_index)
             # 不需要刷新整个列表，只需要更新修改的项
             current_values = self.save_tree.item(self.editing_item, 'values')
-            self.save_tree.item(self.editing_item, values=(current_values[0], new_note, current_values[2], current_values[3]))
+            self.save_list.set_values(self.editing_item, (current_values[0], new_note, current_values[2], current_values[3]))
             self.edit_entry.destroy()
             self.edit_entry = None
             self.editing_item = None
             self.editing_column = None
-            self.start_auto_refresh() # 结束编辑后恢复自动刷新
+            self.engine.start_auto_refresh() # 结束编辑后恢复自动刷新
+
+    @requires_engine
+    def set_selected_flags(self, field, value, prompt):
+        """修改选中存档的标记后刷新列表"""
+        targets = self.selected_targets()
+        if not targets:
+            messagebox.showinfo("提示", prompt)
+            return
+        self.engine.bulk.set_flag(targets, field, value)
+        self.update_save_list(self.engine.refresh(rescan=False)) # 只有元数据变化, 不重新扫描目录
 
     def toggle_important(self):
-         """标记/取消标记选中存档为关键存档"""
-         selected_items = self.save_tree.selection()
-         if not selected_items:
-             messagebox.showinfo("提示", "请选择要标记的存档")
-             return
-         for item in selected_items:
-            file_path = self.save_tree.item(item, 'tags')[0]
-            if 'groups' not in self.save_data:
-                self.save_data["groups"] = {}
-            group_str = str(self.current_group)
-            if group_str not in self.save_data["groups"]:
-                self.save_data["groups"][group_str] = {}
-            if file_path not in self.save_data["groups"][group_str]:
-                self.save_data["groups"][group_str][file_path] = {}
-            current_important = self.save_data["groups"][group_str][file_path].get('important', False)
-            self.save_data["groups"][group_str][file_path]['important'] = not current_important
-         self.save_config()
-         self.update_save_list()
+        """标记/取消标记选中存档为关键存档"""
+        self.set_selected_flags('important', None, "请选择要标记的存档")
 
     def toggle_ignore(self):
         """标记/取消标记选中存档为忽略存档"""
-        selected_items = self.save_tree.selection()
-        if not selected_items:
-            messagebox.showinfo("提示", "请选择要标记的存档")
-            return
-        for item in selected_items:
-            file_path = self.save_tree.item(item, 'tags')[0]
-            if 'groups' not in self.save_data:
-                self.save_data["groups"] = {}
-            group_str = str(self.current_group)
-            if group_str not in self.save_data["groups"]:
-                self.save_data["groups"][group_str] = {}
-            if file_path not in self.save_data["groups"][group_str]:
-                self.save_data["groups"][group_str][file_path] = {}
-            current_ignore = self.save_data["groups"][group_str][file_path].get('ignore', False)
-            self.save_data["groups"][group_str][file_path]['ignore'] = not current_ignore
-        self.save_config()
-        self.update_save_list()
+        self.set_selected_flags('ignore', None, "请选择要标记的存档")
+
+    def indent_save(self):
+        """增加选中存档的缩进"""
+        self.set_selected_flags('indent', 1, "请选择要增加缩进的存档") # 最大缩进5级
 
+    def unindent_save(self):
+        """减少选中存档的缩进"""
+        self.set_selected_flags('indent', -1, "请选择要减少缩进的存档") # 最小缩进0级
+
+    @requires_engine
     def delete_save(self):
         """删除选中存档"""
-        selected_items = self.save_tree.selection()
-        if not selected_items:
+        targets = self.selected_targets()
+        if not targets:
             messagebox.showinfo("提示", "请选择要删除的存档")
             return
-        if messagebox.askyesno("确认删除", f"确定要删除选中的 {len(selected_items)} 个存档吗？"):
-            for item in selected_items:
-                file_path = self.save_tree.item(item, 'tags')[0]
-                try:
-                    os.remove(file_path)
-                    group_str = str(self.current_group)
-                    if 'groups' in self.save_data and group_str in self.save_data['groups']:
-                        if file_path in self.save_data['groups'][group_str]:
-                            del self.save_data['groups'][group_str][file_path]
-                    # 删除对应的截图
-                    img_name = f"{group_str}_{os.path.basename(file_path).rsplit('.', 1)[0]}.png"
-                    img_path = os.path.join(self.img_dir, img_name)
-                    if os.path.exists(img_path):
-                        os.remove(img_path)
-                except Exception as e:
-                    print(f"Error deleting {os.path.basename(file_path)}: {e}")
-                    messagebox.showerror("错误", f"删除存档失败：{e}")
-            self.save_config()
+        count = sum(len(paths) for paths in targets.values())
+        if messagebox.askyesno("确认删除", f"确定要删除选中的 {count} 个存档吗？"):
+            self.invalidate_screenshots(targets)
+            result = self.engine.bulk.delete(targets)
+            if result.errors:
+                messagebox.showerror("错误", "删除存档失败：" + "\n".join(result.errors))
             self.update_save_list()
 
-    def indent_save(self):
-        """增加选中存档的缩进"""
-        selected_items = self.save_tree.selection()
-        if not selected_items:
-            messagebox.showinfo("提示", "请选择要增加缩进的存档")
+    @requires_engine
+    def move_save(self):
+        """把选中存档移到其他组"""
+        targets = self.selected_targets()
+        if not targets:
+            messagebox.showinfo("提示", "请选择要移动的存档")
             return
-        for item in selected_items:
-            file_path = self.save_tree.item(item, 'tags')[0]
-            group_str = str(self.current_group)
-            if 'groups' not in self.save_data:
-                self.save_data["groups"] = {}
-            if group_str not in self.save_data["groups"]:
-                self.save_data["groups"][group_str] = {}
-            if file_path not in self.save_data["groups"][group_str]:
-                self.save_data["groups"][group_str][file_path] = {}
-            current_indent = self.save_data["groups"][group_str][file_path].get('indent', 0)
-            self.save_data["groups"][group_str][file_path]['indent'] = min(current_indent + 1, 5) # 最大缩进5级
-        self.save_config()
-        self.update_save_list()
-
-    def unindent_save(self):
-        """减少选中存档的缩进"""
-        selected_items = self.save_tree.selection()
-        if not selected_items:
-            messagebox.showinfo("提示", "请选择要减少缩进的存档")
+        count = sum(len(paths) for paths in targets.values())
+        target_group = simpledialog.askinteger("移动存档", f"将选中的 {count} 个存档移到第几组:", minvalue=1)
+        if target_group is None or set(targets) == {target_group}:
             return
-        for item in selected_items:
-            file_path = self.save_tree.item(item, 'tags')[0]
-            group_str = str(self.current_group)
-            if 'groups' not in self.save_data:
-                self.save_data["groups"] = {}
-            if group_str not in self.save_data["groups"]:
-                self.save_data["groups"][group_str] = {}
-            if file_path not in self.save_data["groups"][group_str]:
-                self.save_data["groups"][group_str][file_path] = {}
-            current_indent = self.save_data["groups"][group_str][file_path].get('indent', 0)
-            self.save_data["groups"][group_str][file_path]['indent'] = max(current_indent - 1, 0) # 最小缩进0级
-        self.save_config()
+        self.invalidate_screenshots(targets)
+        result = self.engine.bulk.move(targets, target_group)
+        if result.errors:
+            messagebox.showerror("错误", "部分存档没有移动：\n" + "\n".join(result.errors[:30]))
         self.update_save_list()
 
+    def invalidate_screenshots(self, targets):
+        """存档被删除或移走前丢弃其截图的已解码缓存"""
+        extensions = screenshot_extensions(self.engine.capture_encoder.format)
+        for group_index, file_paths in targets.items():
+            for file_path in file_paths:
+                base_path = os.path.splitext(self.engine.get_save_image_path(file_path, str(group_index)))[0]
+                for ext in extensions:
+                    self.thumbnail_cache.invalidate(base_path + ext)
+
     def on_close(self):
-        """程序关闭时的操作"""
-        self.save_selected_items()
-        self.stop_auto_refresh()
+        """程序关闭时的操作; 引擎创建之前关闭时保留原来的快照"""
+        if self.engine is not None:
+            self.save_selected_items()
+            self.write_startup_snapshot()
+        self.image_pool.shutdown()
+        if self.engine is not None:
+            self.engine.close()
         self.root.destroy()
 
+    @requires_engine
+    def toggle_debug_panel(self, event=None):
+        """打开或关闭性能统计面板"""
+        if self.debug_panel is not None:
+            self.debug_panel.destroy()
+            self.debug_panel = None
+            return
+        panel = tk.Toplevel(self.root)
+        panel.title("性能统计")
+        panel.protocol("WM_DELETE_WINDOW", self.toggle_debug_panel)
+        toolbar = ttk.Frame(panel)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        enabled = tk.BooleanVar(value=self.metrics.enabled)
+        ttk.Checkbutton(toolbar, text="启用统计", variable=enabled,
+                        command=lambda: self.set_instrumentation(enabled.get())).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="重置", command=lambda: self.metrics.reset()).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="导出 JSON", command=self.export_metrics).pack(side=tk.LEFT, padx=5)
+        text = tk.Text(panel, width=96, height=24, font=("Consolas", 10))
+        text.pack(fill=tk.BOTH, expand=True)
+        self.debug_panel = panel
+        self.refresh_debug_panel(text)
+
+    def refresh_debug_panel(self, text):
+        """每秒刷新一次统计面板"""
+        if self.debug_panel is None:
+            return
+        lines = [self.metrics.format_table() if self.metrics.enabled else "统计未启用", ""]
+        for lane, stats in self.engine.task_scheduler.stats().items():
+            lines.append(f"通道 {lane}: 排队 {stats['queued']}, 运行 {stats['running']}, "
+                         f"平均等待 {stats['avg_wait'] * 1000:.1f}ms")
+        config_stats = self.engine.config_writer.stats()
+        lines.append(f"配置文件: 请求 {config_stats['logical_writes']} 次, 写入 {config_stats['physical_writes']} 次, "
+                     f"{config_stats['bytes_written'] // 1024} KB")
+        text.delete("1.0", tk.END)
+        text.insert(tk.END, "\n".join(lines))
+        self.root.after(1000, self.refresh_debug_panel, text)
+
+    def set_instrumentation(self, enabled):
+        """开启或关闭热点操作统计, 并记住设置"""
+        from save_engine import INSTRUMENTED_METHODS as ENGINE_INSTRUMENTED_METHODS
+        self.metrics.set_enabled(enabled, (self.engine, ENGINE_INSTRUMENTED_METHODS), (self, INSTRUMENTED_METHODS))
+        self.engine.store.set_setting("instrumentation", enabled)
+        self.engine.save_config()
+
+    def export_metrics(self):
+        """把统计和各组件的状态导出为 JSON"""
+        path = filedialog.asksaveasfilename(title="导出性能统计", defaultextension=".json",
+                                            initialfile="save_manager_metrics.json", filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.metrics.dump_json(path, {"scheduler": self.engine.task_scheduler.stats(),
+                                          "config_writer": self.engine.config_writer.stats(),
+                                          "capture_encoder": self.engine.capture_encoder.stats()})
+        except OSError as e:
+            messagebox.showerror("错误", f"导出性能统计失败：{e}")
+
+    @requires_engine
     def on_tree_click(self, event):
         """保持 Treeview 的选中状态并更新配置文件"""
         item = self.save_tree.identify_row(event.y)
@@ -575,15 +548,25 @@ class SaveManagerApp:
             else:
                 self.save_tree.selection_set(item)
             self.save_selected_items()
-            selected_items = self.save_tree.selection()
+            selected_items = self.save_list.selected_paths()
             if selected_items:
-                self.selected_item_path = self.save_tree.item(selected_items[0], 'tags')[0]
+                self.selected_item_path = selected_items[0]
             else:
                 self.selected_item_path = None
             self.show_selected_image()
 
+    @requires_engine
+    def on_tree_key_select(self, event):
+        """方向键切换选中项时更新截图"""
+        item = self.save_tree.focus()
+        if item:
+            self.save_selected_items()
+            self.selected_item_path = item
+            self.show_selected_image()
+
+    @requires_engine
     def on_tree_double_click(self, event):
-        """双击 Treeview 项目时编辑备注"""
+        """双击 Treeview 项目时编辑备注, 双击搜索结果中其他组的存档时切换到该组"""
         item_id = self.save_tree.identify_row(event.y)
         column_id = self.save_tree.identify_column(event.x) # 获取点击的列
         if item_id and column_id == "#2":  # 备注列
@@ -591,180 +574,84 @@ class SaveManagerApp:
         else: # 双击其他列时取消编辑状态
             if self.edit_entry:
                 self.finish_edit()
+            group_index, file_path = self.split_iid(item_id) if item_id else (self.current_group, None)
+            if group_index != self.current_group:
+                self.engine.store.set_selection(group_index, [file_path]) # 切换后选中该存档
+                self.change_group(group_index)
 
-    def get_group_display_name(self, group_index):
-        """获取组的显示名称"""
-        group_name = self.save_data.get("group_names", {}).get(str(group_index), "")
-        return f"第{group_index}页, {group_name}"
-
+    @requires_engine
     def rename_group(self):
         """修改当前组的名称"""
-        group_name = self.save_data.get("group_names", {}).get(str(self.current_group), "")
+        group_name = self.engine.store.get_group_name(self.current_group)
         new_name = simpledialog.askstring("修改组名", f"修改第{self.current_group}组的名称:", initialvalue=group_name)
         if new_name is not None:
-            if "group_names" not in self.save_data:
-                self.save_data["group_names"] = {}
-            self.save_data["group_names"][str(self.current_group)] = new_name
-            self.save_config()
-            self.group_label.config(text=self.get_group_display_name(self.current_group))
+            self.engine.rename_group(self.current_group, new_name)
+            self.group_label.config(text=self.engine.get_group_display_name(self.current_group))
 
+    @requires_engine
     def save_selected_items(self):
-        """保存当前选中的文件到配置文件"""
-        selected_items = self.save_tree.selection()
-        selected_paths = [self.save_tree.item(item, 'tags')[0] for item in selected_items]
-        self.save_data.setdefault('selected_files', {})[str(self.current_group)] = selected_paths
-        self.save_config()
-
-    def restore_selected_items(self):
-        """从配置文件恢复选中的文件"""
-        if str(self.current_group) in self.save_data.get('selected_files', {}):
-            selected_paths = self.save_data['selected_files'][str(self.current_group)]
-            for item in self.save_tree.get_children():
-                item_path = self.save_tree.item(item, 'tags')[0]
-                if item_path in selected_paths:
-                    self.save_tree.selection_add(item)
-
-    def capture_save_image(self, file_path, file_info):
-        """捕获指定存档的窗口截图"""
-        if not self.current_game_title:
-            return
-        title = self.current_game_title
-        group_str = str(self.get_current_group())
-        img_name = f"{group_str}_{file_info['original_name'].rsplit('.', 1)[0]}.png"
-        img_path = os.path.join(self.img_dir, img_name)
-        try:
-            # 检查是否已经存在截图，如果存在则跳过
-            if not os.path.exists(img_path):
-                # 检查任务队列中是否已经有相同的截图任务
-                task_exists = False
-                for item in self.task_queue.queue:
-                    if isinstance(item, tuple) and len(item) == 3 and item[1] == img_path:
-                        task_exists = True
-                        break
-                if not task_exists:
-                    # 添加 4000 毫秒延迟
-                    self.task_queue.put((title, img_path, time.time() + 2)) # 将截图任务添加到队列,并添加延迟时间
-                    self.process_task_queue() # 尝试处理任务
-                    # 立即将 is_new 设置为 False，避免重复触发
-                    if 'groups' in self.save_data and group_str in self.save_data['groups'] and file_path in self.save_data['groups'][group_str]:
-                        self.save_data['groups'][group_str][file_path]['is_new'] = False
-                    # 添加选中逻辑
-                    self.root.after(100, lambda: self.select_tree_item(file_path)) # 截图后选中对应的项
-        except Exception as e:
-            print(f"Error capturing image for {file_path}: {e}")
+        """保存当前选中的文件到配置文件, 搜索结果中其他组的存档不保存"""
+        self.engine.set_selection(self.selected_targets().get(self.current_group, []))
+
+    def restore_selected_items(self, items=None):
+        """从配置文件恢复选中的文件, items 为空时检查所有行"""
+        selected_paths = set(self.engine.get_selection())
+        if selected_paths:
+            if items is None:
+                items = self.save_list.index_of
+            to_select = [item for item in items if item in selected_paths] # iid 即存档路径
+            if to_select:
+                self.save_list.select(to_select, add=True)
 
     def select_tree_item(self, file_path):
         """选中 Treeview 中的指定项"""
-        for item in self.save_tree.get_children():
-            item_path = self.save_tree.item(item, 'tags')[0]
-            if item_path == file_path:
-                self.save_tree.selection_set(item)
-                self.save_selected_items() # 更新选中的json
-                self.selected_item_path = file_path # 更新选中的路径
-                self.show_selected_image() # 显示截图
-                break
-
-    def capture_window_image(self, window_title, save_path):
-        """捕获指定窗口的截图并保存，使用 BitBlt API 和 DwmGetWindowAttribute"""
-        import platform
-        if platform.system() != "Windows":
-            print("截图功能仅支持 Windows 操作系统。")
-            return
+        if file_path in self.save_list.index_of:
+            self.save_list.select([file_path])
+            self.save_list.see(file_path)
+            self.save_selected_items() # 更新选中的json
+            self.selected_item_path = file_path # 更新选中的路径
+            self.show_selected_image() # 显示截图
+
+    def on_capture_saved(self, save_path):
+        """截图写入完成后刷新缓存, 仍是选中存档的截图时重新显示"""
+        base_path = os.path.splitext(save_path)[0]
+        for ext in screenshot_extensions(self.engine.capture_encoder.format):
+            self.thumbnail_cache.invalidate(base_path + ext) # 同时丢弃被替换的其他格式
+        if self.selected_item_path and self.image_path_of(self.selected_item_path) == save_path:
+            self.show_selected_image()
 
-        import win32gui
-        import win32con
-        import ctypes
-        from PIL import Image
-
-        # 添加 Windows API 常量
-        DIB_RGB_COLORS = 0
-        SRCCOPY = 0x00CC0020
-        DWMWA_EXTENDED_FRAME_BOUNDS = 9
-
-        # 使用 ctypes 定义 RECT 结构体
-        class RECT(ctypes.Structure):
-            _fields_ = [
-                ("left", ctypes.c_long),
-                ("top", ctypes.c_long),
-                ("right", ctypes.c_long),
-                ("bottom", ctypes.c_long),
-            ]
-
-        # 使用 ctypes 定义 BITMAPINFOHEADER 结构体
-        class BITMAPINFOHEADER(ctypes.Structure):
-            _fields_ = [
-                ("biSize", ctypes.c_uint),
-                ("biWidth", ctypes.c_long),
-                ("biHeight", ctypes.c_long),
-                ("biPlanes", ctypes.c_short),
-                ("biBitCount", ctypes.c_short),
-                ("biCompression", ctypes.c_uint),
-                ("biSizeImage", ctypes.c_uint),
-                ("biXPelsPerMeter", ctypes.c_long),
-                ("biYPelsPerMeter", ctypes.c_long),
-                ("biClrUsed", ctypes.c_uint),
-                ("biClrImportant", ctypes.c_uint)
-            ]
-
-        hwnd = win32gui.FindWindow(None, window_title)
-        if hwnd:
-            try:
-                # 获取窗口的实际大小
-                rect = RECT()
-                size = ctypes.sizeof(rect)
-                ctypes.windll.dwmapi.DwmGetWindowAttribute(
-                    hwnd, DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(rect), size
-                )
-                left = rect.left
-                top = rect.top
-                right = rect.right
-                bottom = rect.bottom
-                width = right - left
-                height = bottom - top
-
-                # 创建一个与窗口大小匹配的设备上下文
-                hwnd_dc = win32gui.GetWindowDC(hwnd)
-                dc = ctypes.windll.gdi32.CreateCompatibleDC(hwnd_dc)
-                bitmap = ctypes.windll.gdi32.CreateCompatibleBitmap(hwnd_dc, width, height)
-                ctypes.windll.gdi32.SelectObject(dc, bitmap)
-
-                # 使用 BitBlt API 捕获窗口内容
-                print("使用 BitBlt API 捕获窗口内容")
-                ctypes.windll.gdi32.BitBlt(dc, 0, 0, width, height, hwnd_dc, 0, 0, SRCCOPY)
-
-                # 将设备上下文中的内容复制到 PIL Image
-                bitmap_header = BITMAPINFOHEADER()
-                bitmap_header.biSize = ctypes.sizeof(bitmap_header)
-                bitmap_header.biWidth = width
-                bitmap_header.biHeight = -height  # 负数表示顶端为起始
-                bitmap_header.biPlanes = 1
-                bitmap_header.biBitCount = 32
-                bitmap_header.biCompression = 0  # BI_RGB
-
-                buffer = ctypes.create_string_buffer(width * height * 4)
-                ctypes.windll.gdi32.GetDIBits(dc, bitmap, 0, height, buffer, ctypes.byref(bitmap_header), DIB_RGB_COLORS)
-                image = Image.frombuffer("RGBA", (width, height), buffer.raw, "raw", "BGRA", 0, 1)
-
-                # 清理资源
-                ctypes.windll.gdi32.DeleteObject(bitmap)
-                ctypes.windll.gdi32.DeleteDC(dc)
-                win32gui.ReleaseDC(hwnd, hwnd_dc)
-
-                # 保存截图
-                image.save(save_path)
-                print(f"成功捕获窗口 '{window_title}' 的截图并保存到 '{save_path}'")
-            except Exception as e:
-                print(f"捕获窗口截图失败: {e}")
+    @requires_engine
+    def find_similar_saves(self):
+        """在所有组中查找与选中存档截图相似的存档"""
+        if not self.selected_item_path:
+            messagebox.showinfo("提示", "请选择存档")
+            return
+        group_index, file_path = self.split_iid(self.selected_item_path)
+        matches = self.engine.find_similar(file_path, group_index)
+        if matches is None:
+            messagebox.showinfo("提示", "选中的存档还没有截图")
+            return
+        if not matches:
+            messagebox.showinfo("相似截图", "没有找到相似的截图")
+            return
+        lines = [f"{group_name}  {save_name}  (差异 {distance})" for distance, group_name, save_name in matches[:30]]
+        if len(matches) > 30:
+            lines.append(f"... 共 {len(matches)} 个")
+        messagebox.showinfo("相似截图", "\n".join(lines))
 
     def show_selected_image(self):
         """显示选中存档的截图"""
+        if self.engine is None:
+            return # 引擎创建之前显示快照中的截图
         if not self.selected_item_path:
             self.show_default_image()
             return
-        group_str = str(self.current_group)
-        img_name = f"{group_str}_{os.path.basename(self.selected_item_path).rsplit('.', 1)[0]}.png"
-        img_path = os.path.join(self.img_dir, img_name)
-        if os.path.exists(img_path):
+        img_path = self.image_path_of(self.selected_item_path)
+        try:
+            img_mtime = os.stat(img_path).st_mtime_ns
+        except OSError:
+            img_mtime = None
+        if img_mtime is not None:
             try:
                 if not self.image_frame.winfo_ismapped():
                     self.image_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -772,31 +659,82 @@ class SaveManagerApp:
                 frame_width = self.image_frame.winfo_width()
                 if frame_width <= 1:
                     return # 如果宽度为0则不进行缩放
-                # 获取原始图像尺寸
-                image = Image.open(img_path)
-                original_width, original_height = image.size
-                aspect_ratio = original_width / original_height
-                new_width = frame_width
-                new_height = int(new_width / aspect_ratio)
-                
-                # 检查计算出的高度是否超过 image_frame 的高度，如果超过则以高度为基准
                 frame_height = self.image_frame.winfo_height()
-                if new_height > frame_height and frame_height > 1:
-                    new_height = frame_height
-                    new_width = int(new_height * aspect_ratio)
-
-                image = image.resize((new_width, new_height), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(image)
-                self.image_label.config(image=photo)
-                self.image_label.image = photo
+                image_key = (img_path, img_mtime, (frame_width, frame_height))
+                if image_key == self.shown_image_key:
+                    return # 选中的存档和截图都没有变化, 无需重新加载
+                photo = self.thumbnail_cache.get(image_key)
+                if photo is None:
+                    # 在后台线程解码, 完成后由 on_image_decoded 显示
+                    self.pending_image_key = image_key
+                    self.image_requested_at = time.perf_counter()
+                    self.image_pool.request(image_key, img_path, (frame_width, frame_height), self.on_image_decoded)
+                else:
+                    self.pending_image_key = None
+                    self.image_pool.start_generation() # 作废之前的解码和预取请求
+                    self.display_photo(image_key, photo)
+                self.prefetch_neighbour_images((frame_width, frame_height))
             except Exception as e:
                 print(f"Error loading image {img_path}: {e}")
                 self.show_no_image_text() # 显示无截图文本
         else:
             self.show_no_image_text() # 显示无截图文本
 
+    def display_photo(self, image_key, photo):
+        """在截图区域显示已解码的截图"""
+        self.image_label.config(image=photo)
+        self.image_label.image = photo
+        self.shown_image_key = image_key
+
+    def on_image_decoded(self, image_key, image, generation):
+        """后台解码完成后在主线程中缓存, 仍是当前选中项时显示"""
+        is_pending = image_key == self.pending_image_key and self.image_pool.is_current(generation)
+        if image is None:
+            if is_pending:
+                self.pending_image_key = None
+                self.show_no_image_text() # 显示无截图文本
+            return
+        photo = self.thumbnail_cache.get(image_key)
+        if photo is None:
+            from PIL import ImageTk  # 第一次显示截图时才导入
+            photo = ImageTk.PhotoImage(image)
+            self.thumbnail_cache.put(image_key, photo, image.width * image.height * 4)
+        if is_pending:
+            self.pending_image_key = None
+            self.metrics.record("show_selected_image.decode", time.perf_counter() - self.image_requested_at)
+            self.display_photo(image_key, photo)
+
+    def prefetch_neighbour_images(self, target_size):
+        """预取选中存档上下相邻存档的截图"""
+        index = self.save_list.index_of.get(self.selected_item_path)
+        if index is None:
+            return
+        items = []
+        for neighbour in (index + 1, index - 1):
+            if 0 <= neighbour < len(self.save_list.rows):
+                img_path = self.image_path_of(self.save_list.rows[neighbour][0])
+                try:
+                    img_mtime = os.stat(img_path).st_mtime_ns
+                except OSError:
+                    continue # 没有截图
+                image_key = (img_path, img_mtime, target_size)
+                if self.thumbnail_cache.get(image_key) is None:
+                    items.append((image_key, img_path, target_size))
+        if items:
+            self.image_pool.prefetch(items, self.on_image_decoded)
+
+    def on_image_frame_resized(self, event):
+        """截图区域尺寸变化后丢弃其他尺寸的缓存并重新显示"""
+        target_size = (event.width, event.height)
+        if target_size != self.image_frame_size:
+            self.image_frame_size = target_size
+            self.thumbnail_cache.retain_size(target_size)
+            self.show_selected_image()
+
     def show_default_image(self):
         """显示默认的灰色矩形"""
+        self.shown_image_key = None
+        self.pending_image_key = None
         self.image_frame.pack_forget()
         self.image_label.config(image='', text="无截图", font=("Arial", 20), anchor="center")
         # 获取 image_frame 的请求尺寸
@@ -808,6 +746,8 @@ class SaveManagerApp:
 
     def show_no_image_text(self):
         """显示无截图文本"""
+        self.shown_image_key = None
+        self.pending_image_key = None
         self.image_label.config(image='', text="无截图", font=("Arial", 20), anchor="center")
         # 获取 image_frame 的请求尺寸
         width = self.image_frame.winfo_reqwidth()
@@ -818,25 +758,24 @@ class SaveManagerApp:
 
     def update_title_label(self):
         """更新标题标签"""
-        if self.current_game_title:
-            self.title_label.config(text=f"当前窗口: {self.current_game_title}")
+        if self.engine.current_game_title:
+            self.title_label.config(text=f"当前窗口: {self.engine.current_game_title}")
         else:
             self.title_label.config(text="未捕获窗口")
 
     def init_show_selected_image(self):
         """初始化时加载截图"""
-        if self.save_tree.selection():
-            item = self.save_tree.selection()[0]
-            self.selected_item_path = self.save_tree.item(item, 'tags')[0]
+        selected_paths = self.save_list.selected_paths()
+        if selected_paths:
+            self.selected_item_path = selected_paths[0]
         self.show_selected_image()
 
+    @requires_engine
     def open_image(self, event):
         """双击打开图片"""
         if not self.selected_item_path:
             return
-        group_str = str(self.current_group)
-        img_name = f"{group_str}_{os.path.basename(self.selected_item_path).rsplit('.', 1)[0]}.png"
-        img_path = os.path.join(self.img_dir, img_name)
+        img_path = self.image_path_of(self.selected_item_path)
         if os.path.exists(img_path):
             try:
                 os.startfile(img_path)  # 使用系统默认程序打开图片
@@ -844,6 +783,7 @@ class SaveManagerApp:
                 print(f"Error opening image {img_path}: {e}")
                 messagebox.showerror("错误", f"打开图片失败：{e}")
 
+    @requires_engine
     def open_save_dir(self):
         """打开存档目录"""
         if self.save_dir:
@@ -854,93 +794,31 @@ class SaveManagerApp:
         else:
             messagebox.showerror("错误", "未选择存档目录")
 
-    def find_game_list_file(self):
-        """查找 game_list.json 文件"""
-        file_path = r"D:\Tools\Save_manager\game_list.json"
-        print(f"尝试查找 game_list.json 路径: {file_path}")
-        if os.path.exists(file_path):
-            print(f"找到 game_list.json 文件: {file_path}")
-            return file_path
-        else:
-            return None
-
-    def load_game_list(self):
-        """加载游戏列表"""
-        if self.game_list_file and os.path.exists(self.game_list_file):
-            with open(self.game_list_file, "r", encoding="utf-8") as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    return []
-        else:
-            return []
-
-    def get_current_game_title(self):
-        """获取当前游戏的标题"""
-        if self.game_list:
-            for game in self.game_list:
-                if os.path.abspath(self.save_dir) == os.path.abspath(game.get("save_path", "")):
-                    return game.get("title", "")
-        return ""
-
+    @requires_engine
     def open_game_dir(self):
         """打开游戏目录"""
-        if self.current_game_title:
+        if self.engine.current_game_title:
             try:
                 # 从 game_list.json 中找到对应的游戏目录
-                game_list_file = self.find_game_list_file()
-                if game_list_file and os.path.exists(game_list_file):
-                    with open(game_list_file, "r", encoding="utf-8") as f:
-                        game_list = json.load(f)
-                        for game in game_list:
-                            if game.get("title", "") == self.current_game_title:
-                                process_path = game.get("process_path", "")
-                                if process_path:
-                                    game_dir = os.path.dirname(process_path)
-                                    os.startfile(game_dir)
-                                    return
+                game_dir = self.engine.get_game_dir()
+                if game_dir:
+                    os.startfile(game_dir)
+                    return
                 messagebox.showerror("错误", "未找到游戏目录")
             except Exception as e:
                 messagebox.showerror("错误", f"打开游戏目录失败: {e}")
         else:
             messagebox.showerror("错误", "未捕获窗口")
 
-    def execute_capture_image(self, title, img_path):
-        """执行截图任务"""
-        try:
-            self.capture_window_image(title, img_path)
-        finally:
-            self.is_processing_task = False
-            self.process_task_queue() # 再次尝试处理任务
-
+    @requires_engine
     def set_max_saves(self):
         """设置最大存档数"""
-        max_saves = simpledialog.askinteger("设置存档上限", "请输入每个组的最大存档数:", initialvalue=self.max_saves_per_group)
+        max_saves = simpledialog.askinteger("设置存档上限", "请输入每个组的最大存档数:", initialvalue=self.engine.max_saves_per_group)
         if max_saves is not None:
-            self.max_saves_per_group = max_saves
-            self.save_config()
-
-    def check_and_auto_switch_group(self):
-        """检查是否需要自动切换到下一组"""
-        last_group = self.get_last_group_with_saves()
-        if self.current_group == last_group:
-            files = self.get_save_files_in_dir(self.save_dir)
-            if files and len(files) >= self.max_saves_per_group:
-                self.change_group(self.current_group + 1)
-
-    def get_last_group_with_saves(self):
-        """获取最后有存档的组"""
-        max_group = 1
-        for group_index in range(1, 1000):  # 假设最大组数为1000
-            group_dir = os.path.join(self.save_dir, f"save{group_index}")
-            if os.path.exists(group_dir) and os.listdir(group_dir):
-                max_group = group_index
-            elif group_index == self.current_group and self.get_save_files_in_dir(self.save_dir):
-                max_group = group_index
-        return max_group
+            self.engine.set_max_saves(max_saves)
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = SaveManagerApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_close)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -0,0 +1,305 @@
+import os
+import re
+import threading
+import unicodedata
+
+from save_index import scan_save_files, SAVE_FILE_PATTERN
+
+# 查询中的过滤条件, 例如 "is:important g:3 date:2025-01 boss"
+FILTER_PATTERN = re.compile(r'^(is|g|group|date|after|before|indent):(.+)$')
+FLAG_ALIASES = {
+    "important": "important", "关键": "important", "★": "important",
+    "ignore": "ignore", "ignored": "ignore", "忽略": "ignore",
+}
+
+
+def normalize(text):
+    """全角转半角并忽略大小写, 日文和中文按原样保留"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def grams(text):
+    """文本的单字和相邻两字, 中日文没有空格分词, 按字符 n-gram 索引"""
+    result = set(text)
+    result.update(text[i:i + 2] for i in range(len(text) - 1))
+    result.discard("\n")
+    return result
+
+
+def term_grams(term):
+    """查询词需要同时命中的 n-gram, 两字以上只用两字组合"""
+    if len(term) == 1:
+        return [term]
+    return [term[i:i + 2] for i in range(len(term) - 1)]
+
+
+class _Doc:
+    """索引中的一个存档"""
+
+    __slots__ = ("group", "path", "name", "num", "note", "date", "important", "ignore", "indent", "text", "grams")
+
+    def __init__(self, group, path, name, num, note, date, important, ignore, indent):
+        self.group = group
+        self.path = path
+        self.name = name
+        self.num = num
+        self.note = note
+        self.date = date
+        self.important = important
+        self.ignore = ignore
+        self.indent = indent
+        self.text = normalize(f"{name}\n{note}\n{date}")
+        self.grams = grams(self.text)
+
+    def key(self):
+        return (self.name, self.note, self.date, self.important, self.ignore, self.indent)
+
+    def entry(self):
+        """与引擎的存档列表相同格式的字典, 另带组序号"""
+        return {'group': self.group, 'path': self.path, 'original_name': self.name, 'num': self.num,
+                'note': self.note, 'date': self.date, 'important': self.important, 'ignore': self.ignore,
+                'indent': self.indent}
+
+
+def save_number(name):
+    match = SAVE_FILE_PATTERN.match(name)
+    return int(match.group("num")) if match else 0
+
+
+class SearchIndex:
+    """所有组存档的内存倒排索引: 备注、文件名、日期按字符 n-gram 索引, 组名单独索引
+
+    查询只读内存, 不访问磁盘和数据库; 元数据的修改由 MetadataStore 的通知增量更新,
+    根目录的文件变化由引擎刷新时调用 update_group 更新.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.docs = {}  # (组序号, 路径) -> _Doc
+        self.postings = {}  # n-gram -> {(组序号, 路径), ...}
+        self.group_docs = {}  # 组序号 -> {(组序号, 路径), ...}
+        self.group_names = {}  # 组序号 -> 规范化的组名
+        self.ready = False
+        self.generation = 0  # 索引每次变化加一, 用于判断上次的查询结果是否还能复用
+        self._last = None  # (generation, 文本词, 过滤条件, 结果键列表)
+        self._lock = threading.RLock()
+        store.add_observer(self.on_store_changed)
+
+    # ---- 建立和维护 ----
+
+    def build(self, save_dir, current_group, packed_groups=()):
+        """扫描所有组文件夹并读取全部元数据建立索引, 在后台线程中调用"""
+        files = {current_group: scan_save_files(save_dir)}
+        with os.scandir(save_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith("save") and entry.name[4:].isdigit() and entry.is_dir():
+                    group_index = int(entry.name[4:])
+                    if group_index != current_group:
+                        files[group_index] = [dict(file_info, path=os.path.join(save_dir, file_info['original_name']))
+                                              for file_info in scan_save_files(entry.path)]
+        metadata = self.store.get_all_saves()
+        group_names = self.store.get_group_names()
+        with self._lock:
+            self.docs = {}
+            self.postings = {}
+            self.group_docs = {}
+            for group_index, group_files in files.items():
+                group_saves = metadata.get(str(group_index), {})
+                for file_info in group_files:
+                    self._put(group_index, file_info['path'], group_saves.get(file_info['path'], {}), file_info)
+            for group_index in packed_groups:
+                # 分块或归档的组不在磁盘上, 只按元数据索引
+                for path, info in metadata.get(str(group_index), {}).items():
+                    self._put(group_index, path, info)
+            self.group_names = {int(group_key): normalize(name) for group_key, name in group_names.items()
+                                if group_key.isdigit() and name}
+            self.ready = True
+            self.generation += 1
+
+    def _put(self, group_index, path, info, file_info=None):
+        """加入或更新一个存档, file_info 为空时保留已有的文件名和日期"""
+        key = (group_index, path)
+        old = self.docs.get(key)
+        if file_info is not None:
+            name, num, date = file_info['original_name'], file_info['num'], file_info['date']
+        elif old is not None:
+            name, num, date = old.name, old.num, old.date
+        else:
+            name = os.path.basename(path)
+            num, date = save_number(name), ""
+        doc = _Doc(group_index, path, name, num, info.get('note', ''), date, info.get('important', False),
+                   info.get('ignore', False), info.get('indent', 0))
+        if old is not None:
+            if old.key() == doc.key():
+                return False
+            self._remove(key)
+        self.docs[key] = doc
+        for gram in doc.grams:
+            self.postings.setdefault(gram, set()).add(key)
+        self.group_docs.setdefault(group_index, set()).add(key)
+        return True
+
+    def _remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return False
+        for gram in doc.grams:
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+        self.group_docs.get(doc.group, set()).discard(key)
+        return True
+
+    def update_group(self, group_index, files, group_saves):
+        """根目录扫描后同步当前组: 新增、删除和变化的存档; 没有变化的存档不重新索引"""
+        if not self.ready:
+            return
+        with self._lock:
+            changed = False
+            seen = set()
+            for file_info in files:
+                seen.add((group_index, file_info['path']))
+                changed |= self._put(group_index, file_info['path'], group_saves.get(file_info['path'], {}), file_info)
+            for key in self.group_docs.get(group_index, set()) - seen:
+                changed |= self._remove(key)
+            if changed:
+                self.generation += 1
+
+    def _replace(self, key, **changes):
+        """修改已索引存档的部分字段, 未索引的存档 (文件已不存在) 忽略"""
+        old = self.docs.get(key)
+        if old is None:
+            return
+        info = {'note': old.note, 'important': old.important, 'ignore': old.ignore, 'indent': old.indent}
+        info.update(changes)
+        self._put(key[0], key[1], info)
+
+    def on_store_changed(self, kind, group_key, data):
+        """MetadataStore 的修改通知, 直接使用通知中的值, 不再读取数据库"""
+        if not self.ready:
+            return
+        with self._lock:
+            if kind == "reset":
+                self.ready = False  # 配置被整体导入, 等待重新建立
+                return
+            if kind == "group_name":
+                self.group_names[int(group_key)] = normalize(data or "")
+            elif kind == "fields":
+                field, values = data
+                if field not in ("note", "important", "ignore", "indent"):
+                    return
+                group_index = int(group_key)
+                for path, value in values.items():
+                    self._replace((group_index, path), **{field: value})
+            elif kind == "delete":
+                for path in data:
+                    self._remove((int(group_key), path))
+            elif kind == "move":
+                target_key, paths = data
+                target = int(target_key)
+                for path in paths:
+                    old = self.docs.get((int(group_key), path))
+                    self._remove((target, path))
+                    if old is not None:
+                        self._remove((int(group_key), path))
+                        self._put(target, path, {'note': old.note, 'important': old.important,
+                                                 'ignore': old.ignore, 'indent': old.indent},
+                                  {'original_name': old.name, 'num': old.num, 'date': old.date})
+            self.generation += 1
+
+    # ---- 查询 ----
+
+    def parse(self, query):
+        """拆分为 ([文本词], [(过滤类型, 值)]); 没有 is:ignored 时不显示忽略的存档"""
+        terms = []
+        filters = []
+        for token in normalize(query).split():
+            match = FILTER_PATTERN.match(token)
+            if match:
+                kind, value = match.groups()
+                if kind == "is":
+                    value = FLAG_ALIASES.get(value, value)
+                filters.append(("g" if kind == "group" else kind, value))
+            else:
+                terms.append(token)
+        if ("is", "ignore") not in filters:
+            filters.append(("hide", "ignore"))
+        return terms, filters
+
+    @staticmethod
+    def _narrows(old, new):
+        """新查询的条件包含旧查询的全部条件时, 新结果是旧结果的子集, 例如继续输入关键词"""
+        old_terms, old_filters = old
+        new_terms, new_filters = new
+        return (all(any(term in new_term for new_term in new_terms) for term in old_terms)
+                and set(old_filters) <= set(new_filters))
+
+    def _match_filters(self, doc, filters):
+        for kind, value in filters:
+            if kind == "is":
+                if value not in ("important", "ignore") or not getattr(doc, value):
+                    return False
+            elif kind == "hide":
+                if getattr(doc, value):
+                    return False
+            elif kind == "g":
+                if not value.isdigit() or doc.group != int(value):
+                    return False
+            elif kind == "date":
+                if not doc.date.startswith(value):
+                    return False
+            elif kind == "after":
+                if doc.date < value:
+                    return False
+            elif kind == "before":
+                if doc.date >= value:
+                    return False
+            elif kind == "indent":
+                if not value.isdigit() or doc.indent != int(value):
+                    return False
+        return True
+
+    def _term_keys(self, term):
+        """包含查询词的存档: 文本中包含, 或组名包含"""
+        posting_sets = [self.postings.get(gram) for gram in term_grams(term)]
+        keys = set()
+        if all(posting_sets):
+            posting_sets.sort(key=len)
+            candidates = set.intersection(*posting_sets) if len(posting_sets) > 1 else posting_sets[0]
+            # n-gram 都命中不代表连续出现, 再确认一次
+            keys = {key for key in candidates if term in self.docs[key].text}
+        for group_index, name in self.group_names.items():
+            if term in name:
+                keys |= self.group_docs.get(group_index, set())
+        return keys
+
+    def search(self, query, limit=None):
+        """返回匹配的存档列表, 按组和存档序号排序; 空查询返回空列表"""
+        terms, filters = self.parse(query)
+        if not terms and filters == [("hide", "ignore")]:
+            return []
+        with self._lock:
+            last = self._last
+            if last is not None and last[0] == self.generation and self._narrows(last[1:3], (terms, filters)):
+                # 继续输入时在上次的结果中筛选
+                keys = [key for key in last[3]
+                        if all(term in self.docs[key].text or term in self.group_names.get(key[0], "") for term in terms)
+                        and self._match_filters(self.docs[key], filters)]
+            else:
+                if terms:
+                    term_sets = sorted((self._term_keys(term) for term in terms), key=len)
+                    matched = set.intersection(*term_sets) if len(term_sets) > 1 else term_sets[0]
+                else:
+                    matched = self.docs.keys()
+                keys = sorted((key for key in matched if self._match_filters(self.docs[key], filters)),
+                              key=lambda key: (key[0], self.docs[key].num, self.docs[key].name))
+            self._last = (self.generation, terms, filters, keys)
+            result = keys if limit is None else keys[:limit]
+            return [self.docs[key].entry() for key in result]
+
+    def stats(self):
+        with self._lock:
+            return {"ready": self.ready, "saves": len(self.docs), "grams": len(self.postings),
+                    "groups": len(self.group_docs)}
@@ -0,0 +1,393 @@
+import os
+import sys
+import time
+import threading
+import collections
+
+# 事件类型
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+RENAMED = "renamed"
+RESCAN = "rescan"  # 事件缓冲区溢出等情况, 需要整体重新扫描
+
+# kind: 事件类型, path: 文件路径, dest_path: 重命名后的路径, timestamp: 观察到事件的时间
+WatchEvent = collections.namedtuple("WatchEvent", ["kind", "path", "dest_path", "timestamp"])
+
+
+def make_event(kind, path, dest_path=None):
+    """创建一个带时间戳的目录事件"""
+    return WatchEvent(kind, path, dest_path, time.time())
+
+
+class PollingBackend:
+    """基于快照对比的轮询后端, 目录空闲时自动拉长轮询间隔"""
+
+    name = "polling"
+
+    def __init__(self, directory, min_interval=0.5, max_interval=10.0, backoff=1.5):
+        self.directory = directory
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self._snapshot = None
+        self._wake_event = threading.Event()
+
+    def take_snapshot(self):
+        """记录目录中所有文件的 (inode, 大小, 修改时间)"""
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.name] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"扫描存档目录失败: {e}")
+        return snapshot
+
+    def diff_snapshot(self, old, new):
+        """对比两次快照, 生成目录事件"""
+        events = []
+        created = [name for name in new if name not in old]
+        deleted = [name for name in old if name not in new]
+        # 同一 inode 的删除+新增视为重命名
+        deleted_by_key = {old[name]: name for name in deleted if old[name][0]}
+        for name in created:
+            old_name = deleted_by_key.pop(new[name], None)
+            if old_name is not None:
+                deleted.remove(old_name)
+                events.append(make_event(RENAMED, os.path.join(self.directory, old_name),
+                                         os.path.join(self.directory, name)))
+            else:
+                events.append(make_event(CREATED, os.path.join(self.directory, name)))
+        for name in deleted:
+            events.append(make_event(DELETED, os.path.join(self.directory, name)))
+        for name, info in new.items():
+            if name in old and old[name] != info:
+                events.append(make_event(MODIFIED, os.path.join(self.directory, name)))
+        return events
+
+    def wake(self):
+        """立即进行一次轮询并恢复最短间隔"""
+        self.interval = self.min_interval
+        self._wake_event.set()
+
+    def resync(self):
+        """以当前目录状态作为新的基准, 不产生事件"""
+        self._snapshot = self.take_snapshot()
+
+    def run(self, emit, stop_event):
+        """轮询循环, 直到 stop_event 被设置"""
+        if self._snapshot is None:
+            self._snapshot = self.take_snapshot()
+        while not stop_event.is_set():
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if stop_event.is_set():
+                break
+            snapshot = self.take_snapshot()
+            events = self.diff_snapshot(self._snapshot, snapshot)
+            self._snapshot = snapshot
+            if events:
+                self.interval = self.min_interval  # 有变化时恢复最短间隔
+                emit(events)
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def interrupt(self):
+        """唤醒轮询线程以便退出"""
+        self._wake_event.set()
+
+    def close(self):
+        """轮询后端没有需要释放的资源"""
+
+
+class InotifyBackend:
+    """Linux inotify 后端"""
+
+    name = "inotify"
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, directory):
+        import ctypes
+        import ctypes.util
+        self.directory = directory
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        mask = (self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO |
+                self.IN_CREATE | self.IN_DELETE | self.IN_DELETE_SELF | self.IN_MOVE_SELF)
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch 失败: {directory}")
+
+    def parse_events(self, data, pending_moves):
+        """解析 inotify_event 结构体序列"""
+        import struct
+        events = []
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+            raw_name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append(make_event(RESCAN, self.directory))
+                continue
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                events.append(make_event(RESCAN, self.directory))
+                continue
+            if mask & self.IN_ISDIR or not raw_name:
+                continue  # 只关心根目录下的文件
+            path = os.path.join(self.directory, os.fsdecode(raw_name))
+            if mask & self.IN_MOVED_FROM:
+                pending_moves[cookie] = path
+            elif mask & self.IN_MOVED_TO:
+                old_path = pending_moves.pop(cookie, None)
+                if old_path is not None:
+                    events.append(make_event(RENAMED, old_path, path))
+                else:
+                    events.append(make_event(CREATED, path))
+            elif mask & self.IN_CREATE:
+                events.append(make_event(CREATED, path))
+            elif mask & self.IN_DELETE:
+                events.append(make_event(DELETED, path))
+            elif mask & (self.IN_MODIFY | self.IN_CLOSE_WRITE):
+                events.append(make_event(MODIFIED, path))
+        return events
+
+    def read_available(self):
+        """读取当前所有可用的原始事件数据"""
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def resync(self):
+        """inotify 事件与系统调用同步产生, 无需重建基准"""
+
+    def run(self, emit, stop_event):
+        """读取 inotify 事件, 直到 stop_event 被设置"""
+        import select
+        pending_moves = {}
+        while not stop_event.is_set():
+            readable, _, _ = select.select([self._fd], [], [], 0.5)
+            if not readable:
+                # 没有配对的 MOVED_TO 说明文件被移出了目录
+                if pending_moves:
+                    emit([make_event(DELETED, path) for path in pending_moves.values()])
+                    pending_moves.clear()
+                continue
+            events = self.parse_events(self.read_available(), pending_moves)
+            if events:
+                emit(events)
+
+    def interrupt(self):
+        """select 带超时, 线程会自行退出"""
+
+    def close(self):
+        """关闭 inotify 文件描述符"""
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class WindowsBackend:
+    """Windows ReadDirectoryChangesW 后端"""
+
+    name = "ReadDirectoryChangesW"
+
+    FILE_LIST_DIRECTORY = 0x0001
+    FILE_SHARE_ALL = 0x00000001 | 0x00000002 | 0x00000004
+    OPEN_EXISTING = 3
+    FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+    NOTIFY_FILTER = (0x00000001 |  # FILE_NOTIFY_CHANGE_FILE_NAME
+                     0x00000008 |  # FILE_NOTIFY_CHANGE_SIZE
+                     0x00000010 |  # FILE_NOTIFY_CHANGE_LAST_WRITE
+                     0x00000040)   # FILE_NOTIFY_CHANGE_CREATION
+    ACTIONS = {1: CREATED, 2: DELETED, 3: MODIFIED}
+    ACTION_RENAMED_OLD_NAME = 4
+    ACTION_RENAMED_NEW_NAME = 5
+
+    def __init__(self, directory):
+        import ctypes
+        from ctypes import wintypes
+        self.directory = directory
+        self._ctypes = ctypes
+        self._kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._kernel32.CreateFileW.restype = wintypes.HANDLE
+        self._kernel32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                                               wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+        self._kernel32.ReadDirectoryChangesW.argtypes = [wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD,
+                                                         wintypes.BOOL, wintypes.DWORD, ctypes.POINTER(wintypes.DWORD),
+                                                         wintypes.LPVOID, wintypes.LPVOID]
+        self._kernel32.CancelIoEx.argtypes = [wintypes.HANDLE, wintypes.LPVOID]
+        self._kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self._handle = self._kernel32.CreateFileW(directory, self.FILE_LIST_DIRECTORY, self.FILE_SHARE_ALL, None,
+                                                  self.OPEN_EXISTING, self.FILE_FLAG_BACKUP_SEMANTICS, None)
+        if self._handle in (None, wintypes.HANDLE(-1).value):
+            raise ctypes.WinError(ctypes.get_last_error())
+
+    def parse_events(self, data):
+        """解析 FILE_NOTIFY_INFORMATION 结构体序列"""
+        import struct
+        events = []
+        old_path = None
+        offset = 0
+        while True:
+            next_offset, action, name_length = struct.unpack_from("III", data, offset)
+            name = data[offset + 12:offset + 12 + name_length].decode("utf-16-le")
+            path = os.path.join(self.directory, name)
+            if os.sep not in name:  # 只关心根目录下的文件
+                if action == self.ACTION_RENAMED_OLD_NAME:
+                    old_path = path
+                elif action == self.ACTION_RENAMED_NEW_NAME:
+                    if old_path is not None:
+                        events.append(make_event(RENAMED, old_path, path))
+                    else:
+                        events.append(make_event(CREATED, path))
+                    old_path = None
+                elif action in self.ACTIONS:
+                    events.append(make_event(self.ACTIONS[action], path))
+            if not next_offset:
+                break
+            offset += next_offset
+        return events
+
+    def resync(self):
+        """ReadDirectoryChangesW 事件与系统调用同步产生, 无需重建基准"""
+
+    def run(self, emit, stop_event):
+        """阻塞读取目录变化, 直到 stop_event 被设置"""
+        from ctypes import wintypes
+        ctypes = self._ctypes
+        buffer = ctypes.create_string_buffer(64 * 1024)
+        bytes_returned = wintypes.DWORD()
+        while not stop_event.is_set():
+            ok = self._kernel32.ReadDirectoryChangesW(self._handle, buffer, len(buffer), False, self.NOTIFY_FILTER,
+                                                      ctypes.byref(bytes_returned), None, None)
+            if stop_event.is_set():
+                break
+            if not ok:
+                print(f"监视存档目录失败: {ctypes.WinError(ctypes.get_last_error())}")
+                break
+            if bytes_returned.value == 0:
+                emit([make_event(RESCAN, self.directory)])  # 缓冲区溢出
+                continue
+            events = self.parse_events(buffer.raw[:bytes_returned.value])
+            if events:
+                emit(events)
+
+    def interrupt(self):
+        """取消阻塞中的读取"""
+        self._kernel32.CancelIoEx(self._handle, None)
+
+    def close(self):
+        """关闭目录句柄"""
+        self._kernel32.CloseHandle(self._handle)
+
+
+def create_backend(directory):
+    """按平台选择可用的后端, 失败时退回到轮询"""
+    try:
+        if sys.platform.startswith("linux"):
+            return InotifyBackend(directory)
+        if sys.platform == "win32":
+            return WindowsBackend(directory)
+    except (OSError, AttributeError) as e:
+        print(f"无法使用系统目录监视, 改为轮询: {e}")
+    return PollingBackend(directory)
+
+
+class SaveWatcher:
+    """在后台线程中监视存档目录, 将批量事件交给回调处理"""
+
+    def __init__(self, directory, callback, name_filter=None, backend=None):
+        self.directory = directory
+        self.callback = callback  # 在监视线程中调用, 参数为事件列表
+        self.name_filter = name_filter  # 只保留文件名满足条件的事件
+        self.backend = backend
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动监视线程"""
+        if self._thread is not None:
+            return
+        if self.backend is None:
+            self.backend = create_backend(self.directory)
+        print(f"存档目录监视后端: {self.backend.name}")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止监视线程并释放后端资源"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self.backend.interrupt()
+        self._thread.join(timeout=2)
+        self._thread = None
+        self.backend.close()
+        self.backend = None
+
+    def resync(self):
+        """目录被本程序批量修改后, 以当前状态为新的基准"""
+        if self.backend is not None:
+            self.backend.resync()
+
+    def wake(self):
+        """提示后端尽快检查目录 (仅对轮询后端有效)"""
+        if hasattr(self.backend, "wake"):
+            self.backend.wake()
+
+    def _accept(self, event):
+        """判断事件是否需要交给回调"""
+        if event.kind == RESCAN or self.name_filter is None:
+            return True
+        if self.name_filter(os.path.basename(event.path)):
+            return True
+        return event.dest_path is not None and self.name_filter(os.path.basename(event.dest_path))
+
+    def _emit(self, events):
+        """过滤事件并调用回调"""
+        events = [event for event in events if self._accept(event)]
+        if events:
+            try:
+                self.callback(events)
+            except Exception as e:
+                print(f"处理存档目录事件失败: {e}")
+
+    def _run(self):
+        """监视线程主循环"""
+        try:
+            self.backend.run(self._emit, self._stop_event)
+        except Exception as e:
+            print(f"存档目录监视已停止: {e}")
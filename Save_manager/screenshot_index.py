@@ -0,0 +1,238 @@
+import os
+import hashlib
+import threading
+
+from capture_encoder import SCREENSHOT_FORMATS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS screenshot_hashes (
+    path TEXT PRIMARY KEY,
+    dhash INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS screenshot_hashes_sha256 ON screenshot_hashes (sha256);
+"""
+
+SCREENSHOT_EXTENSIONS = tuple(ext for ext, _ in SCREENSHOT_FORMATS.values())
+
+
+def dhash(image, hash_size=8):
+    """差异哈希: 缩小为 (hash_size+1) x hash_size 的灰度图, 比较水平相邻像素, 返回 64 位整数"""
+    from PIL import Image  # 第一次计算哈希时才导入, 不影响启动
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def file_sha256(path):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_screenshot(path, image=None):
+    """计算截图的 (dhash, sha256, 字节数)"""
+    if image is None:
+        from PIL import Image
+        with Image.open(path) as opened:
+            value = dhash(opened)
+    else:
+        value = dhash(image)
+    return value, file_sha256(path), os.path.getsize(path)
+
+
+def hamming(a, b):
+    """两个哈希的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+def _to_signed(value):
+    """SQLite 的 INTEGER 是有符号 64 位"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class BKTree:
+    """按汉明距离组织的 BK 树, 相似查询只访问距离可能满足条件的子树"""
+
+    def __init__(self):
+        self.root = None  # [哈希, {距离: 子节点}, 路径集合]
+        self.size = 0
+
+    def add(self, value, path):
+        """加入一个哈希及其截图路径"""
+        self.size += 1
+        if self.root is None:
+            self.root = [value, {}, {path}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[2].add(path)
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}, {path}]
+                return
+            node = child
+
+    def remove(self, value, path):
+        """删除一个截图路径, 节点本身保留"""
+        node = self.root
+        while node is not None:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                if path in node[2]:
+                    node[2].discard(path)
+                    self.size -= 1
+                return
+            node = node[1].get(distance)
+
+    def search(self, value, max_distance):
+        """返回 [(距离, 路径), ...], 按距离排序"""
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, path) for path in node[2])
+            for child_distance, child in node[1].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        results.sort()
+        return results
+
+
+class ScreenshotIndex:
+    """所有组截图的感知哈希索引, 保存在元数据库中, 启动时载入 BK 树"""
+
+    def __init__(self, store):
+        self.store = store
+        self.tree = BKTree()
+        self.hashes = {}  # 路径 -> dhash
+        self._lock = threading.RLock()
+        with store.transaction() as conn:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            rows = conn.execute("SELECT path, dhash FROM screenshot_hashes").fetchall()
+        for path, value in rows:
+            value = _to_unsigned(value)
+            self.hashes[path] = value
+            self.tree.add(value, path)
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self.hashes
+
+    def add(self, path, value, digest, size, dedupe=False):
+        """加入或更新一张截图; dedupe 时与已有的相同文件合并为硬链接, 返回节省的字节数"""
+        saved = 0
+        with self._lock:
+            self._remove_from_tree(path)
+            if dedupe:
+                saved = self._link_duplicate(path, digest, size)
+            with self.store.transaction() as conn:
+                conn.execute("INSERT INTO screenshot_hashes (path, dhash, sha256, size) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT (path) DO UPDATE SET dhash = excluded.dhash, "
+                             "sha256 = excluded.sha256, size = excluded.size",
+                             (path, _to_signed(value), digest, size))
+            self.hashes[path] = value
+            self.tree.add(value, path)
+        return saved
+
+    def _link_duplicate(self, path, digest, size):
+        """内容完全相同的截图只保留一份数据, 其余路径改为硬链接"""
+        with self.store.transaction() as conn:
+            rows = conn.execute("SELECT path FROM screenshot_hashes WHERE sha256 = ? AND size = ? AND path != ?",
+                                (digest, size, path)).fetchall()
+        for (other,) in rows:
+            try:
+                if os.path.samefile(other, path):
+                    return 0  # 已经是同一份数据
+                tmp_path = path + ".link"
+                os.link(other, tmp_path)
+                os.replace(tmp_path, path)
+                return size
+            except OSError:
+                continue  # 文件已被删除或文件系统不支持硬链接
+        return 0
+
+    def _remove_from_tree(self, path):
+        value = self.hashes.pop(path, None)
+        if value is not None:
+            self.tree.remove(value, path)
+
+    def remove(self, path):
+        """删除截图的索引"""
+        with self._lock:
+            self._remove_from_tree(path)
+            with self.store.transaction() as conn:
+                conn.execute("DELETE FROM screenshot_hashes WHERE path = ?", (path,))
+
+    def remove_many(self, paths):
+        """在一个事务中删除一批截图的索引"""
+        with self._lock:
+            for path in paths:
+                self._remove_from_tree(path)
+            with self.store.transaction() as conn:
+                conn.executemany("DELETE FROM screenshot_hashes WHERE path = ?", [(path,) for path in paths])
+
+    def rename_many(self, renames):
+        """截图随存档移到其他组后更新索引中的路径, renames 为 [(旧路径, 新路径), ...]"""
+        with self._lock:
+            for old, new in renames:
+                value = self.hashes.get(old)
+                if value is not None:
+                    self._remove_from_tree(old)
+                    self._remove_from_tree(new)
+                    self.hashes[new] = value
+                    self.tree.add(value, new)
+            with self.store.transaction() as conn:
+                conn.executemany("DELETE FROM screenshot_hashes WHERE path = ?", [(new,) for _, new in renames])
+                conn.executemany("UPDATE screenshot_hashes SET path = ? WHERE path = ?",
+                                 [(new, old) for old, new in renames])
+
+    def find_similar(self, path, max_distance=6):
+        """查找与指定截图相似的其他截图 [(距离, 路径), ...]"""
+        with self._lock:
+            value = self.hashes.get(path)
+            if value is None:
+                return []
+            return [(distance, other) for distance, other in self.tree.search(value, max_distance)
+                    if other != path]
+
+    def backfill(self, img_dir, dedupe=False):
+        """为还没有索引的已有截图计算哈希, 在后台线程中运行"""
+        try:
+            names = os.listdir(img_dir)
+        except OSError:
+            return 0
+        count = 0
+        for name in names:
+            if not name.endswith(SCREENSHOT_EXTENSIONS):
+                continue
+            path = os.path.join(img_dir, name)
+            if path in self:
+                continue
+            try:
+                self.add(path, *hash_screenshot(path), dedupe=dedupe)
+                count += 1
+            except OSError as e:
+                print(f"计算截图哈希失败 {name}: {e}")
+        return count
@@ -0,0 +1,106 @@
+import time
+import importlib.util
+
+# NumPy 在第一次检测稳定帧时才导入, 启动时只检查是否安装; 没有 NumPy 时退回固定延迟截图
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# 默认参数, 可以用 stable_capture 设置整体覆盖, 或用 stable_capture_games 按游戏标题覆盖
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "fixed_delay": 2.0,  # 不使用稳定帧检测时的截图延迟 (秒)
+    "start_delay": 0.3,  # 存档出现后开始检测的延迟 (秒)
+    "interval": 0.1,  # 两次采样的间隔 (秒)
+    "max_frames": 30,  # 最多采样的帧数
+    "preview_side": 160,  # 采样画面缩小后的最长边
+    "diff_threshold": 1.5,  # 相邻两帧平均亮度差低于该值视为静止 (0-255)
+    "stable_frames": 2,  # 连续多少次静止才算稳定
+    "min_luma": 12.0,  # 平均亮度低于该值视为黑屏 (0-255)
+    "wait_for_change": False,  # 先等画面变化一次 (例如存档菜单关闭) 再找稳定帧
+    "cpu_budget_ms": 300,  # 读取和分析采样帧的总耗时上限
+}
+
+
+def capture_settings(global_settings, game_settings, title):
+    """合并默认参数、整体设置和当前游戏的设置"""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(global_settings or {})
+    settings.update((game_settings or {}).get(title, {}))
+    return settings
+
+
+def preview_luma(frame, preview_side):
+    """把一帧等间隔抽样缩小为亮度矩阵"""
+    import numpy
+    width, height = frame.size
+    channels = numpy.frombuffer(frame.raw, dtype=numpy.uint8).reshape(height, width, 4)
+    step = max(1, max(width, height) // preview_side)
+    small = channels[::step, ::step].astype(numpy.float32)
+    if frame.raw_mode.startswith("BGR"):
+        blue, green, red = small[..., 0], small[..., 1], small[..., 2]
+    else:
+        red, green, blue = small[..., 0], small[..., 1], small[..., 2]
+    return 0.299 * red + 0.587 * green + 0.114 * blue
+
+
+class StableFrameCapture:
+    """连续采样窗口画面, 返回第一张稳定且不是黑屏的帧"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.last_report = {}  # 最近一次检测的帧数、耗时和结果
+
+    @property
+    def active(self):
+        """是否使用稳定帧检测"""
+        return HAS_NUMPY and self.settings["enabled"]
+
+    @property
+    def initial_delay(self):
+        """存档出现后等待多久开始截图"""
+        return self.settings["start_delay"] if self.active else self.settings["fixed_delay"]
+
+    def capture(self, backend, window_title):
+        """返回选中的整帧, 读取失败时返回 None; 未启用时直接读取一帧"""
+        if not self.active:
+            return backend.grab(window_title)
+        import numpy
+        settings = self.settings
+        spent = 0.0  # 读取和分析已用的时间 (秒)
+        budget = settings["cpu_budget_ms"] / 1000
+        previous = None
+        changed = not settings["wait_for_change"]
+        still = 0
+        fallback = None  # 超出预算时使用最后一张不是黑屏的帧
+        frames = 0
+        result = "timeout"
+        frame = None
+        for frames in range(1, settings["max_frames"] + 1):
+            start = time.perf_counter()
+            frame = backend.grab(window_title)
+            if frame is None:
+                result = "no_window"
+                break
+            luma = preview_luma(frame, settings["preview_side"])
+            is_black = float(luma.mean()) < settings["min_luma"]
+            if previous is not None:
+                diff = float(numpy.abs(luma - previous).mean())
+                if diff < settings["diff_threshold"]:
+                    still += 1
+                else:
+                    still = 0
+                    changed = True
+            previous = luma
+            spent += time.perf_counter() - start
+            if not is_black:
+                fallback = frame
+                if changed and still >= settings["stable_frames"]:
+                    result = "stable"
+                    break
+            if spent >= budget:
+                result = "budget"
+                break
+            time.sleep(settings["interval"])
+        self.last_report = {"frames": frames, "cpu_ms": spent * 1000, "result": result}
+        if result == "stable":
+            return frame
+        return fallback or frame
@@ -0,0 +1,136 @@
+"""启动基准: 在新的子进程中启动不创建窗口的 SaveManagerApp, 分别测量没有快照 (冷启动) 和有启动快照时的首次显示耗时
+
+用法: python startup_benchmark.py --groups 10 --files 500 --output startup.json
+每次测量都是新的 Python 进程, 包括解释器启动和模块导入; Tk 控件由 save_benchmark 中的替身代替.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+from save_benchmark import generate_save_tree, parse_size
+
+# 首次显示时检查是否已经载入的较重模块
+HEAVY_MODULES = ("PIL", "numpy", "save_engine", "sqlite3")
+
+
+def child_main(save_dir, spawned_at):
+    """子进程: 启动界面并输出各阶段距离进程创建的毫秒数"""
+    os.chdir(save_dir)
+    sys.stdout = sys.stderr  # 界面和后台任务的日志 (包括关闭后才结束的任务) 不混入结果
+    result = start_app(spawned_at)
+    sys.__stdout__.write(json.dumps(result) + "\n")
+    sys.__stdout__.flush()
+
+
+def start_app(spawned_at):
+    from save_benchmark import import_headless_app, HeadlessRoot
+    started = time.time()
+    app_class = import_headless_app()
+    imported = time.time()
+    root = HeadlessRoot()
+    ready = []
+    update_save_list = app_class.update_save_list
+
+    def record_ready(self, *args, **kwargs):
+        update_save_list(self, *args, **kwargs)
+        if not ready:
+            ready.append(time.time())
+    app_class.update_save_list = record_ready  # 第一次按扫描结果显示列表即为就绪
+    app = app_class(root)
+    painted = time.time()
+    modules = [name for name in HEAVY_MODULES if name in sys.modules]
+    rows = len(app.save_list.rows)
+    deadline = time.monotonic() + 60
+    while not ready and time.monotonic() < deadline:
+        root.pump(0.01)
+    app.on_close()  # 写入下次启动使用的快照, 不计入耗时
+    return {
+        "interpreter_ms": (started - spawned_at) * 1000,
+        "import_ms": (imported - started) * 1000,
+        "first_paint_ms": (painted - spawned_at) * 1000,
+        # 没有快照时在首次显示之前已经就绪
+        "ready_ms": (max(ready[0], painted) - spawned_at) * 1000 if ready else None,
+        "rows_at_first_paint": rows,
+        "modules_at_first_paint": modules,
+    }
+
+
+def run_child(save_dir):
+    spawned_at = time.time()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", save_dir, "--spawned-at",
+                             repr(spawned_at)], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    result = {}
+    for key in ("interpreter_ms", "import_ms", "first_paint_ms", "ready_ms"):
+        values = [run[key] for run in runs if run[key] is not None]
+        if values:
+            result[key] = statistics.median(values)
+    result["rows_at_first_paint"] = runs[-1]["rows_at_first_paint"]
+    result["modules_at_first_paint"] = runs[-1]["modules_at_first_paint"]
+    return result
+
+
+def run_benchmark(save_dir, repeat=5):
+    """分别测量没有快照和有快照时的启动, 返回 {模式: 结果}"""
+    from startup_snapshot import snapshot_path
+    run_child(save_dir)  # 预热: 编译 .pyc 并建立截图索引, 与正常使用时的状态一致
+    cold = []
+    for _ in range(repeat):
+        try:
+            os.remove(snapshot_path(save_dir))
+        except FileNotFoundError:
+            pass
+        cold.append(run_child(save_dir))
+    snapshot = []
+    for _ in range(repeat):
+        snapshot.append(run_child(save_dir))  # 上一次关闭时写入了快照
+    return {"cold": summarize(cold), "snapshot": summarize(snapshot)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存档管理器启动基准")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--files", type=int, default=200, help="每组存档数")
+    parser.add_argument("--screenshot-size", default="1280x720")
+    parser.add_argument("--screenshot-ratio", type=float, default=1.0, help="有截图的存档比例")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", help="生成存档的目录, 默认使用临时目录并在结束后删除")
+    parser.add_argument("--output", help="结果写入的 JSON 文件")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--spawned-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child_main(args.child, args.spawned_at)
+        return
+
+    config = {"groups": args.groups, "files_per_group": args.files, "screenshot_size": args.screenshot_size,
+              "screenshot_ratio": args.screenshot_ratio, "repeat": args.repeat}
+    save_dir = args.dir or tempfile.mkdtemp(prefix="startup_benchmark_")
+    try:
+        generate_save_tree(save_dir, args.groups, args.files, screenshot_size=parse_size(args.screenshot_size),
+                           screenshot_ratio=args.screenshot_ratio)
+        results = run_benchmark(save_dir, args.repeat)
+    finally:
+        if not args.dir:
+            shutil.rmtree(save_dir, ignore_errors=True)
+    report = {"config": config, "python": platform.python_version(), "platform": platform.platform(),
+              "modes": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import json
+
+# 上次关闭时的存档列表快照, 启动时先按快照显示窗口, 再由引擎扫描目录更新
+SNAPSHOT_FILE = "startup_snapshot.json"
+SNAPSHOT_VERSION = 1
+PREVIEW_NAME = "startup_preview.png"  # 快照中选中存档的截图, PNG 格式可以不经 PIL 由 Tk 直接显示
+
+
+def snapshot_path(save_dir):
+    return os.path.join(save_dir, SNAPSHOT_FILE)
+
+
+def preview_path(img_dir):
+    """预览图放在预缩放文件的目录中, 不会被当作截图索引"""
+    return os.path.join(img_dir, "thumbs", PREVIEW_NAME)
+
+
+def load_snapshot(save_dir):
+    """读取存档目录的启动快照, 没有、版本不符或属于其他目录时返回 None"""
+    try:
+        with open(snapshot_path(save_dir), "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION
+            or os.path.normcase(snapshot.get("save_dir", "")) != os.path.normcase(os.path.abspath(save_dir))):
+        return None
+    return snapshot
+
+
+def write_snapshot(save_dir, snapshot):
+    """紧凑格式写入快照, 先写临时文件再替换"""
+    path = snapshot_path(save_dir)
+    data = dict(snapshot, version=SNAPSHOT_VERSION, save_dir=os.path.abspath(save_dir))
+    content = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return len(content)
+
+
+def remove_snapshot(save_dir, img_dir):
+    """关闭快照功能后删除已有的快照和预览图"""
+    for path in (snapshot_path(save_dir), preview_path(img_dir)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_preview(img_dir, img_path, size):
+    """把正在显示的截图按显示尺寸保存为预览图, 失败时返回 False"""
+    from thumbnail_cache import load_scaled
+    try:
+        image = load_scaled(img_path, size[0], size[1])
+        os.makedirs(os.path.dirname(preview_path(img_dir)), exist_ok=True)
+        image.convert("RGB").save(preview_path(img_dir), "PNG", compress_level=1)  # 关闭时写入, 压缩得快一些
+    except OSError as e:
+        print(f"保存启动预览图失败: {e}")
+        return False
+    return True
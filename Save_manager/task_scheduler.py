@@ -0,0 +1,180 @@
+import time
+import heapq
+import itertools
+import threading
+import concurrent.futures
+
+
+class _Task:
+    """调度器中的一个任务"""
+
+    __slots__ = ("lane", "key", "func", "args", "deadline", "submitted", "cancelled")
+
+    def __init__(self, lane, key, func, args, deadline, submitted):
+        self.lane = lane
+        self.key = key
+        self.func = func
+        self.args = args
+        self.deadline = deadline  # 最早开始时间 (time.monotonic)
+        self.submitted = submitted
+        self.cancelled = False
+
+
+class _Lane:
+    """一条任务通道: 按截止时间排序的堆和独立的线程池"""
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self.heap = []  # [(截止时间, 序号, 任务), ...]
+        self.running = 0
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix=f"task-{name}")
+        self.started = 0  # 已开始的任务数
+        self.total_wait = 0.0  # 到期后等待开始的总时间 (秒)
+        self.max_wait = 0.0
+
+
+class TaskScheduler:
+    """按截止时间调度后台任务, 每条通道并发数有限, 只为最近的截止时间保留一个定时器
+
+    同一 key 的任务在排队或运行期间只会保留一个.
+    """
+
+    def __init__(self, lanes, schedule=None, cancel=None):
+        # lanes: {通道名: 最大并发数}; schedule(delay_ms, callback) -> 定时器标识, cancel(标识)
+        self.lanes = {name: _Lane(name, max_workers) for name, max_workers in lanes.items()}
+        self.schedule = schedule or self._schedule_timer
+        self.cancel = cancel or (lambda timer: timer.cancel())
+        self.pending = {}  # key -> 排队或运行中的任务
+        self._counter = itertools.count()
+        self._timer = None
+        self._timer_deadline = None
+        self._lock = threading.RLock()
+        self._closed = False
+
+    def _schedule_timer(self, delay_ms, callback):
+        """默认的定时器实现"""
+        timer = threading.Timer(delay_ms / 1000, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def submit(self, lane, key, func, *args, delay=0.0):
+        """提交任务, delay 秒后才允许开始; 相同 key 的任务已在排队或运行时返回 False"""
+        with self._lock:
+            if self._closed or key in self.pending:
+                return False
+            now = time.monotonic()
+            task = _Task(lane, key, func, args, now + delay, now)
+            self.pending[key] = task
+            heapq.heappush(self.lanes[lane].heap, (task.deadline, next(self._counter), task))
+            self._dispatch()
+            return True
+
+    def is_pending(self, key):
+        """任务是否正在排队或运行"""
+        with self._lock:
+            return key in self.pending
+
+    def cancel_task(self, key):
+        """取消尚未开始的任务"""
+        with self._lock:
+            task = self.pending.get(key)
+            if task is None or task.cancelled:
+                return False
+            task.cancelled = True
+            del self.pending[key]
+            return True
+
+    def _on_timer(self):
+        """定时器到期, 开始已经到期的任务"""
+        with self._lock:
+            self._timer = None
+            self._timer_deadline = None
+            self._dispatch()
+
+    def _dispatch(self):
+        """在并发数允许时开始到期的任务, 并为下一个截止时间设置定时器"""
+        now = time.monotonic()
+        next_deadline = None
+        for lane in self.lanes.values():
+            while lane.heap and lane.heap[0][2].cancelled:
+                heapq.heappop(lane.heap)
+            while lane.heap and lane.running < lane.max_workers and lane.heap[0][0] <= now:
+                task = heapq.heappop(lane.heap)[2]
+                if not task.cancelled:
+                    self._start(lane, task, now)
+                while lane.heap and lane.heap[0][2].cancelled:
+                    heapq.heappop(lane.heap)
+            if lane.heap and lane.running < lane.max_workers:
+                deadline = lane.heap[0][0]
+                if next_deadline is None or deadline < next_deadline:
+                    next_deadline = deadline
+        self._arm(next_deadline, now)
+
+    def _arm(self, deadline, now):
+        """只保留一个指向最近截止时间的定时器"""
+        if deadline is None or (self._timer is not None and self._timer_deadline <= deadline):
+            return
+        if self._timer is not None:
+            self.cancel(self._timer)
+        self._timer_deadline = deadline
+        self._timer = self.schedule(max(0, int((deadline - now) * 1000) + 1), self._on_timer)
+
+    def _start(self, lane, task, now):
+        """在通道的线程池中运行任务"""
+        wait = now - task.deadline
+        lane.started += 1
+        lane.total_wait += wait
+        lane.max_wait = max(lane.max_wait, wait)
+        lane.running += 1
+        future = lane.executor.submit(task.func, *task.args)
+        future.add_done_callback(lambda f: self._on_done(lane, task, f))
+
+    def _on_done(self, lane, task, future):
+        """任务结束 (在工作线程中调用), 通过 schedule 交回调度线程释放并发名额"""
+        if not future.cancelled() and future.exception() is not None:
+            print(f"后台任务 {task.key} 失败: {future.exception()}")
+        try:
+            self.schedule(0, lambda: self._finish(lane, task))
+        except RuntimeError:
+            pass  # 主窗口已经关闭
+
+    def _finish(self, lane, task):
+        """释放并发名额并开始下一个任务"""
+        with self._lock:
+            lane.running -= 1
+            if self.pending.get(task.key) is task:
+                del self.pending[task.key]
+            if not self._closed:
+                self._dispatch()
+
+    def stats(self):
+        """返回每条通道的排队数、运行数和等待时间统计"""
+        with self._lock:
+            now = time.monotonic()
+            result = {}
+            for name, lane in self.lanes.items():
+                queued = [task for _, _, task in lane.heap if not task.cancelled]
+                result[name] = {
+                    "queued": len(queued),
+                    "due": sum(1 for task in queued if task.deadline <= now),
+                    "running": lane.running,
+                    "started": lane.started,
+                    "avg_wait": lane.total_wait / lane.started if lane.started else 0.0,
+                    "max_wait": lane.max_wait,
+                    "oldest_wait": max((now - task.submitted for task in queued), default=0.0),
+                }
+            return result
+
+    def shutdown(self):
+        """停止调度, 丢弃尚未开始的任务"""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self.cancel(self._timer)
+                self._timer = None
+            for lane in self.lanes.values():
+                lane.heap = []
+                lane.executor.shutdown(wait=False, cancel_futures=True)
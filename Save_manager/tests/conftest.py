@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+# 模块都平铺在 Save_manager 目录中, 按程序运行时的方式导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata_store import MetadataStore
+from group_switch import plan_group_switch
+from save_index import scan_save_files
+
+
+def write_saves(directory, names, size=3000):
+    """在目录中写入随机内容的存档, 返回 {文件名: 内容}"""
+    os.makedirs(directory, exist_ok=True)
+    contents = {}
+    for name in names:
+        data = os.urandom(size)
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        contents[name] = data
+    return contents
+
+
+def read_files(directory):
+    """目录中的普通文件 {文件名: 内容}"""
+    result = {}
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                result[name] = f.read()
+    return result
+
+
+@pytest.fixture
+def store(tmp_path):
+    metadata = MetadataStore(str(tmp_path / "save_metadata.db"))
+    yield metadata
+    metadata.close()
+
+
+def make_plan(save_dir, old_dir, target_dir):
+    return plan_group_switch(save_dir, old_dir, target_dir, scan_save_files(save_dir), scan_save_files(target_dir))
+
+
+def root_saves(save_dir):
+    """根目录中的存档, 不含数据库等其他文件"""
+    return {name: data for name, data in read_files(save_dir).items() if name.endswith(".dat")}
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    """根目录为第1组 (save1..3), save2 文件夹中是第2组 (save4..5)"""
+    save_dir = str(tmp_path)
+    old_dir = os.path.join(save_dir, "save1")
+    target_dir = os.path.join(save_dir, "save2")
+    os.makedirs(old_dir)
+    root = write_saves(save_dir, ["save1.dat", "save2.dat", "save3.dat"])
+    target = write_saves(target_dir, ["save4.dat", "save5.dat"])
+    return save_dir, old_dir, target_dir, root, target
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from conftest import write_saves, read_files
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from save_engine import SaveEngine
+    save_engine = SaveEngine(str(tmp_path), lambda *args: None, lambda *args: None)
+    yield save_engine
+    save_engine.close()
+
+
+def test_move_never_overwrites(engine):
+    save_dir = engine.save_dir
+    root = write_saves(save_dir, ["save1.dat", "save2.dat"])
+    group_dir = os.path.join(save_dir, "save2")
+    existing = write_saves(group_dir, ["save2.dat"])
+    images = write_saves(engine.img_dir, ["1_save1.png"], size=50)
+    target_images = write_saves(engine.img_dir, ["2_save1.png"], size=60)  # 目标组已有同名截图
+    result = engine.bulk.move({1: [os.path.join(save_dir, name) for name in root]}, 2)
+    assert result.changed == 1
+    assert len(result.errors) == 1 and "save2.dat" in result.errors[0]
+    assert read_files(group_dir) == {"save1.dat": root["save1.dat"], "save2.dat": existing["save2.dat"]}
+    assert read_files(save_dir)["save2.dat"] == root["save2.dat"]
+    assert read_files(engine.img_dir) == dict(images, **target_images)
+
+
+def test_delete_removes_saves_and_metadata(engine):
+    save_dir = engine.save_dir
+    write_saves(save_dir, ["save1.dat", "save2.dat"])
+    path = os.path.join(save_dir, "save1.dat")
+    engine.set_note(path, "boss")
+    result = engine.bulk.delete({1: [path]})
+    assert result.changed == 1 and not result.errors
+    assert not os.path.exists(path)
+    assert engine.store.get_save("1", path) == {}
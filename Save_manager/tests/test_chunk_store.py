@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from chunk_store import ChunkStore, split_chunks
+from save_index import scan_save_files
+from conftest import write_saves, read_files
+
+
+@pytest.fixture
+def chunks(tmp_path, store):
+    return ChunkStore(store, str(tmp_path / "chunks"))
+
+
+@pytest.fixture
+def group(tmp_path, chunks):
+    """已分块保存的第2组"""
+    group_dir = str(tmp_path / "save2")
+    saves = write_saves(group_dir, ["save1.dat", "save2.dat", "save3.dat"], size=40000)
+    chunks.pack_group(2, group_dir)
+    return group_dir, saves
+
+
+def chunk_files(chunks):
+    return sorted(name for _, _, names in os.walk(chunks.chunk_dir) for name in names)
+
+
+def test_split_chunks_is_lossless():
+    data = os.urandom(300000)
+    pieces = split_chunks(data)
+    assert b"".join(pieces) == data
+    assert len(pieces) > 1
+
+
+def test_pack_removes_originals(chunks, group):
+    group_dir, saves = group
+    assert read_files(group_dir) == {}
+    assert chunks.is_packed(2)
+    assert chunks.packed_group_stats()[2][0] == len(saves)
+
+
+def test_round_trip(chunks, group):
+    group_dir, saves = group
+    chunks.restore_group(2, group_dir)
+    assert read_files(group_dir) == saves
+    assert not chunks.is_packed(2)
+
+
+def test_identical_saves_share_chunks(tmp_path, chunks, group):
+    _, saves = group
+    other_dir = str(tmp_path / "save3")
+    os.makedirs(other_dir)
+    with open(os.path.join(other_dir, "save7.dat"), "wb") as f:
+        f.write(saves["save1.dat"])
+    before = chunk_files(chunks)
+    chunks.pack_group(3, other_dir)
+    assert chunk_files(chunks) == before
+
+
+def test_restore_into_partially_populated_dir(chunks, group):
+    group_dir, saves = group
+    stray = write_saves(group_dir, ["save9.dat"])
+    kept = write_saves(group_dir, ["save2.dat"])  # 已有的同名文件以文件夹为准
+    chunks.restore_group(2, group_dir)
+    assert read_files(group_dir) == dict(saves, **stray, **kept)
+    assert not chunks.is_packed(2)
+
+
+def test_repack_with_stray_file_keeps_every_save(chunks, group):
+    """有多余文件时打包前先补齐未还原的存档, gc 不会删除它们的块"""
+    group_dir, saves = group
+    stray = write_saves(group_dir, ["save9.dat"])
+    chunks.pack_group(2, group_dir)
+    chunks.gc()
+    assert read_files(group_dir) == {}
+    chunks.restore_group(2, group_dir)
+    assert read_files(group_dir) == dict(saves, **stray)
+
+
+def test_failed_restore_keeps_recipes(chunks, group, monkeypatch):
+    group_dir, saves = group
+    real = os.replace
+
+    def failing(src, dst):
+        if os.path.basename(dst) == "save3.dat":
+            raise PermissionError("locked")
+        real(src, dst)
+    monkeypatch.setattr(os, "replace", failing)
+    with pytest.raises(OSError):
+        chunks.restore_group(2, group_dir)
+    monkeypatch.setattr(os, "replace", real)
+    assert chunks.is_packed(2)
+    # 写了一半的临时文件不会被扫描为存档
+    assert [file_info['original_name'] for file_info in scan_save_files(group_dir)] == ["save1.dat", "save2.dat"]
+    chunks.gc()
+    chunks.restore_group(2, group_dir)
+    assert read_files(group_dir) == saves
+
+
+def test_failed_remove_stops_pack(tmp_path, chunks, monkeypatch):
+    group_dir = str(tmp_path / "save3")
+    saves = write_saves(group_dir, ["save1.dat", "save2.dat", "save3.dat"], size=20000)
+    real = os.remove
+
+    def failing(path):
+        if os.path.basename(path) == "save2.dat":
+            raise PermissionError("locked")
+        real(path)
+    monkeypatch.setattr(os, "remove", failing)
+    with pytest.raises(OSError):
+        chunks.pack_group(3, group_dir)
+    monkeypatch.setattr(os, "remove", real)
+    assert "save3.dat" in read_files(group_dir)  # 失败后不再删除其他文件
+    chunks.restore_group(3, group_dir)
+    assert read_files(group_dir) == saves
+
+
+def test_gc_removes_only_unreferenced_chunks(chunks, group):
+    group_dir, saves = group
+    assert chunks.gc() == 0
+    chunks.restore_group(2, group_dir)
+    assert chunks.gc() > 0
+    assert chunk_files(chunks) == []
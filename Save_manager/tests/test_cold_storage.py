@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from cold_storage import ColdStorage, cold_storage_settings
+from save_index import scan_save_files
+from conftest import write_saves, read_files
+
+
+@pytest.fixture
+def cold(tmp_path, store):
+    img_dir = str(tmp_path / "img")
+    os.makedirs(img_dir)
+    settings = cold_storage_settings({"enabled": True, "min_bytes": 0, "after_days": 0})
+    return ColdStorage(store, str(tmp_path / "cold"), img_dir, settings)
+
+
+@pytest.fixture
+def group(tmp_path, cold):
+    """已归档的第2组: 三个存档和两张截图"""
+    group_dir = str(tmp_path / "save2")
+    saves = write_saves(group_dir, ["save1.dat", "save2.dat", "save3.dat"])
+    images = write_saves(cold.img_dir, ["2_save1.png", "2_save2.png"], size=500)
+    total_bytes, archive_bytes = cold.archive_group(2, group_dir)
+    assert total_bytes == sum(len(data) for data in saves.values())
+    assert archive_bytes > 0
+    return group_dir, saves, images
+
+
+def test_archive_removes_originals(cold, group):
+    group_dir, saves, images = group
+    assert read_files(group_dir) == {}
+    assert read_files(cold.img_dir) == {}
+    assert cold.archived_group_stats()[2][0] == len(saves)
+
+
+def test_round_trip(cold, group):
+    group_dir, saves, images = group
+    assert cold.restore_group(2, group_dir) >= 0
+    assert read_files(group_dir) == saves
+    assert read_files(cold.img_dir) == images
+    assert cold.archived_group_stats() == {}
+    assert os.listdir(cold.archive_dir) == []
+
+
+def test_restore_into_partially_populated_dir(cold, group):
+    group_dir, saves, images = group
+    stray = write_saves(group_dir, ["save9.dat"])  # 归档后又出现的存档
+    kept = write_saves(group_dir, ["save2.dat"])  # 已有的同名文件以磁盘为准
+    cold.restore_group(2, group_dir)
+    assert read_files(group_dir) == dict(saves, **stray, **kept)
+    assert read_files(cold.img_dir) == images
+    assert cold.archived_group_stats() == {}
+
+
+def test_failed_restore_keeps_archive(cold, group, monkeypatch):
+    group_dir, saves, _ = group
+    archive = os.listdir(cold.archive_dir)
+    real = os.replace
+
+    def failing(src, dst):
+        if os.path.basename(dst) == "save3.dat":
+            raise PermissionError("locked")
+        real(src, dst)
+    monkeypatch.setattr(os, "replace", failing)
+    with pytest.raises(OSError):
+        cold.restore_group(2, group_dir)
+    monkeypatch.setattr(os, "replace", real)
+    # 写了一半的临时文件不会被扫描为存档
+    assert [file_info['original_name'] for file_info in scan_save_files(group_dir)] == ["save1.dat", "save2.dat"]
+    assert os.listdir(cold.archive_dir) == archive
+    assert 2 in cold.archived_group_stats()
+    cold.restore_group(2, group_dir)  # 再次还原时补齐缺少的文件
+    assert read_files(group_dir) == saves
+
+
+def test_failed_remove_cancels_archive(tmp_path, cold, monkeypatch):
+    group_dir = str(tmp_path / "save3")
+    saves = write_saves(group_dir, ["save1.dat", "save2.dat"])
+    real = os.remove
+
+    def failing(path):
+        if os.path.basename(path) == "save2.dat":
+            raise PermissionError("locked")
+        real(path)
+    monkeypatch.setattr(os, "remove", failing)
+    with pytest.raises(OSError):
+        cold.archive_group(3, group_dir)
+    monkeypatch.setattr(os, "remove", real)
+    assert read_files(group_dir) == saves
+    assert cold.archived_group_stats() == {}
+    assert os.listdir(cold.archive_dir) == []
+
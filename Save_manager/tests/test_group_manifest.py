@@ -0,0 +1,40 @@
+import os
+import threading
+
+from group_manifest import GroupManifest
+from conftest import write_saves
+
+
+def test_rebuild_counts_root_and_group_dirs(tmp_path, store):
+    save_dir = str(tmp_path)
+    write_saves(save_dir, ["save1.dat", "save2.dat"], size=100)
+    write_saves(os.path.join(save_dir, "save3"), ["save5.dat"], size=50)
+    manifest = GroupManifest(store)
+    manifest.rebuild(save_dir, 1)
+    assert manifest.file_count(1) == 2
+    assert manifest.get(3)[:2] == (1, 50)
+    assert manifest.last_group_with_saves() == 3
+    assert GroupManifest(store).all_groups() == manifest.all_groups()  # 已写入数据库
+
+
+def test_concurrent_updates_and_iteration(store):
+    manifest = GroupManifest(store)
+    errors = []
+
+    def update():
+        for group_index in range(1, 300):
+            manifest.set_stats(group_index, (1, group_index, 0.0))
+
+    def iterate():
+        try:
+            for _ in range(300):
+                sum(stats[1] for stats in manifest.all_groups().values())
+        except RuntimeError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=update), threading.Thread(target=iterate)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert manifest.last_group_with_saves() == 299
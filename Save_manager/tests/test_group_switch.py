@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from group_switch import GroupSwitcher, GroupSwitchError, SwitchJournal, rename_no_replace
+from conftest import write_saves, read_files, make_plan, root_saves
+
+
+def test_execute_swaps_groups(dirs):
+    save_dir, old_dir, target_dir, root, target = dirs
+    journal = SwitchJournal(os.path.join(save_dir, "group_switch.journal"))
+    plan = make_plan(save_dir, old_dir, target_dir)
+    journal.begin(1, 2, plan)
+    GroupSwitcher(batch_size=1).execute(plan, journal)
+    journal.close()
+    assert root_saves(save_dir) == target
+    assert read_files(old_dir) == root
+    assert read_files(target_dir) == {}
+    assert not os.path.exists(journal.path)
+
+
+def test_plan_rejects_existing_destination(dirs):
+    save_dir, old_dir, target_dir, root, _ = dirs
+    write_saves(old_dir, ["save1.dat"])
+    with pytest.raises(GroupSwitchError):
+        make_plan(save_dir, old_dir, target_dir)
+
+
+def test_collision_after_plan_rolls_back_without_overwriting(dirs):
+    save_dir, old_dir, target_dir, root, target = dirs
+    plan = make_plan(save_dir, old_dir, target_dir)
+    written = write_saves(save_dir, ["save4.dat"])  # 规划之后游戏写入的存档
+    with pytest.raises(GroupSwitchError) as info:
+        GroupSwitcher().execute(plan)
+    assert not info.value.stuck
+    assert root_saves(save_dir) == dict(root, **written)
+    assert read_files(target_dir) == target
+    assert read_files(old_dir) == {}
+
+
+def test_rename_no_replace_finishes_interrupted_link(tmp_path):
+    src = tmp_path / "save1.dat"
+    dst = tmp_path / "save2.dat"
+    src.write_bytes(b"data")
+    if os.name == "nt":
+        pytest.skip("Windows 使用 os.rename")
+    os.link(src, dst)  # 在删除源之前中断
+    rename_no_replace(str(src), str(dst))
+    assert not src.exists()
+    assert dst.read_bytes() == b"data"
@@ -0,0 +1,88 @@
+import os
+import time
+
+from config_writer import write_json_atomic
+from metadata_store import MetadataStore
+
+
+def test_round_trip_through_json(store):
+    data = {"groups": {"1": {"/saves/save1.dat": {"note": "boss", "important": True, "indent": 2}}},
+            "group_names": {"1": "第一章"}, "selected_files": {"1": ["/saves/save1.dat"]}, "max_saves_per_group": 50}
+    store.import_json(data)
+    assert store.export_json() == data
+
+
+def test_sync_imports_external_edit(tmp_path, store):
+    json_path = str(tmp_path / "save_config.json")
+    write_json_atomic(json_path, {"groups": {"1": {"a": {"note": "old"}}}})
+    assert store.sync_from_json(json_path)
+    assert not store.sync_from_json(json_path)  # 没有变化时不重复导入
+    time.sleep(0.01)
+    write_json_atomic(json_path, {"groups": {"1": {"a": {"note": "edited"}}}})
+    assert store.sync_from_json(json_path)
+    assert store.get_save("1", "a") == {"note": "edited"}
+
+
+def test_stale_json_does_not_overwrite_newer_edits(tmp_path):
+    """导出之前崩溃时 JSON 比数据库旧, 下次启动不能用它覆盖数据库"""
+    db_path = str(tmp_path / "save_metadata.db")
+    json_path = str(tmp_path / "save_config.json")
+    write_json_atomic(json_path, {"groups": {"1": {"a": {"note": "old"}}}})
+    store = MetadataStore(db_path)
+    store.sync_from_json(json_path)
+    store.set_field("1", "a", "note", "new")
+    store.close()
+    store = MetadataStore(db_path)
+    try:
+        assert not store.sync_from_json(json_path)
+        assert store.get_save("1", "a") == {"note": "new"}
+    finally:
+        store.close()
+
+
+def test_missing_json_is_ignored(tmp_path, store):
+    assert not store.sync_from_json(os.path.join(str(tmp_path), "missing.json"))
+
+
+def test_edit_right_after_database_write_is_imported(tmp_path, store):
+    """文件系统时间精度比时钟粗, 判断外部修改不能依赖写入时间的先后"""
+    json_path = str(tmp_path / "save_config.json")
+    write_json_atomic(json_path, {"groups": {"1": {"a": {"note": "old"}}}})
+    store.sync_from_json(json_path)
+    time.sleep(0.01)
+    store.set_field("1", "a", "note", "new")
+    write_json_atomic(json_path, {"groups": {"1": {"a": {"note": "edited"}}}})
+    os.utime(json_path, ns=(0, 1))  # 修改时间早于数据库的写入
+    assert store.sync_from_json(json_path)
+    assert store.get_save("1", "a") == {"note": "edited"}
+
+
+def test_touched_export_is_not_imported(tmp_path, store):
+    json_path = str(tmp_path / "save_config.json")
+    store.set_field("1", "a", "note", "old")
+    write_json_atomic(json_path, store.export_json())
+    store.mark_json_exported(json_path)
+    store.set_field("1", "a", "note", "new")
+    os.utime(json_path, ns=(10 ** 9, 10 ** 9))
+    assert not store.sync_from_json(json_path)
+    assert store.get_save("1", "a") == {"note": "new"}
+
+
+def test_notifications_wait_for_commit(store):
+    events = []
+    store.add_observer(lambda kind, group_key, data: events.append(kind))
+    try:
+        with store.transaction():
+            store.set_group_name("1", "第一章")
+            store.set_field("1", "a", "note", "boss")
+            assert events == []
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert events == []  # 回滚的修改不通知
+    assert not store.get_group_name("1")
+    with store.transaction():
+        store.set_field("1", "a", "note", "boss")
+    assert events == ["fields"]
+    store.import_json({"group_names": {"2": "第二章"}})
+    assert events == ["fields", "group_name", "reset"]
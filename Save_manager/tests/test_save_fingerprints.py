@@ -0,0 +1,48 @@
+import os
+import time
+
+from save_fingerprints import FingerprintIndex
+from save_index import scan_save_files
+from conftest import write_saves
+
+
+def touch(path, offset):
+    timestamp = time.time() + offset
+    os.utime(path, (timestamp, timestamp))
+
+
+def test_classify_added_overwritten_removed(tmp_path):
+    save_dir = str(tmp_path)
+    write_saves(save_dir, ["save1.dat", "save2.dat"])
+    index = FingerprintIndex()
+    assert index.classify(1, scan_save_files(save_dir)).unchanged == 0  # 首次只记录基线
+    write_saves(save_dir, ["save3.dat"])
+    write_saves(save_dir, ["save1.dat"], size=100)
+    os.remove(os.path.join(save_dir, "save2.dat"))
+    changes = index.classify(1, scan_save_files(save_dir))
+    assert [f['original_name'] for f in changes.added] == ["save3.dat"]
+    assert [f['original_name'] for f in changes.overwritten] == ["save1.dat"]
+    assert [os.path.basename(path) for path in changes.removed] == ["save2.dat"]
+
+
+def test_first_touch_is_not_overwrite_with_fast_hash(tmp_path):
+    save_dir = str(tmp_path)
+    write_saves(save_dir, ["save1.dat"])
+    path = os.path.join(save_dir, "save1.dat")
+    index = FingerprintIndex(use_fast_hash=True)
+    index.classify(1, scan_save_files(save_dir))
+    touch(path, 5)
+    changes = index.classify(1, scan_save_files(save_dir))
+    assert changes.overwritten == [] and changes.unchanged == 1
+    write_saves(save_dir, ["save1.dat"])  # 相同大小的新内容
+    touch(path, 10)
+    assert len(index.classify(1, scan_save_files(save_dir)).overwritten) == 1
+
+
+def test_group_change_resets_baseline(tmp_path):
+    save_dir = str(tmp_path)
+    write_saves(save_dir, ["save1.dat"])
+    index = FingerprintIndex()
+    index.classify(1, scan_save_files(save_dir))
+    write_saves(save_dir, ["save2.dat"])
+    assert index.classify(2, scan_save_files(save_dir)).added == []
@@ -0,0 +1,56 @@
+import os
+import re
+import datetime
+
+from save_index import scan_save_files
+from conftest import write_saves
+
+
+def baseline_save_files(directory, save_data):
+    """原来 get_save_files_in_dir 的实现: listdir 后逐个 isfile, 在配置字典中查找忽略标记"""
+    files = []
+    pattern = re.compile(r'^(?P<base>.*?)(?P<num>\d+)(?P<ext>\..*)$')
+    for filename in os.listdir(directory):
+        file_path = os.path.join(directory, filename)
+        if not os.path.isfile(file_path):
+            continue
+        match = pattern.match(filename)
+        if not match:
+            continue
+        if any(group_files.get(file_path, {}).get('ignore', False)
+               for group_files in save_data.get('groups', {}).values()):
+            continue
+        files.append({
+            'original_name': filename,
+            'base_name': match.group("base"),
+            'num': int(match.group("num")),
+            'ext': match.group("ext"),
+            'path': file_path,
+            'date': datetime.datetime.fromtimestamp(os.path.getctime(file_path)).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    files.sort(key=lambda x: x['num'])
+    return files
+
+
+def test_matches_baseline_scan(tmp_path, store):
+    save_dir = str(tmp_path)
+    # 同号不同名、不同前缀、不匹配的文件和文件夹
+    write_saves(save_dir, ["save3.dat", "save1.dat", "auto1.dat", "save1.sav", "quick10.dat", "save2.dat",
+                           "readme.txt", "save.dat", "save12"], size=10)
+    os.makedirs(os.path.join(save_dir, "save7.dir"))
+    save_data = {"groups": {"1": {os.path.join(save_dir, "save2.dat"): {"ignore": True},
+                                  os.path.join(save_dir, "save3.dat"): {"ignore": False, "note": "x"}},
+                            "2": {os.path.join(save_dir, "quick10.dat"): {"ignore": True}}}}
+    store.import_json(save_data)
+    keys = ('original_name', 'base_name', 'num', 'ext', 'path', 'date')
+    scanned = [{key: file_info[key] for key in keys} for file_info in scan_save_files(save_dir, store.ignored_paths())]
+    assert scanned == baseline_save_files(save_dir, save_data)
+    assert [file_info['original_name'] for file_info in scanned[:3]] == \
+        [name for name in os.listdir(save_dir) if name in ("save1.dat", "auto1.dat", "save1.sav")]
+
+
+def test_without_ignored_paths(tmp_path):
+    save_dir = str(tmp_path)
+    write_saves(save_dir, ["save2.dat", "save1.dat"], size=10)
+    assert [file_info['num'] for file_info in scan_save_files(save_dir)] == [1, 2]
+    assert scan_save_files(save_dir)[0]['size'] == 10
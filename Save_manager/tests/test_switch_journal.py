@@ -0,0 +1,106 @@
+import os
+import json
+
+import pytest
+
+import group_switch
+from group_switch import SwitchJournal, recover_group_switch
+from conftest import read_files, make_plan, root_saves
+
+
+def interrupted_switch(save_dir, old_dir, target_dir, completed, rollback=False):
+    """模拟在完成前 completed 个移动后中断的切换, 只有前一半写入了完成记录"""
+    plan = make_plan(save_dir, old_dir, target_dir)
+    journal = SwitchJournal(os.path.join(save_dir, "group_switch.journal"))
+    journal.begin(1, 2, plan)
+    moves = plan.moves_out + plan.moves_in
+    for src, dst in moves[:completed]:
+        os.rename(src, dst)
+    if completed // 2:
+        journal.mark_done(list(range(completed // 2)))
+    if rollback:
+        journal.mark_rollback()
+    journal.close(remove=False)
+    return journal.path
+
+
+def test_recover_completes_interrupted_switch(dirs):
+    save_dir, old_dir, target_dir, root, target = dirs
+    journal_path = interrupted_switch(save_dir, old_dir, target_dir, completed=4)
+    assert recover_group_switch(journal_path) == 2
+    assert root_saves(save_dir) == target
+    assert read_files(old_dir) == root
+    assert not os.path.exists(journal_path)
+
+
+def test_recover_rolls_back_marked_switch(dirs):
+    save_dir, old_dir, target_dir, root, target = dirs
+    journal_path = interrupted_switch(save_dir, old_dir, target_dir, completed=3, rollback=True)
+    assert recover_group_switch(journal_path) == 1
+    assert root_saves(save_dir) == root
+    assert read_files(target_dir) == target
+    assert not os.path.exists(journal_path)
+
+
+def test_recover_ignores_torn_last_line(dirs):
+    save_dir, old_dir, target_dir, root, target = dirs
+    journal_path = interrupted_switch(save_dir, old_dir, target_dir, completed=2)
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"done": [')
+    assert recover_group_switch(journal_path) == 2
+    assert root_saves(save_dir) == target
+
+
+def test_recover_without_journal(tmp_path):
+    assert recover_group_switch(str(tmp_path / "group_switch.journal")) is None
+
+
+def test_incomplete_rollback_keeps_journal(dirs, monkeypatch):
+    save_dir, old_dir, target_dir, root, target = dirs
+    journal_path = interrupted_switch(save_dir, old_dir, target_dir, completed=3, rollback=True)
+    real = group_switch.rename_no_replace
+
+    def failing(src, dst):
+        if os.path.basename(src) == "save3.dat":
+            raise PermissionError("locked")
+        real(src, dst)
+    monkeypatch.setattr(group_switch, "rename_no_replace", failing)
+    with pytest.raises(OSError):
+        recover_group_switch(journal_path)
+    with open(journal_path, "r", encoding="utf-8") as f:
+        assert "moves_out" in json.loads(f.readline())
+    monkeypatch.setattr(group_switch, "rename_no_replace", real)
+    assert recover_group_switch(journal_path) == 1
+    assert root_saves(save_dir) == root
+
+
+def test_engine_recovers_kept_journal_before_next_switch(dirs, monkeypatch):
+    from save_engine import SaveEngine
+    save_dir, old_dir, target_dir, root, target = dirs
+    engine = SaveEngine(save_dir, lambda *args: None, lambda *args: None)
+    errors = []
+    engine.add_listener(lambda event, *args: errors.append(args[0]) if event == "error" else None)
+    real = group_switch.rename_no_replace
+    fail = {"save5.dat"}  # 移入失败, 回滚时 save3.dat 也无法移回
+
+    def failing(src, dst):
+        name = os.path.basename(src)
+        if name in fail and (name != "save3.dat" or os.path.dirname(src) == old_dir):
+            raise PermissionError("locked")
+        real(src, dst)
+    monkeypatch.setattr(group_switch, "rename_no_replace", failing)
+    try:
+        fail.add("save3.dat")
+        assert not engine.switch_group(2)
+        assert os.path.exists(engine.journal_file)
+        assert not engine.switch_group(2)  # 日志仍不能恢复时拒绝切换, 不覆盖日志
+        assert os.path.exists(engine.journal_file)
+        fail.clear()
+        assert engine.switch_group(2)
+        assert not os.path.exists(engine.journal_file)
+        assert engine.current_group == 2
+        assert root_saves(save_dir) == target
+        assert read_files(old_dir) == root
+        assert len(errors) == 2
+    finally:
+        engine.close()
@@ -0,0 +1,48 @@
+import os
+import threading
+
+from PIL import Image
+
+from thumbnail_cache import THUMBNAIL_SIZES, load_scaled, thumbnail_path, write_thumbnails
+
+
+def make_screenshot(tmp_path, size=(1600, 900)):
+    img_path = str(tmp_path / "1_save1.png")
+    Image.new("RGB", size, (200, 30, 30)).save(img_path)
+    return img_path
+
+
+def test_writes_every_smaller_size(tmp_path):
+    img_path = make_screenshot(tmp_path)
+    write_thumbnails(img_path)
+    for size in THUMBNAIL_SIZES:
+        with Image.open(thumbnail_path(img_path, size)) as thumb:
+            assert max(thumb.size) == size
+    assert sorted(os.listdir(os.path.dirname(thumbnail_path(img_path, 320)))) == \
+        sorted(os.path.basename(thumbnail_path(img_path, size)) for size in THUMBNAIL_SIZES)  # 没有留下临时文件
+
+
+def test_concurrent_writers_and_readers(tmp_path):
+    """同时生成和读取时只会看到完整的预缩放文件"""
+    img_path = make_screenshot(tmp_path)
+    errors = []
+
+    def write():
+        try:
+            for _ in range(5):
+                write_thumbnails(img_path)
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        try:
+            for _ in range(20):
+                assert load_scaled(img_path, 300, 200).size[0] > 0
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=write) for _ in range(2)] + [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
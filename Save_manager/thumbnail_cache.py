@@ -0,0 +1,142 @@
+import os
+import tempfile
+import collections
+import threading
+
+# 预缩放截图的最长边尺寸, 与截图一起保存在 img/thumbs 下
+THUMBNAIL_SIZES = (320, 640, 1280)
+THUMBNAIL_DIR_NAME = "thumbs"
+
+
+def fit_size(width, height, frame_width, frame_height):
+    """按宽度适配显示区域, 高度超出时改为按高度适配"""
+    aspect_ratio = width / height
+    new_width = frame_width
+    new_height = int(new_width / aspect_ratio)
+    if new_height > frame_height and frame_height > 1:
+        new_height = frame_height
+        new_width = int(new_height * aspect_ratio)
+    return max(new_width, 1), max(new_height, 1)
+
+
+def thumbnail_path(img_path, size):
+    """获取截图指定尺寸的预缩放文件路径"""
+    img_dir, img_name = os.path.split(img_path)
+    name = img_name.rsplit('.', 1)[0]
+    return os.path.join(img_dir, THUMBNAIL_DIR_NAME, f"{name}_{size}.jpg")
+
+
+def write_thumbnails(img_path, image=None):
+    """为截图生成所有尺寸的预缩放文件"""
+    from PIL import Image  # 第一次处理截图时才导入, 不影响启动
+    if image is None:
+        image = Image.open(img_path)
+    image = image.convert("RGB")
+    thumb_dir = os.path.join(os.path.dirname(img_path), THUMBNAIL_DIR_NAME)
+    os.makedirs(thumb_dir, exist_ok=True)
+    for size in THUMBNAIL_SIZES:
+        if max(image.size) <= size:
+            break  # 原图已经足够小, 直接使用原图
+        thumb = image.copy()
+        thumb.thumbnail((size, size), Image.LANCZOS)
+        # 编码进程和解码线程可能同时生成同一文件, 各自写入临时文件再替换, 读取时不会遇到写了一半的文件
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=thumb_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                thumb.save(f, "JPEG", quality=90)
+            os.replace(tmp_path, thumbnail_path(img_path, size))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def remove_thumbnails(img_path):
+    """删除截图对应的预缩放文件"""
+    for size in THUMBNAIL_SIZES:
+        try:
+            os.remove(thumbnail_path(img_path, size))
+        except FileNotFoundError:
+            pass
+
+
+def open_best_source(img_path, frame_width, frame_height):
+    """打开足够清晰的最小预缩放文件, 没有或已过期时先生成"""
+    from PIL import Image
+    img_mtime = os.path.getmtime(img_path)
+    needed = max(frame_width, frame_height)
+    for size in THUMBNAIL_SIZES:
+        if size < needed:
+            continue
+        path = thumbnail_path(img_path, size)
+        try:
+            if os.path.getmtime(path) >= img_mtime:
+                return Image.open(path)
+        except OSError:
+            pass
+        # 缺少预缩放文件或截图已更新, 重新生成后再使用
+        image = Image.open(img_path)
+        if max(image.size) <= size:
+            return image
+        write_thumbnails(img_path, image)
+        return Image.open(path)
+    return Image.open(img_path)
+
+
+def load_scaled(img_path, frame_width, frame_height):
+    """加载截图并缩放到适合显示区域的尺寸"""
+    from PIL import Image
+    image = open_best_source(img_path, frame_width, frame_height)
+    new_size = fit_size(image.width, image.height, frame_width, frame_height)
+    return image.resize(new_size, Image.LANCZOS)
+
+
+class ThumbnailCache:
+    """已解码截图的 LRU 缓存, 按 (路径, 修改时间, 目标尺寸) 索引, 限制总字节数"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = collections.OrderedDict()  # key -> (value, 字节数)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """获取缓存项, 命中时移到最近使用的位置"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size):
+        """加入缓存项, 超出容量时淘汰最久未使用的项"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def invalidate(self, path):
+        """删除指定截图的所有缓存项"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                self.total_bytes -= self._entries.pop(key)[1]
+
+    def retain_size(self, target_size):
+        """显示区域尺寸变化后, 删除其他尺寸的缓存项"""
+        with self._lock:
+            for key in [key for key in self._entries if key[2] != target_size]:
+                self.total_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
@@ -0,0 +1,50 @@
+class TreeReconciler:
+    """记录 Treeview 上一次渲染的行, 只执行到达新状态所需的最少 Tk 调用"""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.rows = {}  # iid -> (values, tags)
+        self.order = []  # 当前显示顺序
+
+    def reconcile(self, new_rows):
+        """将 Treeview 更新为 new_rows [(iid, values, tags), ...], 返回新插入的 iid 列表"""
+        new_ids = set(iid for iid, _, _ in new_rows)
+        removed = [iid for iid in self.order if iid not in new_ids]
+        if removed:
+            self.tree.delete(*removed)
+        order = [iid for iid in self.order if iid in new_ids]
+
+        inserted = []
+        for index, (iid, values, tags) in enumerate(new_rows):
+            values = tuple(values)
+            tags = tuple(tags)
+            old = self.rows.get(iid)
+            if old is None:
+                self.tree.insert("", index, iid=iid, values=values, tags=tags)
+                order.insert(index, iid)
+                inserted.append(iid)
+                continue
+            if order[index] != iid:
+                self.tree.move(iid, "", index)
+                order.remove(iid)
+                order.insert(index, iid)
+            if old != (values, tags):
+                self.tree.item(iid, values=values, tags=tags)
+
+        self.rows = {iid: (tuple(values), tuple(tags)) for iid, values, tags in new_rows}
+        self.order = [iid for iid, _, _ in new_rows]
+        return inserted
+
+    def set_values(self, iid, values):
+        """单独更新一行的显示内容, 并同步记录的状态"""
+        if iid in self.rows:
+            values = tuple(values)
+            self.tree.item(iid, values=values)
+            self.rows[iid] = (values, self.rows[iid][1])
+
+    def reset(self):
+        """清空 Treeview 和记录的状态"""
+        if self.order:
+            self.tree.delete(*self.order)
+        self.rows = {}
+        self.order = []
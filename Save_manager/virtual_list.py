@@ -0,0 +1,179 @@
+from tkinter import ttk
+
+from tree_reconciler import TreeReconciler
+
+
+class VirtualSaveList:
+    """存档列表控制器, 行数超过阈值时只渲染可见区域 (加上预渲染行) 到 Treeview"""
+
+    def __init__(self, tree, scrollbar, threshold=1000, overscan=20):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.threshold = threshold  # 超过该行数时启用虚拟列表
+        self.overscan = overscan  # 可见区域上下额外渲染的行数
+        self.reconciler = TreeReconciler(tree)
+        self.rows = []  # 完整的行模型 [(iid, values, tags), ...]
+        self.index_of = {}  # iid -> 行号
+        self.selected = set()  # 虚拟模式下的选中项, 包括未渲染的行
+        self.virtual = False
+        self.first = 0  # 可见区域第一行的行号
+        self.start = 0  # 已渲染区域的起止行号
+        self.end = 0
+        self.tree.configure(yscrollcommand=self.on_tree_scrolled)
+        self.scrollbar.configure(command=self.yview)
+        self.tree.bind("<Configure>", self.on_tree_resized, add="+")
+
+    def row_height(self):
+        """获取 Treeview 的行高"""
+        height = ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            return max(int(height), 1)
+        except (TypeError, ValueError):
+            return 20
+
+    def visible_count(self):
+        """估算当前可见的行数"""
+        return max(self.tree.winfo_height() // self.row_height(), 1)
+
+    def set_rows(self, rows):
+        """更新行模型并刷新显示, 返回模型中新出现的 iid 列表"""
+        old_index = self.index_of
+        self.rows = rows
+        self.index_of = {iid: i for i, (iid, _, _) in enumerate(rows)}
+        new_ids = [iid for iid, _, _ in rows if iid not in old_index]
+        virtual = len(rows) > self.threshold
+        if self.virtual:
+            self.sync_selection()  # 记录旧的渲染区域中用户的选中操作
+        elif virtual:
+            self.selected = set(self.tree.selection())
+        was_virtual = self.virtual
+        self.virtual = virtual
+        if self.virtual:
+            self.selected &= set(self.index_of)
+            self.render()
+        else:
+            self.reconciler.reconcile(rows)
+            self.start, self.end = 0, len(rows)
+            if was_virtual:
+                self.tree.selection_set([iid for iid in self.selected if iid in self.index_of])
+                self.selected = set()
+        return new_ids
+
+    def render(self):
+        """渲染可见区域附近的行并同步滚动条和选中状态"""
+        total = len(self.rows)
+        visible = self.visible_count()
+        self.first = max(0, min(self.first, total - visible))
+        self.start = max(0, self.first - self.overscan)
+        self.end = min(total, self.first + visible + self.overscan)
+        window = self.rows[self.start:self.end]
+        self.reconciler.reconcile(window)
+        window_selected = [iid for iid, _, _ in window if iid in self.selected]
+        self.tree.selection_set(window_selected)
+        if window:
+            self.tree.yview_moveto((self.first - self.start) / len(window))
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        """按完整的行模型设置滚动条位置"""
+        total = len(self.rows)
+        if total == 0:
+            self.scrollbar.set(0, 1)
+            return
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible_count()) / total))
+
+    def on_tree_scrolled(self, low, high):
+        """Treeview 自身滚动 (滚轮、键盘、see) 时同步可见区域"""
+        if not self.virtual:
+            self.scrollbar.set(low, high)
+            return
+        window_size = self.end - self.start
+        if window_size == 0:
+            return
+        self.first = self.start + int(round(float(low) * window_size))
+        margin = self.overscan // 2
+        near_top = self.start > 0 and self.first < self.start + margin
+        near_bottom = self.end < len(self.rows) and self.first + self.visible_count() > self.end - margin
+        if near_top or near_bottom:
+            self.sync_selection()
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def on_tree_resized(self, event):
+        """窗口大小变化后重新计算可见区域"""
+        if self.virtual:
+            self.sync_selection()
+            self.render()
+
+    def yview(self, *args):
+        """滚动条回调, 参数与 Treeview.yview 相同"""
+        if not self.virtual:
+            return self.tree.yview(*args)
+        total = len(self.rows)
+        visible = self.visible_count()
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.first += step * visible if args[2] == "pages" else step
+        self.sync_selection()
+        self.render()
+
+    def sync_selection(self):
+        """将 Treeview 中已渲染行的选中状态同步到模型"""
+        if not self.virtual:
+            return
+        window = set(self.reconciler.order)
+        self.selected = (self.selected - window) | set(self.tree.selection())
+
+    def selected_paths(self):
+        """按显示顺序返回所有选中项的 iid"""
+        if not self.virtual:
+            return list(self.tree.selection())
+        self.sync_selection()
+        return sorted(self.selected, key=self.index_of.__getitem__)
+
+    def select(self, iids, add=False):
+        """选中指定的行, add 为 True 时保留原有选中项"""
+        iids = [iid for iid in iids if iid in self.index_of]
+        if not self.virtual:
+            if add:
+                self.tree.selection_add(iids)
+            else:
+                self.tree.selection_set(iids)
+            return
+        if add:
+            self.sync_selection()
+            self.selected.update(iids)
+        else:
+            self.selected = set(iids)
+        self.tree.selection_set([iid for iid in self.reconciler.order if iid in self.selected])
+
+    def clear_selection(self):
+        """取消所有选中项"""
+        self.selected = set()
+        self.tree.selection_set(())
+
+    def see(self, iid):
+        """滚动到指定的行"""
+        index = self.index_of.get(iid)
+        if index is None:
+            return
+        if not self.virtual:
+            self.tree.see(iid)
+            return
+        visible = self.visible_count()
+        if not self.first <= index < self.first + visible:
+            self.sync_selection()
+            self.first = max(0, index - visible // 2)
+            self.render()
+
+    def set_values(self, iid, values):
+        """单独更新一行的显示内容"""
+        index = self.index_of.get(iid)
+        if index is None:
+            return
+        _, _, tags = self.rows[index]
+        self.rows[index] = (iid, tuple(values), tags)
+        self.reconciler.set_values(iid, values)